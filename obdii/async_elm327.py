@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import re
+
+import serial
+from obd import OBDResponse, OBDStatus
+from obd.protocols import ISO_15765_4_11bit_500k
+
+logger = logging.getLogger('obdii.async_elm327')
+
+
+class AsyncELM327:
+    """
+        asyncio transport for ELM327 adapters.
+
+        Talks to the adapter directly over the serial port. The port is
+        registered with the event loop instead of being read in a blocking
+        call, so other tasks keep running while a query waits for the car.
+        Commands are serialized, one in flight at a time.
+
+        query() takes the same OBDCommand objects as python-obd and returns
+        the same OBDResponse objects, so ext_commands and its decoders work
+        unchanged on top of it.
+    """
+
+    ELM_PROMPT = b'>'
+
+    def __init__(self, portstr, baudrate, protocol=ISO_15765_4_11bit_500k, timeout=5, warm_start=False):
+        self.portstr = portstr
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.warm_start = warm_start  # ATWS instead of ATZ, skips the LED test
+        self.protocol = protocol([])
+        self.__port = None
+        self.__buffer = bytearray()
+        self.__prompt = None  # future resolved with the adapter output once the prompt shows up
+        self.__lock = None
+        self.__resync = False  # an interrupted command may still print a late prompt
+        self.__monitor_lines = None  # queue receiving lines while in monitor mode
+
+    async def open(self):
+        """Open the serial port and initialize the adapter. The port is closed again if the init fails."""
+        self.__lock = asyncio.Lock()
+        self.__port = serial.serial_for_url(self.portstr, baudrate=self.baudrate, timeout=0)
+        try:
+            asyncio.get_running_loop().add_reader(self.__port.fileno(), self.__on_readable)
+
+            reset = b"ATWS" if self.warm_start else b"ATZ"
+            await self.send(reset, timeout=max(self.timeout, 5))  # return data can be junk, so don't bother checking
+            for cmd in (b"ATE0", b"ATH1", b"ATL0", b"ATSP" + self.protocol.ELM_ID.encode()):
+                lines = await self.send(cmd)
+                if 'OK' not in lines:
+                    raise ConnectionError("{} did not return 'OK'".format(cmd.decode()))
+        except BaseException:  # timeouts and cancellation too, or the fd and its reader stay registered
+            self.close()
+            raise
+        logger.info("Connected: PORT={} BAUD={} PROTOCOL={}".format(self.portstr, self.baudrate, self.protocol.ELM_ID))
+
+    def close(self):
+        if self.__port is not None:
+            asyncio.get_running_loop().remove_reader(self.__port.fileno())
+            self.__port.close()
+            self.__port = None
+
+    def status(self):
+        return OBDStatus.CAR_CONNECTED if self.__port is not None else OBDStatus.NOT_CONNECTED
+
+    async def send(self, cmd, timeout=None):
+        """
+            Send a raw command and return the adapter output as a list of lines.
+
+            Raises asyncio.TimeoutError if no prompt arrives within timeout
+            seconds. If the call times out or is cancelled, the adapter is
+            interrupted and resynchronized before the next command.
+        """
+        async with self.__lock:
+            if self.__port is None:
+                raise ConnectionError("Adapter not connected")
+            if self.__resync:
+                await self.__drain()
+
+            self.__prompt = asyncio.get_running_loop().create_future()
+            self.__buffer.clear()
+            logger.debug("write: {}".format(repr(cmd)))
+            self.__port.write(cmd + b"\r")
+            try:
+                raw = await asyncio.wait_for(self.__prompt, timeout or self.timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self.__resync = True
+                raise
+            finally:
+                self.__prompt = None
+
+        logger.debug("read: {}".format(repr(raw)))
+        raw = re.sub(b"\x00", b"", raw)
+        return [s.strip() for s in re.split("[\r\n]", raw.decode("utf-8", "ignore")) if s.strip()]
+
+    async def query(self, command, timeout=None):
+        """Send an OBDCommand and decode the answer like python-obd's OBD.query()."""
+        lines = await self.send(command.command, timeout)
+        messages = self.protocol(lines)
+        if not messages:
+            logger.info("No valid OBD Messages returned")
+            return OBDResponse()
+        return command(messages)
+
+    async def monitor(self, command=b"ATMA", duration=None):
+        """
+            Put the adapter in monitor mode and yield the lines it prints.
+
+            command is the monitor command (ATMA, or STMA for STN chips), the
+            filters have to be set beforehand. Monitoring ends after duration
+            seconds, when the adapter stops on its own (BUFFER FULL) or when
+            the caller stops iterating. The adapter is interrupted before the
+            next command.
+        """
+        async with self.__lock:
+            if self.__port is None:
+                raise ConnectionError("Adapter not connected")
+            if self.__resync:
+                await self.__drain()
+
+            loop = asyncio.get_running_loop()
+            deadline = None if duration is None else loop.time() + duration
+            self.__monitor_lines = asyncio.Queue()
+            self.__buffer.clear()
+            self.__port.write(command + b"\r")
+            try:
+                while True:
+                    timeout = None if deadline is None else deadline - loop.time()
+                    if timeout is not None and timeout <= 0:
+                        break
+                    try:
+                        line = await asyncio.wait_for(self.__monitor_lines.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if line is None:  # the adapter printed its prompt, monitoring stopped
+                        break
+                    yield line
+            finally:
+                self.__monitor_lines = None
+                self.__resync = True
+
+    async def __drain(self):
+        """Interrupt whatever the adapter is doing and wait until it is idle again."""
+        self.__resync = False
+        self.__buffer.clear()
+        loop = asyncio.get_running_loop()
+        # Any character stops a running command; the nonsense command then
+        # answers '?' so we know the prompt we see is the last one
+        self.__port.write(b"\x7F\x7F\r")
+        deadline = loop.time() + self.timeout
+        while True:
+            raw = self.__take_prompt()
+            if raw is None:
+                self.__prompt = loop.create_future()
+                try:
+                    raw = await asyncio.wait_for(self.__prompt, max(0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    logger.warning("Adapter did not come back after an interrupted command")
+                    return
+                finally:
+                    self.__prompt = None
+            if b"?" in raw:
+                return
+
+    def __take_prompt(self):
+        """Pop the output up to the first prompt from the buffer, None if there is no prompt yet."""
+        if self.ELM_PROMPT not in self.__buffer:
+            return None
+        raw, _, rest = bytes(self.__buffer).partition(self.ELM_PROMPT)
+        self.__buffer = bytearray(rest)
+        return raw
+
+    def __on_readable(self):
+        try:
+            data = self.__port.read(self.__port.in_waiting or 1)
+        except serial.SerialException as err:
+            logger.critical("Device disconnected while reading: {}".format(err))
+            self.close()
+            if self.__prompt is not None and not self.__prompt.done():
+                self.__prompt.set_exception(ConnectionError(str(err)))
+            return
+
+        self.__buffer.extend(data)
+        if self.__monitor_lines is not None:
+            *lines, rest = re.split(b"[\r\n]", bytes(self.__buffer))
+            self.__buffer = bytearray(rest)
+            for line in lines:
+                line = line.replace(b"\x00", b"").decode("utf-8", "ignore").strip()
+                if line:
+                    self.__monitor_lines.put_nowait(line)
+            if self.ELM_PROMPT in self.__buffer:
+                self.__buffer.clear()
+                self.__monitor_lines.put_nowait(None)
+            return
+
+        # Output nobody is waiting for stays in the buffer, the next command clears it
+        if self.__prompt is not None and not self.__prompt.done():
+            raw = self.__take_prompt()
+            if raw is not None:
+                self.__prompt.set_result(raw)
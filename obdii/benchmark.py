@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+    Polling cycle benchmark against the ELM327 emulator.
+
+        python3 obdii/benchmark.py [--cycles 3] [--output results.json] [--compare baseline.json]
+
+    Runs the acquisition path with each transport and planner option and
+    prints per-scenario timings as JSON.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import sys
+import time
+from collections import defaultdict
+
+import obdii_data
+from commands import ext_commands, signal_catalog
+from elm327_emulator import ELM327Emulator, VehicleModel
+from mqtt_client import MQTTPublisher
+
+logger = logging.getLogger('obdii.benchmark')
+
+# name -> (transport, max_dids_per_request, fast)
+SCENARIOS = {
+    'baseline':        ('python-obd', 1, False),
+    'multi_did':       ('python-obd', 3, False),
+    'multi_did_fast':  ('python-obd', 3, True),
+    'asyncio_fast':    ('asyncio',    3, True),
+}
+
+
+class StageTimer:
+    """
+        Accumulates exclusive wall time per stage.
+
+        Stages nest: the time spent in an inner stage is not counted in
+        the outer one, so the stages add up to the total.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.round_trips = 0  # adapter commands, header switches included
+        self.stack = []  # [name, start, time spent in children]
+
+    def reset(self):
+        """Forget what was measured so far, e.g. after warm-up cycles."""
+        self.seconds.clear()
+        self.calls.clear()
+        self.round_trips = 0
+
+    def enter(self, name):
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, start, children = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.seconds[name] += elapsed - children
+        self.calls[name] += 1
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def active(self, name):
+        return any(frame[0] == name for frame in self.stack)
+
+    def wrap(self, name, func):
+        def wrapped(*args, **kwargs):
+            self.enter(name(self) if callable(name) else name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.exit()
+        return wrapped
+
+    def wrap_async(self, name, func):
+        async def wrapped(*args, **kwargs):
+            self.enter(name(self) if callable(name) else name)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.exit()
+        return wrapped
+
+
+def round_trip_stage(timer):
+    """Adapter round trips made to switch ECU count as header switches."""
+    timer.round_trips += 1
+    return 'header_switch' if timer.active('header_switch') else 'ecu_round_trip'
+
+
+def instrument_decoders(timer):
+    """Time every signal decoder. Returns a function restoring the originals."""
+    originals = {name: ext_commands[name].decode for name in signal_catalog}
+    for name in signal_catalog:
+        ext_commands[name].decode = timer.wrap('decode', originals[name])
+
+    def restore():
+        for name, decode in originals.items():
+            ext_commands[name].decode = decode
+    return restore
+
+
+def instrument_planner(timer, connection, planner, asynchronous):
+    """Time header switches, retries (query_command minus its round trips) and adapter round trips."""
+    wrap = timer.wrap_async if asynchronous else timer.wrap
+    planner.select_ecu = wrap('header_switch', planner.select_ecu)
+    planner.query = wrap('retry_backoff', planner.query)
+    connection.query = wrap(round_trip_stage, connection.query)
+
+
+def scenario_config(port, max_dids, fast, signals):
+    return {'serial': {'port': port, 'baudrate': 38400},
+            'query': {'max_dids_per_request': max_dids, 'fast': fast, 'signals': signals},
+            'mqtt': {'topic_prefix': 'benchmark/'}}
+
+
+def summarize(name, options, timer, init_seconds, cycle_seconds, signals, answered, warmup):
+    """Timer totals cover the cycles after the warm-up ones, like the cycle times."""
+    measured = cycle_seconds[warmup:]
+    mean = sum(measured) / len(measured)
+    stages = dict((stage, round(seconds / len(measured), 6)) for stage, seconds in sorted(timer.seconds.items())
+                  if stage != 'cycle')
+    stages['planner'] = round(timer.seconds['cycle'] / len(measured), 6)  # what's left of the cycle
+    return {'name': name,
+            'options': options,
+            'adapter_init_s': round(init_seconds, 4),
+            'cycles': len(measured),
+            'warmup_cycles': warmup,
+            'cycle_s': {'mean': round(mean, 4), 'min': round(min(measured), 4), 'max': round(max(measured), 4)},
+            'cycles_per_minute': round(60 / mean, 3) if mean else None,
+            'round_trips_per_signal': round(timer.round_trips / len(measured) / max(signals, 1), 3),
+            'ecu_requests_per_signal': round(timer.calls['ecu_round_trip'] / len(measured) / max(signals, 1), 3),
+            'answered_per_cycle': round(answered / len(measured), 1),
+            'stage_s_per_cycle': stages}
+
+
+def publish_stage(timer, client, values):
+    """Time building the state message, and publishing it if there is a broker."""
+    timer.enter('json')
+    try:
+        msg = obdii_data.state_message(values, 'benchmark/')
+    finally:
+        timer.exit()
+    if client is not None:
+        timer.enter('mqtt')
+        try:
+            client.wait_published(client.publish([msg]), 10)
+        finally:
+            timer.exit()
+
+
+def run_sync(name, options, port, signals, cycles, warmup, client):
+    config = scenario_config(port, options['max_dids_per_request'], options['fast'], signals)
+    timer = StageTimer()
+    restore = instrument_decoders(timer)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):  # python-obd prints the supported commands
+        connection, planner = obdii_data.connect(config)
+    init_seconds = time.perf_counter() - start
+    try:
+        instrument_planner(timer, connection, planner, False)
+        names = obdii_data.selected_signals(config)
+        cycle_seconds = []
+        answered = 0
+        for cycle in range(warmup + cycles):
+            if cycle == warmup:
+                timer.reset()
+                answered = 0
+            start = time.perf_counter()
+            timer.enter('cycle')
+            try:
+                values = planner.run(names, errors=(ValueError, obdii_data.CanError))
+            finally:
+                timer.exit()
+            publish_stage(timer, client, values)
+            cycle_seconds.append(time.perf_counter() - start)
+            answered += len(values)
+    finally:
+        restore()
+        connection.close()
+    return summarize(name, options, timer, init_seconds, cycle_seconds, len(names), answered, warmup)
+
+
+async def run_async(name, options, port, signals, cycles, warmup, client):
+    config = scenario_config(port, options['max_dids_per_request'], options['fast'], signals)
+    timer = StageTimer()
+    restore = instrument_decoders(timer)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):  # python-obd prints the supported commands
+        connection, planner = await obdii_data.async_connect(config)
+    init_seconds = time.perf_counter() - start
+    try:
+        instrument_planner(timer, connection, planner, True)
+        names = obdii_data.selected_signals(config)
+        cycle_seconds = []
+        answered = 0
+        for cycle in range(warmup + cycles):
+            if cycle == warmup:
+                timer.reset()
+                answered = 0
+            start = time.perf_counter()
+            timer.enter('cycle')
+            try:
+                values = await planner.run(names, errors=(ValueError, obdii_data.CanError))
+            finally:
+                timer.exit()
+            publish_stage(timer, client, values)
+            cycle_seconds.append(time.perf_counter() - start)
+            answered += len(values)
+    finally:
+        restore()
+        connection.close()
+    return summarize(name, options, timer, init_seconds, cycle_seconds, len(names), answered, warmup)
+
+
+def run_scenario(name, args, client):
+    transport, max_dids, fast = SCENARIOS[name]
+    options = {'transport': transport, 'max_dids_per_request': max_dids, 'fast': fast}
+    model = VehicleModel.load(args.model) if args.model else VehicleModel()
+    emulator = ELM327Emulator(model, no_data_rate=args.no_data_rate, can_error_rate=args.can_error_rate,
+                              bus_busy_rate=args.bus_busy_rate, seed=args.seed)
+    port = emulator.start()
+    logger.info("Running {} on {}".format(name, port))
+    if transport == 'asyncio':
+        return asyncio.run(run_async(name, options, port, args.signals, args.cycles, args.warmup, client))
+    return run_sync(name, options, port, args.signals, args.cycles, args.warmup, client)
+
+
+def compare(results, baseline, tolerance):
+    """Return the scenarios whose cycle rate dropped more than tolerance below the baseline run."""
+    previous = dict((scenario['name'], scenario) for scenario in baseline['scenarios'])
+    regressions = []
+    for scenario in results['scenarios']:
+        before = previous.get(scenario['name'])
+        if before is None or not before['cycles_per_minute'] or not scenario['cycles_per_minute']:
+            continue
+        change = scenario['cycles_per_minute'] / before['cycles_per_minute'] - 1
+        scenario['change_vs_baseline'] = round(change, 4)
+        if change < -tolerance:
+            regressions.append(scenario['name'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark polling cycles against the ELM327 emulator.")
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS),
+                        help="scenarios to run, all by default")
+    parser.add_argument('--cycles', type=int, default=3, help="measured polling cycles per scenario")
+    parser.add_argument('--warmup', type=int, default=1,
+                        help="cycles run before measuring (the fast path learns during them)")
+    parser.add_argument('--signals', nargs='+', default=[], help="signals to poll, all by default")
+    parser.add_argument('--model', help="JSON vehicle model for the emulator")
+    parser.add_argument('--no-data-rate', type=float, default=0.0)
+    parser.add_argument('--can-error-rate', type=float, default=0.0)
+    parser.add_argument('--bus-busy-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--broker', help="host[:port] of an MQTT broker to time publishing against")
+    parser.add_argument('--output', help="write the results to this file instead of stdout")
+    parser.add_argument('--compare', help="earlier results to compare against, exits with 1 on a regression")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="cycle rate drop tolerated by --compare, 0.1 = 10%%")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(name)-10s %(levelname)-8s %(message)s")
+    obdii_data.logger = logging.getLogger('obdii')
+    logger.setLevel(logging.INFO)
+
+    client = None
+    if args.broker:
+        host, _, port = args.broker.partition(':')
+        client = MQTTPublisher(host, int(port or 1883), "battery-data-benchmark", None, None)
+        client.start()
+        if not client.wait_connected(10):
+            parser.error("could not connect to {}".format(args.broker))
+
+    results = {'time': time.time(), 'python': sys.version.split()[0], 'scenarios': []}
+    try:
+        for name in args.scenarios:
+            results['scenarios'].append(run_scenario(name, args, client))
+    finally:
+        if client is not None:
+            client.stop()
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.loads(baseline_file.read()), args.tolerance)
+        results['regressions'] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    if regressions:
+        logger.error("Slower than the baseline: {}".format(", ".join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
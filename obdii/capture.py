@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+    Raw session capture and offline re-decoding.
+
+    The acquisition path can record every ECU request and the raw answer
+    to a capture file, so the history can be decoded again when a decoder
+    turns out to be wrong:
+
+        python3 obdii/capture.py captures/*.obdcap --output history.npz [--catalog fixes.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from commands import ext_command_data_bytes, ext_command_ecus, signal_catalog
+from decoders import SignalSpec, compile_decoder
+from uds import READ_DATA_BY_IDENTIFIER, POSITIVE_RESPONSE_OFFSET
+
+logger = logging.getLogger('obdii.capture')
+
+# File header: magic, wall clock and monotonic clock when the file was opened
+FILE_HEADER = struct.Struct('<8sdd')
+MAGIC = b'OBDCAP01'
+# Block header: record count, payload bytes, crc32 of the index and payloads
+BLOCK_HEADER = struct.Struct('<III')
+# One index entry per request: monotonic time of the answer, seconds it
+# took, 11 bit CAN header, request length and bytes, status, offset and
+# length of the answer in the block payloads
+RECORD = struct.Struct('<dfHB7sBIH')
+RECORD_DTYPE = np.dtype([('time', '<f8'), ('elapsed', '<f4'), ('header', '<u2'), ('request_length', 'u1'),
+                         ('request', 'V7'), ('status', 'u1'), ('offset', '<u4'), ('length', '<u2')])
+STATUS_OK = 0
+STATUS_FAILED = 1
+
+
+class CaptureWriter:
+    """
+        Appends request/response pairs to a capture file.
+
+        Records are buffered and written in blocks: a CRC32 protected
+        header, a fixed size index entry per record and the raw answers
+        back to back. Fixed size entries are what lets the re-decoder load
+        a block as a NumPy array instead of parsing it record by record.
+        A block is written when it holds block_records records or
+        flush_interval seconds after its first record, a crash loses at
+        most that much.
+    """
+
+    def __init__(self, path, block_records=4096, flush_interval=10, clock=time.monotonic):
+        self.path = path
+        self.block_records = block_records
+        self.flush_interval = flush_interval
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(MAGIC, time.time(), clock()))
+            self.file.flush()
+        self.index = bytearray()
+        self.payloads = bytearray()
+        self.count = 0
+        self.block_start = None
+
+    def record(self, header, request, response, start, end=None):
+        """
+            Record one request.
+
+            header is the 11 bit CAN header the request went to, request
+            the command bytes in hex (b"224181"), response the raw answer
+            bytes or None if the request failed, start and end monotonic
+            times.
+        """
+        end = self.clock() if end is None else end
+        request = bytes.fromhex(request.decode())
+        data = b"" if response is None else bytes(response)
+        self.index += RECORD.pack(end, end - start, header, len(request), request,
+                                  STATUS_FAILED if response is None else STATUS_OK, len(self.payloads), len(data))
+        self.payloads += data
+        self.count += 1
+        if self.block_start is None:
+            self.block_start = end
+        if self.count >= self.block_records or end - self.block_start >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records as a block."""
+        if self.count == 0:
+            return
+        crc = zlib.crc32(self.payloads, zlib.crc32(self.index))
+        self.file.write(BLOCK_HEADER.pack(self.count, len(self.payloads), crc) + self.index + self.payloads)
+        self.file.flush()
+        self.index = bytearray()
+        self.payloads = bytearray()
+        self.count = 0
+        self.block_start = None
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def capture_path(config):
+    """Name of this run's capture file in capture.path, relative to this directory."""
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), config.get('capture', {}).get('path', 'captures'),
+                        time.strftime('%Y%m%d-%H%M%S') + '.obdcap')
+
+
+def read_capture(path, chunk_records=1 << 20):
+    """
+        Read a capture file in chunks.
+
+        Yields (records, data, wall_offset): records is a RECORD_DTYPE
+        array of at least chunk_records entries (but the last) whose
+        offset field has been made relative to data, a uint8 memory map
+        of the whole file, and wall_offset turns monotonic times into
+        wall clock ones. A torn or corrupt block ends the file.
+    """
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    if len(data) < FILE_HEADER.size:
+        return
+    magic, wall, monotonic = FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("{} is not a capture file".format(path))
+    wall_offset = wall - monotonic
+
+    chunk = []
+    chunk_count = 0
+    pos = FILE_HEADER.size
+    while pos + BLOCK_HEADER.size <= len(data):
+        count, payload_bytes, crc = BLOCK_HEADER.unpack_from(data, pos)
+        index_start = pos + BLOCK_HEADER.size
+        payload_start = index_start + count * RECORD.size
+        end = payload_start + payload_bytes
+        if end > len(data) or zlib.crc32(data[index_start:end]) != crc:
+            logger.warning("{}: ignoring torn or corrupt block at byte {}".format(path, pos))
+            break
+        records = np.frombuffer(data, dtype=RECORD_DTYPE, count=count, offset=index_start).copy()
+        records['offset'] += payload_start
+        chunk.append(records)
+        chunk_count += count
+        pos = end
+        if chunk_count >= chunk_records:
+            yield np.concatenate(chunk), data, wall_offset
+            chunk = []
+            chunk_count = 0
+    if chunk:
+        yield np.concatenate(chunk), data, wall_offset
+
+
+def load_catalog(path=None):
+    """
+        Return the catalog to decode with: signal_catalog, updated from a JSON file if given.
+
+        The file maps signal names to SignalSpec fields to change (e.g.
+        {"BAT_CELL_VOLT_01": {"scale": 0.001}}), new signals need every
+        field and a "header" ("7E4").
+    """
+    catalog = dict((name, (spec, int(ext_command_ecus[name][0][-3:], 16))) for name, spec in signal_catalog.items())
+    if path is None:
+        return catalog
+    with open(path) as catalog_file:
+        changes = json.loads(catalog_file.read())
+    for name, fields in changes.items():
+        fields = dict(fields)
+        header = fields.pop('header', None)
+        if 'command' in fields:
+            fields['command'] = fields['command'].encode()
+        if name in catalog:
+            spec, known_header = catalog[name]
+            catalog[name] = (spec._replace(**fields), int(header, 16) if header else known_header)
+        else:
+            catalog[name] = (SignalSpec(**fields), int(header, 16))
+    return catalog
+
+
+def multi_did_layout(answer, sizes):
+    """
+        Where each DID's payload starts in one multi-DID answer (62 DID payload DID payload ...).
+
+        sizes maps DID bytes to payload lengths. Returns a list of (DID,
+        position of the DID), stopping at the first DID it doesn't expect
+        or that is cut short, like uds.split_multi_did_response().
+    """
+    layout = []
+    pos = 1
+    while pos + 2 <= len(answer):
+        did = bytes(answer[pos:pos + 2])
+        if not sizes.get(did) or pos + 2 + sizes[did] > len(answer) or did in dict(layout):
+            break
+        layout.append((did, pos))
+        pos += 2 + sizes[did]
+    return layout
+
+
+def decode_column(data, offsets, start, spec):
+    """Decode one field of many answers at once, like compile_decoder() does for a single one."""
+    raw = np.zeros(len(offsets), dtype=np.int64)
+    for byte in range(spec.length):
+        raw = (raw << 8) | data[offsets + (start + byte)]
+    if spec.signed:
+        half = 1 << (8 * spec.length - 1)
+        raw = np.where(raw >= half, raw - 2 * half, raw)
+    divisor = round(1 / spec.scale, 6) if spec.scale != 0 else 0
+    if divisor and abs(1 / spec.scale - divisor) < 1e-9 and divisor not in (1, -1):
+        return raw / divisor + spec.offset
+    return raw * spec.scale + spec.offset
+
+
+class Redecoder:
+    """
+        Decodes captures with a catalog, NumPy column by column.
+
+        Records are grouped by request, then by ECU and, for multi-DID
+        requests, by answer length. Within a group every field sits at the
+        same position, so a signal is decoded for the whole group with a
+        handful of array operations. The layout of a multi-DID group is
+        read from its first answer and checked against every other one,
+        the odd answers that don't match go through the scalar decoders.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.dids = {}  # (header, request bytes) -> [(name, spec)]
+        for name, (spec, header) in catalog.items():
+            self.dids.setdefault((header, bytes.fromhex(spec.command.decode())), []).append((name, spec))
+        self.decoders = dict((name, compile_decoder(spec)) for name, (spec, header) in catalog.items())
+        self.times = {}  # name -> [arrays]
+        self.values = {}
+        self.frames = 0
+
+    def add(self, records, data, wall_offset):
+        """Decode a chunk from read_capture()."""
+        self.frames += len(records)
+        records = records[records['status'] == STATUS_OK]
+        if len(records) == 0:
+            return
+        # request_length and the 7 request bytes are adjacent, 8 bytes from byte 14 of each entry
+        keys = np.ascontiguousarray(records.view(np.uint8).reshape(-1, RECORD.size)[:, 14:22]).view('<u8').ravel()
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        bounds = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1, [len(keys)]))
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            group = records[order[first:last]]
+            request = bytes(group[0]['request'])[:group[0]['request_length']]
+            headers = group['header']
+            if (headers == headers[0]).all():
+                self.decode_group(int(headers[0]), request, group, data, wall_offset)
+                continue
+            for header in np.unique(headers):
+                self.decode_group(int(header), request, group[headers == header], data, wall_offset)
+
+    def decode_group(self, header, request, records, data, wall_offset):
+        offsets = records['offset'].astype(np.int64)
+        lengths = records['length']
+        times = records['time'] + wall_offset
+        if len(request) <= 3:
+            for name, spec in self.dids.get((header, request), ()):
+                present = lengths >= spec.byte + spec.length
+                self.add_column(name, times[present], decode_column(data, offsets[present], spec.byte, spec))
+            return
+
+        sizes = self.did_sizes(header, request)
+        for length in np.unique(lengths):
+            same = lengths == length
+            sample = records[same][0]
+            layout = multi_did_layout(data[sample['offset']:sample['offset'] + length], sizes)
+            match = same & (data[offsets] == READ_DATA_BY_IDENTIFIER + POSITIVE_RESPONSE_OFFSET)
+            for did, pos in layout:
+                match &= (data[offsets + pos] == did[0]) & (data[offsets + pos + 1] == did[1])
+            for did, pos in layout:
+                for name, spec in self.dids[(header, request[:1] + did)]:
+                    start = pos + spec.byte - 1
+                    if start + spec.length <= pos + 2 + sizes[did]:
+                        self.add_column(name, times[match], decode_column(data, offsets[match], start, spec))
+            odd = same & ~match
+            if odd.any():
+                self.decode_scalar(header, request, records[odd], data, wall_offset)
+
+    def did_sizes(self, header, request):
+        """Payload length of each DID of a multi-DID request, 0 for DIDs the catalog doesn't pack."""
+        sizes = {}
+        for pos in range(1, len(request), 2):
+            did = request[pos:pos + 2]
+            sizes[did] = max([ext_command_data_bytes.get(name, 0)
+                              for name, spec in self.dids.get((header, request[:1] + did), ())] or [0])
+        return sizes
+
+    def decode_scalar(self, header, request, records, data, wall_offset):
+        """Split multi-DID answers one by one and run the scalar decoders."""
+        sizes = self.did_sizes(header, request)
+        for record in records:
+            answer = bytes(data[record['offset']:record['offset'] + record['length']])
+            if not answer or answer[0] != READ_DATA_BY_IDENTIFIER + POSITIVE_RESPONSE_OFFSET:
+                continue
+            for did, pos in multi_did_layout(answer, sizes):
+                message = Answer(answer[:1] + answer[pos:pos + 2 + sizes[did]])
+                for name, spec in self.dids[(header, request[:1] + did)]:
+                    value = self.decoders[name]([message])
+                    if value is not None:
+                        self.add_column(name, np.array([record['time'] + wall_offset]), np.array([value]))
+
+    def add_column(self, name, times, values):
+        if len(times):
+            self.times.setdefault(name, []).append(times)
+            self.values.setdefault(name, []).append(values)
+
+    def columns(self):
+        """Return name -> (times, values) arrays sorted by time."""
+        columns = {}
+        for name in self.times:
+            times = np.concatenate(self.times[name])
+            values = np.concatenate(self.values[name]).astype(np.float64)
+            order = np.argsort(times, kind='stable')
+            columns[name] = (times[order], values[order])
+        return columns
+
+
+class Answer:
+    """The one attribute of python-obd's Message the decoders read."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+def save_columns(columns, path):
+    """Write the columns to a .npz file, NAME.time and NAME.value arrays per signal."""
+    arrays = {}
+    for name, (times, values) in columns.items():
+        arrays[name + '.time'] = times
+        arrays[name + '.value'] = values
+    np.savez(path, **arrays)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode capture files again into per-signal columns.")
+    parser.add_argument('captures', nargs='+', help="capture files")
+    parser.add_argument('--output', required=True, help=".npz file to write")
+    parser.add_argument('--catalog', help="JSON signal catalog changes to decode with")
+    parser.add_argument('--chunk-records', type=int, default=1 << 20, help="records decoded at once")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)-10s %(levelname)-8s %(message)s")
+    redecoder = Redecoder(load_catalog(args.catalog))
+    start = time.perf_counter()
+    for path in args.captures:
+        for records, data, wall_offset in read_capture(path, args.chunk_records):
+            redecoder.add(records, data, wall_offset)
+    columns = redecoder.columns()
+    elapsed = time.perf_counter() - start
+    save_columns(columns, args.output)
+    logger.info("Decoded {} frames into {} signals in {:.2f} s ({:.0f} frames/s)"
+                .format(redecoder.frames, len(columns), elapsed, redecoder.frames / max(elapsed, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
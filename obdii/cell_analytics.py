@@ -0,0 +1,95 @@
+import numpy as np
+
+CELL_COUNT = 96
+CELL_SIGNALS = ['BAT_CELL_VOLT_{:02d}'.format(cell) for cell in range(1, CELL_COUNT + 1)]
+
+
+def cell_vector(values):
+    """Return the 96 cell voltages of a values dict as an array, NaN for cells that are missing."""
+    return np.array([values.get(name, np.nan) for name in CELL_SIGNALS], dtype=np.float64)
+
+
+def module_bounds(module_size, cell_count=CELL_COUNT):
+    """
+        Return the start index of every module.
+
+        module_size is either the number of cells of every module, or the
+        list of module sizes in pack order.
+    """
+    sizes = [module_size] * -(-cell_count // module_size) if isinstance(module_size, int) else module_size
+    return np.cumsum([0] + list(sizes[:-1]))
+
+
+def analyze_cells(volts, module_size=8):
+    """
+        Statistics of a cell voltage vector, in a single vectorized pass.
+
+        volts has one row per sweep and one column per cell (a single
+        sweep can be a 1-D array), missing cells are NaN and so are the
+        statistics of sweeps or modules without any. Returns a dict of
+        arrays with one entry per sweep for min, max, delta, mean and std,
+        one per cell for z and rank (cell indexes sorted weakest first),
+        and one per module for module_min, module_max and module_mean.
+    """
+    volts = np.asarray(volts, dtype=np.float64)
+    valid = ~np.isnan(volts)
+    count = valid.sum(axis=-1)
+    filled = np.where(valid, volts, 0.0)
+
+    mean = np.where(count > 0, filled.sum(axis=-1) / np.maximum(count, 1), np.nan)
+    variance = (np.where(valid, volts - mean[..., None], 0.0) ** 2).sum(axis=-1) / np.maximum(count, 1)
+    std = np.where(count > 0, np.sqrt(variance), np.nan)
+    low = np.where(count > 0, np.where(valid, volts, np.inf).min(axis=-1), np.nan)
+    high = np.where(count > 0, np.where(valid, volts, -np.inf).max(axis=-1), np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(std[..., None] > 0, (volts - mean[..., None]) / std[..., None], 0.0)
+    z[~valid] = np.nan
+
+    # NaN sorts last, so missing cells end up at the bottom of the ranking
+    rank = np.argsort(volts, axis=-1, kind='stable')
+
+    bounds = module_bounds(module_size, volts.shape[-1])
+    module_count = np.add.reduceat(valid, bounds, axis=-1)
+    empty = module_count == 0
+    module_mean = np.where(empty, np.nan, np.add.reduceat(filled, bounds, axis=-1) / np.maximum(module_count, 1))
+    module_min = np.where(empty, np.nan, np.minimum.reduceat(np.where(valid, volts, np.inf), bounds, axis=-1))
+    module_max = np.where(empty, np.nan, np.maximum.reduceat(np.where(valid, volts, -np.inf), bounds, axis=-1))
+
+    return {'min': low, 'max': high, 'delta': high - low, 'mean': mean, 'std': std,
+            'z': z, 'rank': rank,
+            'module_min': module_min, 'module_max': module_max, 'module_mean': module_mean}
+
+
+def rounded(values, digits):
+    """Turn an array into a list of rounded floats, None for NaN."""
+    return [None if np.isnan(value) else round(float(value), digits) for value in values]
+
+
+def cell_signals(values, module_size=8):
+    """
+        Derive pack level signals from the cell voltages in a values dict.
+
+        Returns a dict of name -> value ready to be published with the raw
+        values, empty if fewer than two cells are known. The names don't
+        clash with BAT_CELL_VOLT_MIN/MAX, which the BECM reports itself.
+    """
+    volts = cell_vector(values)
+    known = ~np.isnan(volts)
+    if known.sum() < 2:
+        return {}
+    stats = analyze_cells(volts, module_size)
+    ranked = [int(cell) + 1 for cell in stats['rank'] if known[cell]]
+    return {
+        'CELL_STATS_VOLT_MIN': round(float(stats['min']), 4),
+        'CELL_STATS_VOLT_MAX': round(float(stats['max']), 4),
+        'CELL_STATS_VOLT_DELTA': round(float(stats['delta']), 4),
+        'CELL_STATS_VOLT_MEAN': round(float(stats['mean']), 4),
+        'CELL_STATS_VOLT_STD': round(float(stats['std']), 5),
+        'CELL_STATS_WEAKEST': ranked[0],
+        'CELL_STATS_RANKING': ranked,
+        'CELL_STATS_ZSCORE': rounded(stats['z'], 3),
+        'MODULE_STATS_VOLT_MIN': rounded(stats['module_min'], 4),
+        'MODULE_STATS_VOLT_MAX': rounded(stats['module_max'], 4),
+        'MODULE_STATS_VOLT_MEAN': rounded(stats['module_mean'], 4),
+    }
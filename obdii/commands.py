@@ -1,7 +1,7 @@
 from obd import OBDCommand
 from obd.protocols import ECU
-from obd.decoders import raw_string, percent
-from decoders import *
+from obd.decoders import raw_string
+from decoders import SignalSpec, compile_decoder, vin
 
 # flake8: noqa
 
@@ -17,133 +17,254 @@ ext_commands = {
     'CAN_RECEIVE_ADDRESS_7EC': OBDCommand("CAN_RECEIVE_ADDRESS_7EC", "Set the CAN receive address to 7EC"          , b"ATCRA7EC",  0, raw_string          , ECU.UNKNOWN, False),
     'CAN_RECEIVE_ADDRESS_7EF': OBDCommand("CAN_RECEIVE_ADDRESS_7EF", "Set the CAN receive address to 7EF"          , b"ATCRA7EF",  0, raw_string          , ECU.UNKNOWN, False),
 
-    'BAT_PACK_CAP_AH_RAW_2018':          OBDCommand("BAT_PACK_CAP_AH_RAW_2018",          "Bat Cap Raw 2018"          , b"2241a3"     ,  0, bat_pack_cap_ah_raw_2018,     ECU.ALL    , False),
-    'BAT_PACK_CAP_AH_RAW_2019':          OBDCommand("BAT_PACK_CAP_AH_RAW_2019",          "Bat Cap Raw 2019"          , b"2245f9"     ,  0, bat_pack_cap_ah_raw_2019,     ECU.ALL    , False),
-    'BAT_PACK_CAP_KWH_EST_2018':          OBDCommand("BAT_PACK_CAP_KWH_EST_2018",          "Bat Cap Est"          , b"2241a3"     ,  0, bat_pack_cap_kwh_est_2018,     ECU.ALL    , False),
-    'BAT_PACK_CAP_KWH_EST_2019':          OBDCommand("BAT_PACK_CAP_KWH_EST_2019",          "Bat Cap Est"          , b"2245f9"     ,  0, bat_pack_cap_kwh_est_2019,     ECU.ALL    , False),
-    'BAT_PACK_SOC_DISP':          OBDCommand("BAT_PACK_SOC_DISP",          "Batt % DIC"          , b"228334"     ,  0, bat_pack_soc_disp,     ECU.ALL    , False),
-    'BAT_PACK_SOC_RAW_HD':          OBDCommand("BAT_PACK_SOC_RAW_HD",          "SoC Raw HD"          , b"2243af"     ,  0, bat_pack_soc_raw_hd,     ECU.ALL    , False),
-    'BAT_PACK_SOC_RAW_LD':          OBDCommand("BAT_PACK_SOC_RAW_LD",          "SoC Raw"          , b"015b"     ,  0, bat_pack_soc_raw_ld_var,     ECU.ALL    , False),
-    'BAT_PACK_SOC_RAW_LD2':          OBDCommand("BAT_PACK_SOC_RAW_LD2",          "SoC Raw 2"          , b"222411"     ,  0, bat_pack_soc_raw_ld_var,     ECU.ALL    , False),
-    'BAT_PACK_SOC_RAW_LD3':          OBDCommand("BAT_PACK_SOC_RAW_LD3",          "SoC Raw 3"          , b"22432f"     ,  0, bat_pack_soc_raw_ld_var,     ECU.ALL    , False),
-    'BAT_PACK_SOC_VAR':          OBDCommand("BAT_PACK_SOC_VAR",          "SoC Var"          , b"22435f"     ,  0, bat_pack_soc_raw_ld_var,     ECU.ALL    , False),
-    'BAT_PACK_CURRENT_HD':          OBDCommand("BAT_PACK_CURRENT_HD",          "Batt Amps HD"          , b"2240d4"     ,  0, bat_pack_current_hd,     ECU.ALL    , False),
-    'BAT_PACK_NUM_CHARGES':          OBDCommand("BAT_PACK_NUM_CHARGES",          "# Charges"          , b"2243a5"     ,  0, bat_pack_num_charges,     ECU.ALL    , False),
-    'BAT_MOD_TEMP_1':          OBDCommand("BAT_MOD_TEMP_1",          "Batt Mod 1"          , b"2240d7"     ,  0, bat_mod_temp,     ECU.ALL    , False),
-    'BAT_MOD_TEMP_2':          OBDCommand("BAT_MOD_TEMP_2",          "Batt Mod 2"          , b"2240d9"     ,  0, bat_mod_temp,     ECU.ALL    , False),
-    'BAT_MOD_TEMP_3':          OBDCommand("BAT_MOD_TEMP_3",          "Batt Mod 3"          , b"2240db"     ,  0, bat_mod_temp,     ECU.ALL    , False),
-    'BAT_MOD_TEMP_4':          OBDCommand("BAT_MOD_TEMP_4",          "Batt Mod 4"          , b"2240dd"     ,  0, bat_mod_temp,     ECU.ALL    , False),
-    'BAT_MOD_TEMP_5':          OBDCommand("BAT_MOD_TEMP_5",          "Batt Mod 5"          , b"2240df"     ,  0, bat_mod_temp,     ECU.ALL    , False),
-    'BAT_MOD_TEMP_6':          OBDCommand("BAT_MOD_TEMP_6",          "Batt Mod 6"          , b"2240e1"     ,  0, bat_mod_temp,     ECU.ALL    , False),
-    'BAT_MOD_TEMP_MAX':          OBDCommand("BAT_MOD_TEMP_MAX",          "Max Batt"          , b"224349"     ,  0, bat_mod_temp,     ECU.ALL    , False),
-    'BAT_MOD_TEMP_MIN':          OBDCommand("BAT_MOD_TEMP_MIN",          "Min Batt"          , b"22434a"     ,  0, bat_mod_temp,     ECU.ALL    , False),
-    'BAT_MOD_TEMP_AVG':          OBDCommand("BAT_MOD_TEMP_AVG",          "Batt Temp Avg"          , b"22434f"     ,  0, bat_mod_temp,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_MIN':          OBDCommand("BAT_CELL_VOLT_MIN",          "Min Cell V"          , b"224329"     ,  0, bat_cell_volt_min_max,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_MIN_NUM':          OBDCommand("BAT_CELL_VOLT_MIN_NUM",          "Min Cell #"          , b"22432a"     ,  0, bat_cell_volt_min_max_num,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_MAX':          OBDCommand("BAT_CELL_VOLT_MAX",          "Max Cell V"          , b"22432b"     ,  0, bat_cell_volt_min_max,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_MAX_NUM':          OBDCommand("BAT_CELL_VOLT_MAX_NUM",          "Max Cell #"          , b"22432c"     ,  0, bat_cell_volt_min_max_num,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_AVG':          OBDCommand("BAT_CELL_VOLT_AVG",          "Avg Cell"          , b"22c218"     ,  0, bat_cell_volt_avg,     ECU.ALL    , False),
-    'BAT_PACK_RESISTANCE':          OBDCommand("BAT_PACK_RESISTANCE",          "Batt Res"          , b"2240e9"     ,  0, bat_pack_resistance,     ECU.ALL    , False),
-    'BAT_PACK_VOLT_MIN':          OBDCommand("BAT_PACK_VOLT_MIN",          "Min Batt V"          , b"22433b"     ,  0, bat_pack_volt_min_max,     ECU.ALL    , False),
-    'BAT_PACK_VOLT_MAX':          OBDCommand("BAT_PACK_VOLT_MAX",          "Max Batt V"          , b"22433c"     ,  0, bat_pack_volt_min_max,     ECU.ALL    , False),
-    'HV_CURRENT_HD':          OBDCommand("HV_CURRENT_HD",          "HV Amps"          , b"222414"     ,  0, hv_current_hd,     ECU.ALL    , False),
-    'HV_CURRENT':          OBDCommand("HV_CURRENT",          "HV Amps 2"          , b"224356"     ,  0, hv_current,     ECU.ALL    , False),
-    'AMBIENT_AIR_TEMP':          OBDCommand("AMBIENT_AIR_TEMP",          "Amb Air"          , b"220046"     ,  0, ambient_air_temp,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_01':          OBDCommand("BAT_CELL_VOLT_01",          "Cell 01"          , b"224181"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_02':          OBDCommand("BAT_CELL_VOLT_02",          "Cell 02"          , b"224182"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_03':          OBDCommand("BAT_CELL_VOLT_03",          "Cell 03"          , b"224183"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_04':          OBDCommand("BAT_CELL_VOLT_04",          "Cell 04"          , b"224184"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_05':          OBDCommand("BAT_CELL_VOLT_05",          "Cell 05"          , b"224185"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_06':          OBDCommand("BAT_CELL_VOLT_06",          "Cell 06"          , b"224186"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_07':          OBDCommand("BAT_CELL_VOLT_07",          "Cell 07"          , b"224187"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_08':          OBDCommand("BAT_CELL_VOLT_08",          "Cell 08"          , b"224188"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_09':          OBDCommand("BAT_CELL_VOLT_09",          "Cell 09"          , b"224189"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_10':          OBDCommand("BAT_CELL_VOLT_10",          "Cell 10"          , b"22418a"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_11':          OBDCommand("BAT_CELL_VOLT_11",          "Cell 11"          , b"22418b"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_12':          OBDCommand("BAT_CELL_VOLT_12",          "Cell 12"          , b"22418c"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_13':          OBDCommand("BAT_CELL_VOLT_13",          "Cell 13"          , b"22418d"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_14':          OBDCommand("BAT_CELL_VOLT_14",          "Cell 14"          , b"22418e"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_15':          OBDCommand("BAT_CELL_VOLT_15",          "Cell 15"          , b"22418f"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_16':          OBDCommand("BAT_CELL_VOLT_16",          "Cell 16"          , b"224190"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_17':          OBDCommand("BAT_CELL_VOLT_17",          "Cell 17"          , b"224191"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_18':          OBDCommand("BAT_CELL_VOLT_18",          "Cell 18"          , b"224192"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_19':          OBDCommand("BAT_CELL_VOLT_19",          "Cell 19"          , b"224193"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_20':          OBDCommand("BAT_CELL_VOLT_20",          "Cell 20"          , b"224194"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_21':          OBDCommand("BAT_CELL_VOLT_21",          "Cell 21"          , b"224195"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_22':          OBDCommand("BAT_CELL_VOLT_22",          "Cell 22"          , b"224196"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_23':          OBDCommand("BAT_CELL_VOLT_23",          "Cell 23"          , b"224197"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_24':          OBDCommand("BAT_CELL_VOLT_24",          "Cell 24"          , b"224198"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_25':          OBDCommand("BAT_CELL_VOLT_25",          "Cell 25"          , b"224199"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_26':          OBDCommand("BAT_CELL_VOLT_26",          "Cell 26"          , b"22419a"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_27':          OBDCommand("BAT_CELL_VOLT_27",          "Cell 27"          , b"22419b"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_28':          OBDCommand("BAT_CELL_VOLT_28",          "Cell 28"          , b"22419c"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_29':          OBDCommand("BAT_CELL_VOLT_29",          "Cell 29"          , b"22419d"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_30':          OBDCommand("BAT_CELL_VOLT_30",          "Cell 30"          , b"22419e"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_31':          OBDCommand("BAT_CELL_VOLT_31",          "Cell 31"          , b"22419f"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_32':          OBDCommand("BAT_CELL_VOLT_32",          "Cell 32"          , b"224200"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_33':          OBDCommand("BAT_CELL_VOLT_33",          "Cell 33"          , b"224201"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_34':          OBDCommand("BAT_CELL_VOLT_34",          "Cell 34"          , b"224202"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_35':          OBDCommand("BAT_CELL_VOLT_35",          "Cell 35"          , b"224203"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_36':          OBDCommand("BAT_CELL_VOLT_36",          "Cell 36"          , b"224204"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_37':          OBDCommand("BAT_CELL_VOLT_37",          "Cell 37"          , b"224205"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_38':          OBDCommand("BAT_CELL_VOLT_38",          "Cell 38"          , b"224206"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_39':          OBDCommand("BAT_CELL_VOLT_39",          "Cell 39"          , b"224207"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_40':          OBDCommand("BAT_CELL_VOLT_40",          "Cell 40"          , b"224208"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_41':          OBDCommand("BAT_CELL_VOLT_41",          "Cell 41"          , b"224209"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_42':          OBDCommand("BAT_CELL_VOLT_42",          "Cell 42"          , b"22420a"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_43':          OBDCommand("BAT_CELL_VOLT_43",          "Cell 43"          , b"22420b"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_44':          OBDCommand("BAT_CELL_VOLT_44",          "Cell 44"          , b"22420c"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_45':          OBDCommand("BAT_CELL_VOLT_45",          "Cell 45"          , b"22420d"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_46':          OBDCommand("BAT_CELL_VOLT_46",          "Cell 46"          , b"22420e"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_47':          OBDCommand("BAT_CELL_VOLT_47",          "Cell 47"          , b"22420f"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_48':          OBDCommand("BAT_CELL_VOLT_48",          "Cell 48"          , b"224210"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_49':          OBDCommand("BAT_CELL_VOLT_49",          "Cell 49"          , b"224211"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_50':          OBDCommand("BAT_CELL_VOLT_50",          "Cell 50"          , b"224212"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_51':          OBDCommand("BAT_CELL_VOLT_51",          "Cell 51"          , b"224213"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_52':          OBDCommand("BAT_CELL_VOLT_52",          "Cell 52"          , b"224214"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_53':          OBDCommand("BAT_CELL_VOLT_53",          "Cell 53"          , b"224215"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_54':          OBDCommand("BAT_CELL_VOLT_54",          "Cell 54"          , b"224216"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_55':          OBDCommand("BAT_CELL_VOLT_55",          "Cell 55"          , b"224217"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_56':          OBDCommand("BAT_CELL_VOLT_56",          "Cell 56"          , b"224218"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_57':          OBDCommand("BAT_CELL_VOLT_57",          "Cell 57"          , b"224219"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_58':          OBDCommand("BAT_CELL_VOLT_58",          "Cell 58"          , b"22421a"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_59':          OBDCommand("BAT_CELL_VOLT_59",          "Cell 59"          , b"22421b"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_60':          OBDCommand("BAT_CELL_VOLT_60",          "Cell 60"          , b"22421c"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_61':          OBDCommand("BAT_CELL_VOLT_61",          "Cell 61"          , b"22421d"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_62':          OBDCommand("BAT_CELL_VOLT_62",          "Cell 62"          , b"22421e"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_63':          OBDCommand("BAT_CELL_VOLT_63",          "Cell 63"          , b"22421f"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_64':          OBDCommand("BAT_CELL_VOLT_64",          "Cell 64"          , b"224220"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_65':          OBDCommand("BAT_CELL_VOLT_65",          "Cell 65"          , b"224221"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_66':          OBDCommand("BAT_CELL_VOLT_66",          "Cell 66"          , b"224222"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_67':          OBDCommand("BAT_CELL_VOLT_67",          "Cell 67"          , b"224223"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_68':          OBDCommand("BAT_CELL_VOLT_68",          "Cell 68"          , b"224224"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_69':          OBDCommand("BAT_CELL_VOLT_69",          "Cell 69"          , b"224225"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_70':          OBDCommand("BAT_CELL_VOLT_70",          "Cell 70"          , b"224226"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_71':          OBDCommand("BAT_CELL_VOLT_71",          "Cell 71"          , b"224227"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_72':          OBDCommand("BAT_CELL_VOLT_72",          "Cell 72"          , b"224228"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_73':          OBDCommand("BAT_CELL_VOLT_73",          "Cell 73"          , b"224229"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_74':          OBDCommand("BAT_CELL_VOLT_74",          "Cell 74"          , b"22422a"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_75':          OBDCommand("BAT_CELL_VOLT_75",          "Cell 75"          , b"22422b"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_76':          OBDCommand("BAT_CELL_VOLT_76",          "Cell 76"          , b"22422c"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_77':          OBDCommand("BAT_CELL_VOLT_77",          "Cell 77"          , b"22422d"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_78':          OBDCommand("BAT_CELL_VOLT_78",          "Cell 78"          , b"22422e"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_79':          OBDCommand("BAT_CELL_VOLT_79",          "Cell 79"          , b"22422f"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_80':          OBDCommand("BAT_CELL_VOLT_80",          "Cell 80"          , b"224230"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_81':          OBDCommand("BAT_CELL_VOLT_81",          "Cell 81"          , b"224231"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_82':          OBDCommand("BAT_CELL_VOLT_82",          "Cell 82"          , b"224232"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_83':          OBDCommand("BAT_CELL_VOLT_83",          "Cell 83"          , b"224233"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_84':          OBDCommand("BAT_CELL_VOLT_84",          "Cell 84"          , b"224234"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_85':          OBDCommand("BAT_CELL_VOLT_85",          "Cell 85"          , b"224235"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_86':          OBDCommand("BAT_CELL_VOLT_86",          "Cell 86"          , b"224236"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_87':          OBDCommand("BAT_CELL_VOLT_87",          "Cell 87"          , b"224237"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_88':          OBDCommand("BAT_CELL_VOLT_88",          "Cell 88"          , b"224238"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_89':          OBDCommand("BAT_CELL_VOLT_89",          "Cell 89"          , b"224239"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_90':          OBDCommand("BAT_CELL_VOLT_90",          "Cell 90"          , b"22423a"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_91':          OBDCommand("BAT_CELL_VOLT_91",          "Cell 91"          , b"22423b"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_92':          OBDCommand("BAT_CELL_VOLT_92",          "Cell 92"          , b"22423c"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_93':          OBDCommand("BAT_CELL_VOLT_93",          "Cell 93"          , b"22423d"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_94':          OBDCommand("BAT_CELL_VOLT_94",          "Cell 94"          , b"22423e"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_95':          OBDCommand("BAT_CELL_VOLT_95",          "Cell 95"          , b"22423f"     ,  0, bat_cell_volt,     ECU.ALL    , False),
-    'BAT_CELL_VOLT_96':          OBDCommand("BAT_CELL_VOLT_96",          "Cell 96"          , b"224240"     ,  0, bat_cell_volt,     ECU.ALL    , False),
+    'VIN':                     OBDCommand("VIN",                     "Vehicle Identification Number"     , b"0902"    ,  0, vin                 , ECU.ALL    , False),
+}
+
+# Numeric signals, compiled into ext_commands decoders below
+signal_catalog = {
+#                                 SignalSpec(description          , cmd       , byte, length, signed, scale, offset, unit)
+    'BAT_PACK_CAP_AH_RAW_2018':       SignalSpec("Bat Cap Raw 2018"    , b"2241a3" , 3, 2, False, 0.1,          0,   "Ah"),
+    'BAT_PACK_CAP_AH_RAW_2019':       SignalSpec("Bat Cap Raw 2019"    , b"2245f9" , 3, 2, False, 0.01,         0,   "Ah"),
+    'BAT_PACK_CAP_KWH_EST_2018':      SignalSpec("Bat Cap Est"         , b"2241a3" , 3, 2, False, 0.032,        0,   "kWh"),
+    'BAT_PACK_CAP_KWH_EST_2019':      SignalSpec("Bat Cap Est"         , b"2245f9" , 3, 2, False, 0.0032,       0,   "kWh"),
+    'BAT_PACK_SOC_DISP':              SignalSpec("Batt % DIC"          , b"228334" , 3, 1, False, 100 / 255,    0,   "%"),
+    'BAT_PACK_SOC_RAW_HD':            SignalSpec("SoC Raw HD"          , b"2243af" , 3, 2, False, 100 / 65535,  0,   "%"),
+    'BAT_PACK_SOC_RAW_LD':            SignalSpec("SoC Raw"             , b"015b"   , 2, 1, False, 1 / 2.55,     0,   "%"),
+    'BAT_PACK_SOC_RAW_LD2':           SignalSpec("SoC Raw 2"           , b"222411" , 3, 1, False, 1 / 2.55,     0,   "%"),
+    'BAT_PACK_SOC_RAW_LD3':           SignalSpec("SoC Raw 3"           , b"22432f" , 3, 1, False, 1 / 2.55,     0,   "%"),
+    'BAT_PACK_SOC_VAR':               SignalSpec("SoC Var"             , b"22435f" , 3, 1, False, 1 / 2.55,     0,   "%"),
+    'BAT_PACK_CURRENT_HD':            SignalSpec("Batt Amps HD"        , b"2240d4" , 3, 2, True,  0.05,         0,   "A"),
+    'BAT_PACK_NUM_CHARGES':           SignalSpec("# Charges"           , b"2243a5" , 3, 2, False, 1,            0,   ""),
+    'BAT_MOD_TEMP_1':                 SignalSpec("Batt Mod 1"          , b"2240d7" , 3, 1, False, 1,            -40, "degC"),
+    'BAT_MOD_TEMP_2':                 SignalSpec("Batt Mod 2"          , b"2240d9" , 3, 1, False, 1,            -40, "degC"),
+    'BAT_MOD_TEMP_3':                 SignalSpec("Batt Mod 3"          , b"2240db" , 3, 1, False, 1,            -40, "degC"),
+    'BAT_MOD_TEMP_4':                 SignalSpec("Batt Mod 4"          , b"2240dd" , 3, 1, False, 1,            -40, "degC"),
+    'BAT_MOD_TEMP_5':                 SignalSpec("Batt Mod 5"          , b"2240df" , 3, 1, False, 1,            -40, "degC"),
+    'BAT_MOD_TEMP_6':                 SignalSpec("Batt Mod 6"          , b"2240e1" , 3, 1, False, 1,            -40, "degC"),
+    'BAT_MOD_TEMP_MAX':               SignalSpec("Max Batt"            , b"224349" , 3, 1, False, 1,            -40, "degC"),
+    'BAT_MOD_TEMP_MIN':               SignalSpec("Min Batt"            , b"22434a" , 3, 1, False, 1,            -40, "degC"),
+    'BAT_MOD_TEMP_AVG':               SignalSpec("Batt Temp Avg"       , b"22434f" , 3, 1, False, 1,            -40, "degC"),
+    'BAT_CELL_VOLT_MIN':              SignalSpec("Min Cell V"          , b"224329" , 3, 2, False, 1 / 1666.666, 0,   "V"),
+    'BAT_CELL_VOLT_MIN_NUM':          SignalSpec("Min Cell #"          , b"22432a" , 3, 1, False, 1,            0,   ""),
+    'BAT_CELL_VOLT_MAX':              SignalSpec("Max Cell V"          , b"22432b" , 3, 2, False, 1 / 1666.666, 0,   "V"),
+    'BAT_CELL_VOLT_MAX_NUM':          SignalSpec("Max Cell #"          , b"22432c" , 3, 1, False, 1,            0,   ""),
+    'BAT_CELL_VOLT_AVG':              SignalSpec("Avg Cell"            , b"22c218" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_PACK_RESISTANCE':            SignalSpec("Batt Res"            , b"2240e9" , 3, 2, False, 0.5,          0,   "mOhm"),
+    'BAT_PACK_VOLT_MIN':              SignalSpec("Min Batt V"          , b"22433b" , 3, 2, False, 0.52,         0,   "V"),
+    'BAT_PACK_VOLT_MAX':              SignalSpec("Max Batt V"          , b"22433c" , 3, 2, False, 0.52,         0,   "V"),
+    'HV_CURRENT_HD':                  SignalSpec("HV Amps"             , b"222414" , 3, 2, True,  0.05,         0,   "A"),
+    'HV_CURRENT':                     SignalSpec("HV Amps 2"           , b"224356" , 3, 2, True,  -1 / 6.675,   0,   "A"),
+    'AMBIENT_AIR_TEMP':               SignalSpec("Amb Air"             , b"220046" , 3, 1, False, 1,            -40, "degC"),
+    'BAT_CELL_VOLT_01':               SignalSpec("Cell 01"             , b"224181" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_02':               SignalSpec("Cell 02"             , b"224182" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_03':               SignalSpec("Cell 03"             , b"224183" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_04':               SignalSpec("Cell 04"             , b"224184" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_05':               SignalSpec("Cell 05"             , b"224185" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_06':               SignalSpec("Cell 06"             , b"224186" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_07':               SignalSpec("Cell 07"             , b"224187" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_08':               SignalSpec("Cell 08"             , b"224188" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_09':               SignalSpec("Cell 09"             , b"224189" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_10':               SignalSpec("Cell 10"             , b"22418a" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_11':               SignalSpec("Cell 11"             , b"22418b" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_12':               SignalSpec("Cell 12"             , b"22418c" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_13':               SignalSpec("Cell 13"             , b"22418d" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_14':               SignalSpec("Cell 14"             , b"22418e" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_15':               SignalSpec("Cell 15"             , b"22418f" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_16':               SignalSpec("Cell 16"             , b"224190" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_17':               SignalSpec("Cell 17"             , b"224191" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_18':               SignalSpec("Cell 18"             , b"224192" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_19':               SignalSpec("Cell 19"             , b"224193" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_20':               SignalSpec("Cell 20"             , b"224194" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_21':               SignalSpec("Cell 21"             , b"224195" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_22':               SignalSpec("Cell 22"             , b"224196" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_23':               SignalSpec("Cell 23"             , b"224197" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_24':               SignalSpec("Cell 24"             , b"224198" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_25':               SignalSpec("Cell 25"             , b"224199" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_26':               SignalSpec("Cell 26"             , b"22419a" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_27':               SignalSpec("Cell 27"             , b"22419b" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_28':               SignalSpec("Cell 28"             , b"22419c" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_29':               SignalSpec("Cell 29"             , b"22419d" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_30':               SignalSpec("Cell 30"             , b"22419e" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_31':               SignalSpec("Cell 31"             , b"22419f" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_32':               SignalSpec("Cell 32"             , b"224200" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_33':               SignalSpec("Cell 33"             , b"224201" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_34':               SignalSpec("Cell 34"             , b"224202" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_35':               SignalSpec("Cell 35"             , b"224203" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_36':               SignalSpec("Cell 36"             , b"224204" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_37':               SignalSpec("Cell 37"             , b"224205" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_38':               SignalSpec("Cell 38"             , b"224206" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_39':               SignalSpec("Cell 39"             , b"224207" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_40':               SignalSpec("Cell 40"             , b"224208" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_41':               SignalSpec("Cell 41"             , b"224209" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_42':               SignalSpec("Cell 42"             , b"22420a" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_43':               SignalSpec("Cell 43"             , b"22420b" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_44':               SignalSpec("Cell 44"             , b"22420c" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_45':               SignalSpec("Cell 45"             , b"22420d" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_46':               SignalSpec("Cell 46"             , b"22420e" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_47':               SignalSpec("Cell 47"             , b"22420f" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_48':               SignalSpec("Cell 48"             , b"224210" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_49':               SignalSpec("Cell 49"             , b"224211" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_50':               SignalSpec("Cell 50"             , b"224212" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_51':               SignalSpec("Cell 51"             , b"224213" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_52':               SignalSpec("Cell 52"             , b"224214" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_53':               SignalSpec("Cell 53"             , b"224215" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_54':               SignalSpec("Cell 54"             , b"224216" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_55':               SignalSpec("Cell 55"             , b"224217" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_56':               SignalSpec("Cell 56"             , b"224218" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_57':               SignalSpec("Cell 57"             , b"224219" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_58':               SignalSpec("Cell 58"             , b"22421a" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_59':               SignalSpec("Cell 59"             , b"22421b" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_60':               SignalSpec("Cell 60"             , b"22421c" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_61':               SignalSpec("Cell 61"             , b"22421d" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_62':               SignalSpec("Cell 62"             , b"22421e" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_63':               SignalSpec("Cell 63"             , b"22421f" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_64':               SignalSpec("Cell 64"             , b"224220" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_65':               SignalSpec("Cell 65"             , b"224221" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_66':               SignalSpec("Cell 66"             , b"224222" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_67':               SignalSpec("Cell 67"             , b"224223" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_68':               SignalSpec("Cell 68"             , b"224224" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_69':               SignalSpec("Cell 69"             , b"224225" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_70':               SignalSpec("Cell 70"             , b"224226" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_71':               SignalSpec("Cell 71"             , b"224227" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_72':               SignalSpec("Cell 72"             , b"224228" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_73':               SignalSpec("Cell 73"             , b"224229" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_74':               SignalSpec("Cell 74"             , b"22422a" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_75':               SignalSpec("Cell 75"             , b"22422b" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_76':               SignalSpec("Cell 76"             , b"22422c" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_77':               SignalSpec("Cell 77"             , b"22422d" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_78':               SignalSpec("Cell 78"             , b"22422e" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_79':               SignalSpec("Cell 79"             , b"22422f" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_80':               SignalSpec("Cell 80"             , b"224230" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_81':               SignalSpec("Cell 81"             , b"224231" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_82':               SignalSpec("Cell 82"             , b"224232" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_83':               SignalSpec("Cell 83"             , b"224233" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_84':               SignalSpec("Cell 84"             , b"224234" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_85':               SignalSpec("Cell 85"             , b"224235" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_86':               SignalSpec("Cell 86"             , b"224236" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_87':               SignalSpec("Cell 87"             , b"224237" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_88':               SignalSpec("Cell 88"             , b"224238" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_89':               SignalSpec("Cell 89"             , b"224239" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_90':               SignalSpec("Cell 90"             , b"22423a" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_91':               SignalSpec("Cell 91"             , b"22423b" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_92':               SignalSpec("Cell 92"             , b"22423c" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_93':               SignalSpec("Cell 93"             , b"22423d" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_94':               SignalSpec("Cell 94"             , b"22423e" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_95':               SignalSpec("Cell 95"             , b"22423f" , 3, 2, False, 5 / 65535,    0,   "V"),
+    'BAT_CELL_VOLT_96':               SignalSpec("Cell 96"             , b"224240" , 3, 2, False, 5 / 65535,    0,   "V"),
+}
+
+for name, spec in signal_catalog.items():
+    ext_commands[name] = OBDCommand(name, spec.description, spec.command, 0, compile_decoder(spec), ECU.ALL, False)
+
+
+# CAN header and receive address commands that select each ECU
+ECU_7E0 = ("CAN_HEADER_7E0", "CAN_RECEIVE_ADDRESS_7E8")
+ECU_7E1 = ("CAN_HEADER_7E1", "CAN_RECEIVE_ADDRESS_7E9")
+ECU_7E4 = ("CAN_HEADER_7E4", "CAN_RECEIVE_ADDRESS_7EC")
+ECU_7E7 = ("CAN_HEADER_7E7", "CAN_RECEIVE_ADDRESS_7EF")
+
+# ECU that answers each of the ext_commands queries
+ext_command_ecus = {
+    'BAT_PACK_CAP_AH_RAW_2018':         ECU_7E4,
+    'BAT_PACK_CAP_AH_RAW_2019':         ECU_7E4,
+    'BAT_PACK_CAP_KWH_EST_2018':        ECU_7E4,
+    'BAT_PACK_CAP_KWH_EST_2019':        ECU_7E4,
+    'BAT_PACK_SOC_DISP':                ECU_7E4,
+    'BAT_PACK_SOC_RAW_HD':              ECU_7E4,
+    'BAT_PACK_SOC_RAW_LD':              ECU_7E0,
+    'BAT_PACK_SOC_RAW_LD2':             ECU_7E1,
+    'BAT_PACK_SOC_RAW_LD3':             ECU_7E4,
+    'BAT_PACK_SOC_VAR':                 ECU_7E4,
+    'BAT_PACK_CURRENT_HD':              ECU_7E7,
+    'BAT_PACK_NUM_CHARGES':             ECU_7E4,
+    'BAT_MOD_TEMP_1':                   ECU_7E7,
+    'BAT_MOD_TEMP_2':                   ECU_7E7,
+    'BAT_MOD_TEMP_3':                   ECU_7E7,
+    'BAT_MOD_TEMP_4':                   ECU_7E7,
+    'BAT_MOD_TEMP_5':                   ECU_7E7,
+    'BAT_MOD_TEMP_6':                   ECU_7E7,
+    'BAT_MOD_TEMP_MAX':                 ECU_7E4,
+    'BAT_MOD_TEMP_MIN':                 ECU_7E4,
+    'BAT_MOD_TEMP_AVG':                 ECU_7E4,
+    'BAT_CELL_VOLT_MIN':                ECU_7E4,
+    'BAT_CELL_VOLT_MIN_NUM':            ECU_7E4,
+    'BAT_CELL_VOLT_MAX':                ECU_7E4,
+    'BAT_CELL_VOLT_MAX_NUM':            ECU_7E4,
+    'BAT_CELL_VOLT_AVG':                ECU_7E7,
+    'BAT_PACK_RESISTANCE':              ECU_7E4,
+    'BAT_PACK_VOLT_MIN':                ECU_7E4,
+    'BAT_PACK_VOLT_MAX':                ECU_7E4,
+    'HV_CURRENT_HD':                    ECU_7E4,
+    'HV_CURRENT':                       ECU_7E4,
+    'AMBIENT_AIR_TEMP':                 ECU_7E4,
+}
+
+for cell in range(1, 97):
+    ext_command_ecus['BAT_CELL_VOLT_{:02d}'.format(cell)] = ECU_7E7
+
+# Payload size in bytes of the DIDs that can be packed into multi-DID requests
+ext_command_data_bytes = {}
 
+for cell in range(1, 97):
+    ext_command_data_bytes['BAT_CELL_VOLT_{:02d}'.format(cell)] = 2
+
+# Polling priority class of each signal, everything else is polled as 'normal'
+ext_command_priorities = {
+    'BAT_PACK_CURRENT_HD':              'high',
+    'BAT_PACK_SOC_DISP':                'high',
+    'BAT_PACK_SOC_RAW_HD':              'high',
+    'BAT_PACK_VOLT_MIN':                'high',
+    'BAT_PACK_VOLT_MAX':                'high',
+    'HV_CURRENT_HD':                    'high',
+    'BAT_PACK_CAP_AH_RAW_2018':         'low',
+    'BAT_PACK_CAP_AH_RAW_2019':         'low',
+    'BAT_PACK_CAP_KWH_EST_2018':        'low',
+    'BAT_PACK_CAP_KWH_EST_2019':        'low',
+    'BAT_PACK_NUM_CHARGES':             'low',
+    'BAT_PACK_RESISTANCE':              'low',
+}
+
+# Signals a snapshot is not worth much without, queried first and even
+# past the cycle deadline
+critical_signals = (
+    'BAT_PACK_SOC_DISP',
+    'BAT_PACK_SOC_RAW_HD',
+    'BAT_PACK_CURRENT_HD',
+    'BAT_CELL_VOLT_MIN',
+    'BAT_CELL_VOLT_MAX',
+)
+
+# Query attempts of each signal before giving up on it, everything else gets DEFAULT_ATTEMPTS.
+# Only one DID of each capacity pair exists on a given model year, so the
+# other one is not worth retrying.
+DEFAULT_ATTEMPTS = 3
+
+ext_command_attempts = {
+    'BAT_PACK_CAP_AH_RAW_2018':         1,
+    'BAT_PACK_CAP_AH_RAW_2019':         1,
+    'BAT_PACK_CAP_KWH_EST_2018':        1,
+    'BAT_PACK_CAP_KWH_EST_2019':        1,
 }
+
+# Default refresh interval in seconds of each priority class
+priority_intervals = {
+    'high':   0.25,
+    'normal': 10,
+    'low':    900,
+}
+
+
+def shared_requests(names):
+    """
+        Group signals that are decoded from the same request.
+
+        Several signals read the same DID on the same ECU and only differ
+        in how the answer is decoded. Returns a dict of (ecu, command
+        bytes) -> [names], in the order the requests first appear, so each
+        request only has to go on the bus once.
+    """
+    requests = {}
+    for name in names:
+        key = (ext_command_ecus.get(name), ext_commands[name].command)
+        requests.setdefault(key, []).append(name)
+    return requests
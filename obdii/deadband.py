@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger('obdii.deadband')
+
+
+class ChangeFilter:
+    """
+        Decides which signals are worth publishing on their own topic.
+
+        A numeric signal is published when it moved more than its deadband
+        since the last published value, the deadband being the larger of
+        the absolute one and the relative one times the last value. Other
+        values are published whenever they change. A signal that was read
+        again but did not move is republished every heartbeat seconds, so
+        consumers can tell a stable value from one that is no longer read.
+
+        signal_deadbands overrides the deadbands of single signals:
+
+            {"BAT_CELL_VOLT_01": {"absolute": 0.005}}
+
+        With a path, the last published values are kept on disk so one-shot
+        runs only publish what changed since the previous run.
+    """
+
+    def __init__(self, absolute=0.0, relative=0.0, signal_deadbands=None, heartbeat=300, path=None, clock=time.time):
+        self.absolute = absolute
+        self.relative = relative
+        self.signal_deadbands = signal_deadbands or {}
+        self.heartbeat = heartbeat
+        self.path = path
+        self.clock = clock
+        self.published = {}  # name -> [value, time published]
+        if path is not None:
+            try:
+                with open(path) as state_file:
+                    self.published = json.loads(state_file.read())
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as err:
+                logger.warning("Ignoring unreadable publish state {}: {}".format(path, err))
+
+    def deadband(self, name):
+        """Return the (absolute, relative) deadband of a signal."""
+        deadband = self.signal_deadbands.get(name, {})
+        return float(deadband.get('absolute', self.absolute)), float(deadband.get('relative', self.relative))
+
+    def moved(self, name, value):
+        """Tell whether value differs enough from the last published value of the signal."""
+        if name not in self.published:
+            return True
+        last = self.published[name][0]
+        numeric = (isinstance(value, (int, float)) and isinstance(last, (int, float))
+                   and not isinstance(value, bool) and not isinstance(last, bool))
+        if not numeric:
+            return value != last
+        absolute, relative = self.deadband(name)
+        return abs(value - last) > max(absolute, relative * abs(last))
+
+    def select(self, values, now=None):
+        """
+            Return the subset of values to publish now and remember it as published.
+
+            values should only hold signals that were just read, a signal
+            missing from it is never republished by the heartbeat.
+        """
+        now = self.clock() if now is None else now
+        selected = {}
+        for name, value in values.items():
+            if self.moved(name, value) or now - self.published[name][1] >= self.heartbeat:
+                selected[name] = value
+                self.published[name] = [value, now]
+        return selected
+
+    def messages(self, values, topic_prefix, now=None):
+        """Build one retained message per signal to publish, on topic_prefix + signal name."""
+        return [{'topic': topic_prefix + name.lower(),
+                 'payload': json.dumps(value),
+                 'qos': 0,
+                 'retain': True}
+                for name, value in self.select(values, now).items()]
+
+    def save(self):
+        """Write the last published values to disk, if there is a path."""
+        if self.path is None:
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as state_file:
+                state_file.write(json.dumps(self.published))
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            logger.warning("Could not save publish state {}: {}".format(self.path, err))
@@ -1,137 +1,54 @@
-from obd.utils import bytes_to_int
-from utils import bytes_to_int_signed
-
-
-def bat_pack_cap_ah_raw_2018(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((A*256)+B)/10
-    return ((d[3]*256)+d[4])/10
-
-def bat_pack_cap_ah_raw_2019(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((A*256)+B)/100
-    return ((d[3]*256)+d[4])/100
-
-def bat_pack_cap_kwh_est_2018(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((A*256)+B)*0.032
-    return ((d[3]*256)+d[4])*0.032
-
-def bat_pack_cap_kwh_est_2019(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((A*256)+B)*0.0032
-    return ((d[3]*256)+d[4])*0.0032
-
-def bat_pack_soc_disp(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #A*100/255
-    return d[3]*100/255
-
-def bat_pack_soc_raw_hd(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((((A*256)+B)*100)/65535)
-    return ((((d[3]*256)+d[4])*100)/65535)
-
-def bat_pack_soc_raw_ld_var(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #A/2.55
-    return d[3]/2.55
-
-def bat_pack_current_hd(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((Signed(A)*256)+B)/20
-    return ((bytes_to_int_signed(d[3])*256)+d[4])/20
-
-def bat_pack_num_charges(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((A<8)+B)
-    return ((d[3]<8)+d[4])
-
-def bat_mod_temp(messages): 
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #A-40
-    return d[3]-40
-
-def bat_cell_volt_min_max(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((A*256)+B)/1666.666
-    return ((d[3]*256)+d[4])/1666.666
-
-def bat_cell_volt_min_max_num(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #A
-    return d[3]
-
-def bat_cell_volt_avg(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((A*256)+B)*5/65535
-    return ((d[3]*256)+d[4])*5/65535
-
-def bat_pack_resistance(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((A*256)+B)/2
-    return ((d[3]*256)+d[4])/2
-
-def bat_pack_volt_min_max(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((A*256)+B)*0.52
-    return ((d[3]*256)+d[4])*0.52
-
-def hv_current_hd(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #(Signed(A)*256+B)/20
-    return (bytes_to_int_signed(d[3])*256+d[4])/20
-
-def hv_current(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #(Signed(A)*256+B)/(-6.675)
-    return (bytes_to_int_signed(d[3])*256+d[4])/(-6.675)
-
-def ambient_air_temp(messages): 
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #(A-40)
-    return d[3]-40
-
-def bat_cell_volt(messages):
-    d=messages[0].data
-    if len(d) == 0:
-        return None
-    #((A*256)+B)*5/65535
-    return ((d[3]*256)+d[3])*5/65535
-
+import struct
+from collections import namedtuple
+
+# Declarative description of a numeric signal: the answer to command holds
+# a big endian integer of length bytes at offset byte (counted from the
+# first byte of the response, e.g. 62 41 81 A B has A at byte 3), and the
+# value is raw * scale + offset, in unit.
+SignalSpec = namedtuple('SignalSpec', 'description command byte length signed scale offset unit')
+
+STRUCT_FORMATS = {(1, False): 'B', (1, True): 'b',
+                  (2, False): 'H', (2, True): 'h',
+                  (4, False): 'I', (4, True): 'i'}
+
+
+def compile_decoder(spec):
+    """
+        Build the decoder of a SignalSpec.
+
+        Everything that does not depend on the answer is worked out here,
+        once: the struct format, the end of the field and whether the
+        scale is better applied as a division by a short decimal (/10 or
+        /2.55 rather than *0.1 or *0.39215... keeps the published values
+        free of rounding noise). The decoder reads the field with
+        struct.unpack_from straight from the message buffer, bytearray or
+        memoryview, without slicing it.
+    """
+    unpack_from = struct.Struct('>' + STRUCT_FORMATS[(spec.length, spec.signed)]).unpack_from
+    start = spec.byte
+    end = spec.byte + spec.length
+    offset = spec.offset
+    scale = spec.scale
+    divisor = round(1 / scale, 6) if scale != 0 else 0
+    if divisor and abs(1 / scale - divisor) < 1e-9 and divisor not in (1, -1):
+        def decoder(messages):
+            d = messages[0].data
+            if len(d) < end:
+                return None
+            return unpack_from(d, start)[0] / divisor + offset
+    else:
+        def decoder(messages):
+            d = messages[0].data
+            if len(d) < end:
+                return None
+            return unpack_from(d, start)[0] * scale + offset
+
+    return decoder
+
+
+def vin(messages):
+    d=messages[0].data
+    if len(d) == 0:
+        return None
+    #49 02 01 + 17 ASCII characters
+    return bytes(d[3:]).decode('ascii', 'ignore').strip('\x00 ')
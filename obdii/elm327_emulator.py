@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+    ELM327 emulator on a pseudo-terminal, for development and benchmarks
+    without a car.
+
+        python3 obdii/elm327_emulator.py [--model vehicle.json]
+
+    prints the pty to use as serial.port and answers until interrupted.
+"""
+
+import argparse
+import json
+import logging
+import os
+import pty
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+from commands import ext_command_ecus, signal_catalog
+from decoders import STRUCT_FORMATS
+
+logger = logging.getLogger('obdii.elm327_emulator')
+
+# Physical value of every signal in the default vehicle model
+DEFAULT_VALUES = {
+    'BAT_PACK_CAP_AH_RAW_2018': 165.6,
+    'BAT_PACK_CAP_AH_RAW_2019': 165.6,
+    'BAT_PACK_CAP_KWH_EST_2018': 53.0,
+    'BAT_PACK_CAP_KWH_EST_2019': 53.0,
+    'BAT_PACK_SOC_DISP': 62.7,
+    'BAT_PACK_SOC_RAW_HD': 61.2,
+    'BAT_PACK_SOC_RAW_LD': 61.2,
+    'BAT_PACK_SOC_RAW_LD2': 61.2,
+    'BAT_PACK_SOC_RAW_LD3': 61.2,
+    'BAT_PACK_SOC_VAR': 1.2,
+    'BAT_PACK_CURRENT_HD': -12.5,
+    'BAT_PACK_NUM_CHARGES': 412,
+    'BAT_MOD_TEMP_MAX': 24,
+    'BAT_MOD_TEMP_MIN': 21,
+    'BAT_MOD_TEMP_AVG': 22,
+    'BAT_CELL_VOLT_MIN': 3.84,
+    'BAT_CELL_VOLT_MIN_NUM': 17,
+    'BAT_CELL_VOLT_MAX': 3.87,
+    'BAT_CELL_VOLT_MAX_NUM': 52,
+    'BAT_CELL_VOLT_AVG': 3.855,
+    'BAT_PACK_RESISTANCE': 110,
+    'BAT_PACK_VOLT_MIN': 369.0,
+    'BAT_PACK_VOLT_MAX': 371.6,
+    'HV_CURRENT_HD': -12.5,
+    'HV_CURRENT': 12.4,
+    'AMBIENT_AIR_TEMP': 18,
+}
+for _module in range(1, 7):
+    DEFAULT_VALUES['BAT_MOD_TEMP_{}'.format(_module)] = 21 + _module % 3
+for _cell in range(1, 97):
+    DEFAULT_VALUES['BAT_CELL_VOLT_{:02d}'.format(_cell)] = 3.855 + ((_cell * 7) % 11 - 5) * 0.003
+
+DEFAULT_LATENCY = {'7E0': 0.015, '7E1': 0.02, '7E4': 0.03, '7E7': 0.045}
+
+# Broadcast frames shown in monitor mode (ATMA). Made up for the emulator, not
+# taken from a Bolt: 3E9 holds the README example (BAT_PACK_CURRENT_HD -12.5 A
+# at byte 0), the others are traffic the monitor filter should keep out.
+DEFAULT_BROADCAST = [
+    {'id': '3E9', 'data': 'FF06000000000000', 'period': 0.02},
+    {'id': '0C9', 'data': '0102030405060708', 'period': 0.01},
+    {'id': '1F5', 'data': '0300000000000000', 'period': 0.05},
+]
+
+# Supported PID masks for python-obd's probing, 015B is the only mode 01 PID answered
+SUPPORTED_PIDS = {'00': 'BE1FA813', '20': '80000001', '40': '00000020'}
+
+
+class VehicleModel:
+    """
+        What the emulated car answers.
+
+        values maps signal names to physical values, they are encoded back
+        through signal_catalog, so every DID answers with exactly the
+        bytes its decoder expects. unsupported lists signals that answer
+        NO DATA (e.g. the other model year's capacity DIDs). latency maps
+        ECU headers to their mean response time in seconds. broadcast
+        lists the frames sent on the bus every period seconds, as
+        {"id", "data" (hex), "period"} dicts.
+    """
+
+    def __init__(self, values=None, unsupported=(), latency=None, vin="1G1FW6S08H4000000", broadcast=None):
+        self.broadcast = [(int(frame['id'], 16), bytes.fromhex(frame['data']), float(frame['period']))
+                          for frame in (DEFAULT_BROADCAST if broadcast is None else broadcast)]
+        self.values = dict(DEFAULT_VALUES)
+        self.values.update(values or {})
+        self.latency = dict(DEFAULT_LATENCY)
+        self.latency.update(latency or {})
+        self.vin = vin
+        self.dids = {}  # (ECU header, request hex) -> payload bytes after the echoed request
+        for name, spec in signal_catalog.items():
+            if name in unsupported or name not in self.values:
+                continue
+            header = ext_command_ecus[name][0][-3:]
+            request = spec.command.decode().upper()
+            key = (header, request)
+            payload = bytearray(self.dids.get(key, b""))
+            payload += bytes(max(0, spec.byte + spec.length - len(request) // 2 - len(payload)))
+            raw = int(round((self.values[name] - spec.offset) / spec.scale))
+            if not spec.signed:
+                raw = max(0, raw)
+            struct.pack_into('>' + STRUCT_FORMATS[(spec.length, spec.signed)], payload,
+                             spec.byte - len(request) // 2, raw)
+            self.dids[key] = bytes(payload)
+
+    @classmethod
+    def load(cls, path):
+        """Read a model from a JSON file with optional values, unsupported, latency, vin and broadcast keys."""
+        with open(path) as model_file:
+            model = json.loads(model_file.read())
+        return cls(values=model.get('values'), unsupported=model.get('unsupported', ()),
+                   latency=model.get('latency'), vin=model.get('vin', "1G1FW6S08H4000000"),
+                   broadcast=model.get('broadcast'))
+
+    def answer(self, header, request):
+        """Return the positive response bytes for a request sent to header, None if it is not answered."""
+        if request[:2] == '22' and len(request) > 6:  # multi-DID
+            answer = bytearray(b"\x62")
+            for pos in range(2, len(request), 4):
+                payload = self.dids.get((header, '22' + request[pos:pos + 4]))
+                if payload is not None:
+                    answer += bytes.fromhex(request[pos:pos + 4]) + payload
+            return bytes(answer) if len(answer) > 1 else bytes.fromhex("7F2231")
+        if request == '0902' and header == '7E0':
+            return bytes.fromhex("490201") + self.vin.encode()
+        if request[:2] == '01' and request[2:] in SUPPORTED_PIDS and header == '7E0':
+            return bytes.fromhex("41" + request[2:] + SUPPORTED_PIDS[request[2:]])
+        payload = self.dids.get((header, request))
+        if payload is None:
+            return None
+        return bytes([int(request[:2], 16) + 0x40]) + bytes.fromhex(request[2:]) + payload
+
+
+class ELM327Emulator:
+    """
+        Answers like an ELM327 v1.5 connected to the emulated car.
+
+        Implements the AT commands this project and python-obd use, UDS
+        service 0x22 (single and multi-DID), VIN and PID support probing.
+        Answers longer than 7 bytes are split into ISO-TP frames. Each
+        ECU answers after its latency (with jitter); without a frame count
+        appended to the request, the adapter then waits for its ATST
+        timeout like the real one. no_data_rate, can_error_rate and
+        bus_busy_rate inject failures.
+
+        ATMA prints the model's broadcast frames that pass the ATCF/ATCM
+        filter until a character comes in, or BUFFER FULL after
+        monitor_limit frames. With CAN auto formatting on (ATCAF1, the
+        default) frames are read as ISO-TP single frames: the PCI byte is
+        stripped and frames without a valid one are dropped. ST commands
+        are answered ?, like an ELM327 and unlike an STN chip.
+    """
+
+    def __init__(self, model=None, no_data_rate=0.0, can_error_rate=0.0, bus_busy_rate=0.0, jitter=0.2, seed=None,
+                 monitor_limit=None):
+        self.model = model or VehicleModel()
+        self.no_data_rate = no_data_rate
+        self.can_error_rate = can_error_rate
+        self.bus_busy_rate = bus_busy_rate
+        self.jitter = jitter
+        self.monitor_limit = monitor_limit
+        self.random = random.Random(seed)
+        self.master = None
+        self.port = None
+        self.requests = 0  # non AT commands answered, for benchmarks
+        self.reset()
+
+    def reset(self):
+        self.echo = True
+        self.headers = False
+        self.spaces = True
+        self.linefeeds = False
+        self.header = '7DF'
+        self.receive_address = None
+        self.timeout = 0x32 * 0.004096
+        self.auto_format = True
+        self.can_filter = 0
+        self.can_mask = 0  # no bit has to match, everything passes
+
+    def start(self):
+        """Open the pty and answer in a background thread. Returns the port name to connect to."""
+        self.master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        threading.Thread(target=self.__run, name='elm327-emulator', daemon=True).start()
+        return self.port
+
+    def handle(self, line):
+        """Return the adapter output (without the prompt) for one command line."""
+        command = line.replace(' ', '').upper()
+        out = [line] if self.echo else []
+        if command.startswith('AT'):
+            out.append(self.__at(command[2:]))
+        elif command.startswith('ST'):
+            out.append('?')
+        elif command == '':
+            out.append('?')
+        else:
+            out += self.__request(command)
+        eol = '\r\n' if self.linefeeds else '\r'
+        return eol.join(out) + eol + eol
+
+    def __at(self, command):
+        if command == 'Z':
+            time.sleep(0.05)
+            self.reset()
+            return '\r\rELM327 v1.5'
+        if command == 'WS':
+            self.reset()
+            return '\r\rELM327 v1.5'
+        if command == 'I':
+            return 'ELM327 v1.5'
+        if command == 'RV':
+            return '12.{}V'.format(self.random.randint(3, 9))
+        if command == 'DPN':
+            return 'A6'
+        if command == '@1':
+            return 'OBDII to RS232 Interpreter'
+        settings = {'E0': ('echo', False), 'E1': ('echo', True), 'H0': ('headers', False), 'H1': ('headers', True),
+                    'S0': ('spaces', False), 'S1': ('spaces', True), 'L0': ('linefeeds', False), 'L1': ('linefeeds', True)}
+        if command in settings:
+            setattr(self, *settings[command])
+            return 'OK'
+        if command.startswith('SH'):
+            self.header = command[2:][-3:]
+            return 'OK'
+        if command.startswith('CRA'):
+            self.receive_address = command[3:] or None
+            return 'OK'
+        if command == 'AR':
+            self.receive_address = None
+            self.can_filter = self.can_mask = 0
+            return 'OK'
+        if command in ('CAF0', 'CAF1'):
+            self.auto_format = command == 'CAF1'
+            return 'OK'
+        if command.startswith('CF') or command.startswith('CM'):
+            try:
+                value = int(command[2:], 16) & 0x7FF
+            except ValueError:
+                return '?'
+            setattr(self, 'can_filter' if command.startswith('CF') else 'can_mask', value)
+            return 'OK'
+        if command.startswith('ST'):
+            self.timeout = int(command[2:], 16) * 0.004096 or 0x32 * 0.004096
+            return 'OK'
+        if command[:2] in ('SP', 'TP', 'AT', 'PC', 'D0', 'D1') or command in ('D', 'PC'):
+            return 'OK'
+        return '?'
+
+    def __request(self, command):
+        if any(c not in '0123456789ABCDEF' for c in command):
+            return ['?']
+        self.requests += 1
+        counted = len(command) % 2 == 1  # frame count appended, the adapter returns as soon as it has them
+        request = command[:-1] if counted else command
+        header = '7E0' if self.header == '7DF' else self.header  # functional requests are answered by the ECM
+        responder = '{:03X}'.format(int(header, 16) + 8)
+
+        latency = self.model.latency.get(header, 0.03) * (1 + self.random.uniform(-self.jitter, self.jitter))
+        roll = self.random.random()
+        if roll < self.can_error_rate:
+            time.sleep(latency)
+            return ['CAN ERROR']
+        if roll < self.can_error_rate + self.bus_busy_rate:
+            return ['BUS BUSY']
+        answer = self.model.answer(header, request)
+        if (answer is None or roll < self.can_error_rate + self.bus_busy_rate + self.no_data_rate
+                or (self.receive_address is not None and self.receive_address != responder)):
+            time.sleep(self.timeout)
+            return ['NO DATA']
+
+        time.sleep(latency if counted else latency + self.timeout)
+        return [self.__frame(responder, frame) for frame in self.__iso_tp(answer)]
+
+    def __frame(self, responder, data):
+        hex_bytes = ['{:02X}'.format(b) for b in data]
+        text = (' ' if self.spaces else '').join(hex_bytes)
+        if self.headers:
+            return responder + (' ' if self.spaces else '') + text
+        return text
+
+    @staticmethod
+    def __iso_tp(answer):
+        if len(answer) <= 7:
+            return [bytes([len(answer)]) + answer]
+        frames = [bytes([0x10 | (len(answer) >> 8), len(answer) & 0xFF]) + answer[:6]]
+        for index, pos in enumerate(range(6, len(answer), 7)):
+            frames.append(bytes([0x20 | ((index + 1) & 0x0F)]) + answer[pos:pos + 7])
+        return frames
+
+    def __monitor_frame(self, can_id, data):
+        """The ATMA line for a broadcast frame, None if the filter or auto formatting drops it."""
+        if (can_id & self.can_mask) != (self.can_filter & self.can_mask):
+            return None
+        if self.auto_format:
+            if not data or not 0 < data[0] <= min(7, len(data) - 1):
+                return None
+            data = data[1:data[0] + 1]
+        return self.__frame('{:03X}'.format(can_id), data)
+
+    def __monitor(self, line):
+        """Run ATMA until a character comes in. Returns the input after the one that stopped it."""
+        if self.echo:
+            os.write(self.master, (line + '\r').encode())
+        due = [time.monotonic()] * len(self.model.broadcast)
+        shown = 0
+        while True:
+            readable, _, _ = select.select([self.master], [], [], 0.005)
+            if readable:
+                rest = os.read(self.master, 1024)[1:]
+                os.write(self.master, b'\r>')
+                return rest
+            now = time.monotonic()
+            out = []
+            for index, (can_id, data, period) in enumerate(self.model.broadcast):
+                if now < due[index]:
+                    continue
+                due[index] = now + period
+                frame = self.__monitor_frame(can_id, data)
+                if frame is not None:
+                    out.append(frame)
+            if self.monitor_limit is not None and shown + len(out) > self.monitor_limit:
+                out = out[:self.monitor_limit - shown] + ['BUFFER FULL']
+                os.write(self.master, ('\r'.join(out) + '\r\r>').encode())
+                return b''
+            shown += len(out)
+            if out:
+                os.write(self.master, ('\r'.join(out) + '\r').encode())
+
+    def __run(self):
+        buffer = b''
+        while True:
+            try:
+                data = os.read(self.master, 1024)
+            except OSError:
+                return
+            buffer += data
+            while b'\r' in buffer:
+                line, buffer = buffer.split(b'\r', 1)
+                line = line.replace(b'\n', b'').replace(b'\x7f', b'').decode('ascii', 'ignore').strip()
+                if line.replace(' ', '').upper() == 'ATMA':
+                    buffer += self.__monitor(line)
+                    continue
+                output = self.handle(line)
+                logger.debug("{} -> {}".format(repr(line), repr(output)))
+                os.write(self.master, output.encode() + b'>')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate an ELM327 adapter connected to a Chevy Bolt EV on a pty.")
+    parser.add_argument('--model', help="JSON vehicle model (values, unsupported, latency, vin)")
+    parser.add_argument('--no-data-rate', type=float, default=0.0, help="share of requests answered NO DATA")
+    parser.add_argument('--can-error-rate', type=float, default=0.0, help="share of requests answered CAN ERROR")
+    parser.add_argument('--bus-busy-rate', type=float, default=0.0, help="share of requests answered BUS BUSY")
+    parser.add_argument('--seed', type=int, default=None, help="random seed for latency jitter and errors")
+    parser.add_argument('--verbose', action='store_true', help="log every command")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(name)-10s %(levelname)-8s %(message)s")
+    model = VehicleModel.load(args.model) if args.model else VehicleModel()
+    emulator = ELM327Emulator(model, no_data_rate=args.no_data_rate, can_error_rate=args.can_error_rate,
+                              bus_busy_rate=args.bus_busy_rate, seed=args.seed)
+    logger.info("ELM327 emulator listening on {}".format(emulator.start()))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
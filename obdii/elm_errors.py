@@ -0,0 +1,179 @@
+import logging
+import random
+from collections import namedtuple
+
+from obd import OBDCommand
+from obd.decoders import raw_string
+from obd.protocols import ECU
+
+logger = logging.getLogger('obdii.elm_errors')
+
+
+class OBDIIConnectionError(Exception):
+    pass
+
+
+class CanError(Exception):
+    pass
+
+
+class UnknownCommand(ValueError):
+    """The adapter answered ?, it doesn't support the command (clones reject frame counts or ATST this way)."""
+    pass
+
+
+class AdapterReset(ValueError):
+    """The adapter was warm started, its header, receive address and timeout are back to their defaults."""
+    pass
+
+
+# What went wrong with a query
+NO_DATA = 'NO DATA'
+CAN_ERROR = 'CAN ERROR'
+BUS_BUSY = 'BUS BUSY'
+BUFFER_FULL = 'BUFFER FULL'
+STOPPED = 'STOPPED'
+UNKNOWN_COMMAND = '?'
+ADAPTER_RESTARTED = 'ADAPTER RESTARTED'  # LV RESET, ACT ALERT: the adapter reset itself
+NEGATIVE_RESPONSE = 'NEGATIVE RESPONSE'  # 7F: the ECU refused the request
+ECU_BUSY = 'ECU BUSY'  # 7F busyRepeatRequest or responsePending
+NO_RESPONSE = 'NO RESPONSE'  # nothing from the adapter, or the transport failed
+INVALID = 'INVALID'  # an answer that doesn't decode
+
+# Adapter messages, by the start of the line
+ELM_MESSAGES = (
+    ('NO DATA', NO_DATA),
+    ('CAN ERROR', CAN_ERROR),
+    ('BUS ERROR', CAN_ERROR),
+    ('FB ERROR', CAN_ERROR),
+    ('DATA ERROR', CAN_ERROR),
+    ('<DATA ERROR', CAN_ERROR),
+    ('<RX ERROR', CAN_ERROR),
+    ('UNABLE TO CONNECT', CAN_ERROR),
+    ('ERR', CAN_ERROR),  # ERRxx internal errors, e.g. ERR94 after a fatal CAN error
+    ('BUS BUSY', BUS_BUSY),
+    ('BUFFER FULL', BUFFER_FULL),
+    ('STOPPED', STOPPED),
+    ('LV RESET', ADAPTER_RESTARTED),
+    ('ACT ALERT', ADAPTER_RESTARTED),
+    ('?', UNKNOWN_COMMAND),
+)
+
+NEGATIVE_RESPONSE_SID = 0x7F
+BUSY_NRCS = (0x21, 0x78)  # busyRepeatRequest, requestCorrectlyReceived-ResponsePending
+
+WARM_START = OBDCommand("WARM_START", "Warm start the adapter", b"ATWS", 0, raw_string, ECU.UNKNOWN, False)
+PROTOCOL_CLOSE = OBDCommand("PROTOCOL_CLOSE", "Close the OBD protocol", b"ATPC", 0, raw_string, ECU.UNKNOWN, False)
+
+# retry: whether another attempt is worth it, backoff: (min, max) jittered
+# delay in seconds, times the attempt number, recovery: adapter command sent
+# once before retrying, exception: raised when giving up
+ErrorPolicy = namedtuple('ErrorPolicy', 'retry backoff recovery exception')
+
+ERROR_POLICIES = {
+    # Unsupported DID or ECU asleep, asking again won't help this cycle
+    NO_DATA:            ErrorPolicy(False, (0, 0),       None,           ValueError),
+    NEGATIVE_RESPONSE:  ErrorPolicy(False, (0, 0),       None,           ValueError),
+    # The adapter doesn't know the command, it will answer the same again
+    UNKNOWN_COMMAND:    ErrorPolicy(False, (0, 0),       None,           UnknownCommand),
+    # Contention, the bus or ECU will be free in a moment
+    BUS_BUSY:           ErrorPolicy(True,  (0.05, 0.15), None,           CanError),
+    ECU_BUSY:           ErrorPolicy(True,  (0.05, 0.15), None,           ValueError),
+    BUFFER_FULL:        ErrorPolicy(True,  (0.02, 0.05), None,           ValueError),
+    STOPPED:            ErrorPolicy(True,  (0, 0.02),    None,           ValueError),
+    INVALID:            ErrorPolicy(True,  (0.05, 0.15), None,           ValueError),
+    # CAN controller trouble, reopening the protocol resets it
+    CAN_ERROR:          ErrorPolicy(True,  (0.1, 0.3),   PROTOCOL_CLOSE, CanError),
+    # The adapter is wedged or lost its settings
+    ADAPTER_RESTARTED:  ErrorPolicy(True,  (0, 0),       WARM_START,     ValueError),
+    NO_RESPONSE:        ErrorPolicy(True,  (0, 0),       WARM_START,     ValueError),
+}
+
+# Longest backoff before a second attempt, the planner budgets retries with it
+MAX_BACKOFF = max(policy.backoff[1] for policy in ERROR_POLICIES.values() if policy.retry)
+
+
+def classify_line(line):
+    """Return the error an adapter output line reports, None if it isn't one."""
+    line = line.strip().upper()
+    for message, error in ELM_MESSAGES:
+        if line.startswith(message):
+            return error
+    return None
+
+
+def response_error(response):
+    """
+        Return what went wrong with a response, None if it holds a valid answer.
+
+        Adapter messages end up in python-obd messages without data, one
+        per line, ECU negative responses in messages whose data starts
+        with 7F. A raw_string answer (AT commands) is only valid if none
+        of its lines is an adapter message.
+    """
+    if response is None or not response.messages:
+        return NO_RESPONSE
+    error = None
+    for message in response.messages:
+        if message.data:
+            if message.data[0] == NEGATIVE_RESPONSE_SID and len(message.data) >= 3:
+                error = error or (ECU_BUSY if message.data[2] in BUSY_NRCS else NEGATIVE_RESPONSE)
+            continue
+        for frame in message.frames:
+            error = error or classify_line(frame.raw)
+    valid = not (response.is_null() or response.value == "?" or response.value == "")
+    if valid and (error is None or any(message.data and message.data[0] != NEGATIVE_RESPONSE_SID
+                                       for message in response.messages)):
+        return None
+    return error or INVALID
+
+
+def backoff(policy, attempt):
+    """Seconds to wait before the next attempt, jittered so retries don't line up with the traffic they collided with."""
+    low, high = policy.backoff
+    return random.uniform(low, high) * attempt
+
+
+def init_commands(connection):
+    """The settings both transports open the adapter with, to restore after a warm start."""
+    if hasattr(connection, 'protocol_id'):
+        protocol = connection.protocol_id()  # python-obd
+    else:
+        protocol = connection.protocol.ELM_ID  # AsyncELM327
+    return [OBDCommand(name, name, command, 0, raw_string, ECU.UNKNOWN, False)
+            for name, command in (("ECHO_OFF", b"ATE0"), ("HEADERS_ON", b"ATH1"), ("LINEFEEDS_OFF", b"ATL0"),
+                                  ("SET_PROTOCOL", b"ATSP" + str(protocol).encode()))]
+
+
+def check_recovery(command, response):
+    if response is None or not response.messages or (command is not WARM_START and 'OK' not in str(response.value)):
+        raise OBDIIConnectionError("Adapter did not answer {} while recovering".format(command.command.decode()))
+
+
+def recover(connection, recovery):
+    """
+        Send a recovery command, restoring the adapter settings after a warm start.
+
+        Raises OBDIIConnectionError if the adapter doesn't answer, there
+        is nothing left to do but reconnect.
+    """
+    logger.warning("Recovering adapter with {}".format(recovery.command.decode()))
+    try:
+        for command in [recovery] + (init_commands(connection) if recovery is WARM_START else []):
+            check_recovery(command, connection.query(command, force=True))
+    except OBDIIConnectionError:
+        raise
+    except Exception as err:
+        raise OBDIIConnectionError("Adapter recovery failed: {}".format(err))
+
+
+async def async_recover(connection, recovery):
+    """recover() for an AsyncELM327 transport."""
+    logger.warning("Recovering adapter with {}".format(recovery.command.decode()))
+    try:
+        for command in [recovery] + (init_commands(connection) if recovery is WARM_START else []):
+            check_recovery(command, await connection.query(command))
+    except OBDIIConnectionError:
+        raise
+    except Exception as err:
+        raise OBDIIConnectionError("Adapter recovery failed: {}".format(err))
@@ -0,0 +1,94 @@
+import math
+
+from obd import OBDCommand
+from obd.decoders import raw_string
+from obd.protocols import ECU
+
+
+class FastPath:
+    """
+        ELM327 early-return tuning.
+
+        The adapter waits for its timeout after the last frame unless it is
+        told how many frames to expect. FastPath learns how many CAN frames
+        each command returns and appends that count to the command (e.g.
+        2241811), so the prompt comes back as soon as the answer is in.
+
+        It also tracks the response latency of each ECU and derives an ATST
+        value per ECU from it, so a query that gets no answer gives up
+        after a few multiples of the usual latency instead of the default
+        200 ms.
+
+        Adapters that answer ? to a frame count or to ATST don't support
+        them, counts_rejected() and timeouts_rejected() turn them off for
+        good.
+    """
+
+    ST_UNIT = 0.004096  # ATST is set in units of 4.096 ms
+    MAX_SAMPLE = 1.0  # slower answers went through retries, don't learn from them
+
+    def __init__(self, latency_factor=3.0, min_timeout=0.05, smoothing=0.2):
+        self.latency_factor = latency_factor
+        self.min_timeout = min_timeout
+        self.smoothing = smoothing
+        self.frame_counts = {}  # (ecu, command bytes) -> number of frames in the answer
+        self.latency = {}  # ecu -> smoothed response time in seconds
+        self.current_timeout = None  # ATST value the adapter is set to, None if unknown
+        self.counts_supported = True
+        self.timeouts_supported = True
+
+    def reset(self):
+        """Forget the adapter state, e.g. after an ATZ or reconnect."""
+        self.current_timeout = None
+
+    def command(self, ecu, command):
+        """Return the command with the expected frame count appended, if known."""
+        count = self.frame_counts.get((ecu, command.command)) if self.counts_supported else None
+        if count is None:
+            return command
+        fast_command = command.clone()
+        fast_command.command = command.command + b"%X" % count
+        return fast_command
+
+    def observe(self, ecu, command, response, elapsed, counted):
+        """Learn from a successful answer to command."""
+        frames = sum(len(m.frames) for m in response.messages if m.parsed())
+        if self.counts_supported and 0 < frames <= 0xF:
+            self.frame_counts[(ecu, command.command)] = frames
+
+        # Without a frame count the adapter waited for its timeout, so
+        # only answers that returned early tell us the real latency
+        if counted and elapsed < self.MAX_SAMPLE:
+            if ecu in self.latency:
+                self.latency[ecu] += self.smoothing * (elapsed - self.latency[ecu])
+            else:
+                self.latency[ecu] = elapsed
+
+    def failed(self, ecu, command):
+        """Stop counting frames for a command that failed, the count may be wrong."""
+        self.frame_counts.pop((ecu, command.command), None)
+
+    def counts_rejected(self):
+        """The adapter answered ? to a command with a frame count, send every command without one from now on."""
+        self.counts_supported = False
+        self.frame_counts.clear()
+
+    def timeouts_rejected(self):
+        """The adapter answered ? to ATST, leave its timeout alone from now on."""
+        self.timeouts_supported = False
+        self.current_timeout = None
+
+    def timeout(self, ecu):
+        """Return the ATST value for the ECU, or None while its latency is unknown."""
+        if ecu not in self.latency:
+            return None
+        seconds = max(self.min_timeout, self.latency[ecu] * self.latency_factor)
+        return min(0xFF, max(1, int(math.ceil(seconds / self.ST_UNIT))))
+
+    def timeout_command(self, ecu):
+        """Return the ATST command to send when switching to the ECU, or None if nothing changes."""
+        timeout = self.timeout(ecu) if self.timeouts_supported else None
+        if timeout is None or timeout == self.current_timeout:
+            return None
+        return OBDCommand("SET_TIMEOUT", "Set the ELM327 timeout to {} ms".format(int(timeout * self.ST_UNIT * 1000)),
+                          b"ATST%02X" % timeout, 0, raw_string, ECU.UNKNOWN, False)
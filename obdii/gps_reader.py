@@ -0,0 +1,122 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+
+import gps
+
+logger = logging.getLogger('obdii.gps_reader')
+
+# monotonic: when the report was received, time: GPS time of the fix (ISO 8601),
+# speed in m/s, track in degrees from true north, mode 2 = 2D fix, 3 = 3D fix,
+# eph: horizontal error estimate in meters (None if gpsd doesn't know)
+Fix = namedtuple('Fix', 'monotonic time lat lon alt speed track mode eph')
+
+
+class GPSReader:
+    """
+        Reads gpsd reports in a background thread and keeps the recent fixes.
+
+        The thread publishes the last keep fixes as one immutable tuple,
+        swapped in with a single assignment: latest() and nearest() never
+        take a lock or wait on gpsd, they use whichever tuple they pick
+        up. Reports without a 2D or 3D fix are ignored. The connection to
+        gpsd is retried every reconnect_delay seconds.
+
+        Only the socket layer of the gps package is used, reports are
+        parsed here: gps 3.19 passes encoding to json.loads(), which
+        Python 3.9 no longer accepts.
+    """
+
+    def __init__(self, host='127.0.0.1', port=2947, keep=64, max_age=2.0, reconnect_delay=5, clock=time.monotonic):
+        self.host = host
+        self.port = port
+        self.keep = keep
+        self.max_age = max_age
+        self.reconnect_delay = reconnect_delay
+        self.clock = clock
+        self.fixes = ((), ())  # (receipt times, fixes), oldest first
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name='gps-reader', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def latest(self):
+        """The last fix received, None if there is none yet."""
+        fixes = self.fixes[1]
+        return fixes[-1] if fixes else None
+
+    def nearest(self, when):
+        """The fix received closest to the time.monotonic() when, None if none is within max_age seconds."""
+        times, fixes = self.fixes
+        index = bisect_left(times, when)
+        candidates = fixes[max(index - 1, 0):index + 1]
+        if not candidates:
+            return None
+        fix = min(candidates, key=lambda candidate: abs(candidate.monotonic - when))
+        return fix if abs(fix.monotonic - when) <= self.max_age else None
+
+    def record(self, report):
+        """Keep a gpsd TPV report if it holds a fix."""
+        if report.get('class') != 'TPV' or report.get('mode', 0) < 2:
+            return
+        eph = report.get('eph')
+        if eph is None and 'epx' in report and 'epy' in report:
+            eph = max(report['epx'], report['epy'])
+        fix = Fix(self.clock(), report.get('time'), report.get('lat'), report.get('lon'), report.get('alt'),
+                  report.get('speed'), report.get('track'), report['mode'], eph)
+        times, fixes = self.fixes
+        self.fixes = (times[-(self.keep - 1):] + (fix.monotonic,), fixes[-(self.keep - 1):] + (fix,))
+
+    def run(self):
+        while not self.stopping.is_set():
+            session = None
+            try:
+                session = gps.gpscommon(self.host, self.port)
+                session.send('?WATCH={"enable":true,"json":true}')
+                logger.info("Connected to gpsd on {}:{}".format(self.host, self.port))
+                while not self.stopping.is_set():
+                    if not session.waiting(1.0):
+                        continue
+                    if session.read() == -1:
+                        raise ConnectionError("gpsd closed the connection")
+                    if session.response.startswith('{'):  # empty while a report is partially received
+                        self.record(json.loads(session.response))
+            except (OSError, ValueError) as err:
+                logger.warning("gpsd error: {}. Reconnecting in {} second(s)...".format(err, self.reconnect_delay))
+                self.stopping.wait(self.reconnect_delay)
+            finally:
+                if session is not None:
+                    session.close()
+
+
+def gps_signals(fix, when):
+    """
+        The fix as state signals, with its age relative to the sample taken at time.monotonic() when.
+
+        Without a fix, GPS_MODE is 0 and the other signals are None, so
+        a stale position is never published as current.
+    """
+    if fix is None:
+        return {'GPS_LAT': None, 'GPS_LON': None, 'GPS_ALT': None, 'GPS_SPEED': None, 'GPS_TRACK': None,
+                'GPS_MODE': 0, 'GPS_EPH': None, 'GPS_TIME': None, 'GPS_AGE': None}
+    return {'GPS_LAT': fix.lat,
+            'GPS_LON': fix.lon,
+            'GPS_ALT': fix.alt,
+            'GPS_SPEED': fix.speed,
+            'GPS_TRACK': fix.track,
+            'GPS_MODE': fix.mode,
+            'GPS_EPH': fix.eph,
+            'GPS_TIME': fix.time,
+            'GPS_AGE': round(when - fix.monotonic, 3)}
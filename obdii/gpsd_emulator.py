@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+    gpsd stand-in streaming a simulated drive, for development without a
+    GPS receiver.
+
+        python3 obdii/gpsd_emulator.py [--port 2947] [--rate 1]
+
+    answers ?WATCH like gpsd and streams TPV reports until interrupted.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import math
+import random
+import socketserver
+import threading
+import time
+
+logger = logging.getLogger('obdii.gpsd_emulator')
+
+EARTH_RADIUS = 6371000.0  # meters
+
+
+class Drive:
+    """A car circling at constant speed around a start point."""
+
+    def __init__(self, lat=42.3314, lon=-83.0458, radius=500.0, speed=13.9, clock=time.time):
+        self.lat = lat
+        self.lon = lon
+        self.radius = radius
+        self.speed = speed  # m/s
+        self.clock = clock
+        self.start = clock()
+
+    def tpv(self, mode=3):
+        now = self.clock()
+        angle = (now - self.start) * self.speed / self.radius
+        north, east = self.radius * math.sin(angle), self.radius * (1 - math.cos(angle))
+        return {'class': 'TPV',
+                'device': '/dev/ttyEMU0',
+                'mode': mode,
+                'time': datetime.datetime.utcfromtimestamp(now).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-4] + 'Z',
+                'lat': round(self.lat + math.degrees(north / EARTH_RADIUS), 7),
+                'lon': round(self.lon + math.degrees(east / (EARTH_RADIUS * math.cos(math.radians(self.lat)))), 7),
+                'alt': 190.0,
+                'speed': self.speed,
+                'track': round(math.degrees(math.atan2(math.cos(angle), math.sin(angle))) % 360, 1),
+                'epx': 3.5,
+                'epy': 4.1}
+
+
+class GPSDEmulator:
+    """
+        Answers gpsd clients on a TCP port.
+
+        Sends the VERSION banner on connect. After a ?WATCH enabling JSON,
+        streams DEVICES/WATCH and then a TPV report every 1 / rate seconds.
+        no_fix_rate is the share of reports without a fix (mode 1).
+    """
+
+    def __init__(self, drive=None, rate=1.0, no_fix_rate=0.0, host='127.0.0.1', port=0, seed=None):
+        self.drive = drive or Drive()
+        self.rate = rate
+        self.no_fix_rate = no_fix_rate
+        self.random = random.Random(seed)
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        """Listen in a background thread. Returns the port clients should connect to."""
+        emulator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                emulator.serve(self)
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True  # restarting on the same port, like gpsd
+            daemon_threads = True
+
+        self.server = Server((self.host, self.port), Handler)
+        threading.Thread(target=self.server.serve_forever, name='gpsd-emulator', daemon=True).start()
+        self.port = self.server.server_address[1]
+        return self.port
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def send(self, handler, report):
+        handler.wfile.write(json.dumps(report).encode() + b'\r\n')
+
+    def serve(self, handler):
+        try:
+            self.send(handler, {'class': 'VERSION', 'release': '3.19', 'rev': '3.19', 'proto_major': 3, 'proto_minor': 14})
+            line = handler.rfile.readline().decode('ascii', 'ignore')
+            if not line.startswith('?WATCH') or '"enable":true' not in line.replace(' ', ''):
+                return
+            self.send(handler, {'class': 'DEVICES', 'devices': [{'class': 'DEVICE', 'path': '/dev/ttyEMU0'}]})
+            self.send(handler, {'class': 'WATCH', 'enable': True, 'json': True})
+            while self.server is not None:
+                self.send(handler, self.drive.tpv(mode=1 if self.random.random() < self.no_fix_rate else 3))
+                time.sleep(1 / self.rate)
+        except OSError:
+            pass  # client went away
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate gpsd streaming fixes of a simulated drive.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2947)
+    parser.add_argument('--rate', type=float, default=1.0, help="reports per second")
+    parser.add_argument('--no-fix-rate', type=float, default=0.0, help="share of reports without a fix")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)-10s %(levelname)-8s %(message)s")
+    emulator = GPSDEmulator(rate=args.rate, no_fix_rate=args.no_fix_rate, host=args.host, port=args.port)
+    logger.info("gpsd emulator listening on {}:{}".format(args.host, emulator.start()))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import time
+from array import array
+
+
+class RingBuffer:
+    """
+        Fixed-size time series of one signal.
+
+        Timestamps and values live in two preallocated typed arrays
+        (float64 seconds and float32 values) used as a ring, so appending
+        is O(1), creates no Python objects and memory stays at 12 bytes per
+        sample whatever the uptime. Timestamps have to be appended in
+        non-decreasing order, window() relies on it.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('f', bytes(4 * capacity))
+        self.count = 0
+        self.next = 0  # where the next sample goes
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, value):
+        self.times[self.next] = timestamp
+        self.values[self.next] = value
+        self.next = (self.next + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def latest(self):
+        """Return the last (timestamp, value), None if empty."""
+        if self.count == 0:
+            return None
+        last = (self.next - 1) % self.capacity
+        return self.times[last], self.values[last]
+
+    def window(self, start=None, end=None):
+        """
+            Return the samples with start <= timestamp < end as a (times, values) pair of arrays.
+
+            The slots are found by binary search and copied with array
+            slices, at most two per array when the window wraps around.
+        """
+        first = self.__search(start) if start is not None else 0
+        last = self.__search(end) if end is not None else self.count
+        if first >= last:
+            return array('d'), array('f')
+        oldest = (self.next - self.count) % self.capacity
+        a, b = (oldest + first) % self.capacity, (oldest + last) % self.capacity
+        if a < b:
+            return self.times[a:b], self.values[a:b]
+        return self.times[a:] + self.times[:b], self.values[a:] + self.values[:b]
+
+    def __search(self, timestamp):
+        """Return the logical index of the first sample at or after timestamp."""
+        oldest = (self.next - self.count) % self.capacity
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[(oldest + middle) % self.capacity] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+
+class History:
+    """
+        Recent history of every numeric signal, one RingBuffer each.
+
+        Buffers are created on the first sample of a signal, capacity is
+        the number of samples kept per signal. Timestamps come from clock,
+        time.monotonic by default: the wall clock jumps back when NTP or
+        the GPS sets it, and window() needs them in order. They are only
+        meaningful relative to each other and to clock().
+    """
+
+    def __init__(self, capacity=2400, clock=time.monotonic):
+        self.capacity = capacity
+        self.clock = clock
+        self.buffers = {}
+
+    def record(self, values, now=None):
+        """Append a dict of name -> value, values that are not numbers are skipped."""
+        now = self.clock() if now is None else now
+        for name, value in values.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            buffer = self.buffers.get(name)
+            if buffer is None:
+                buffer = self.buffers[name] = RingBuffer(self.capacity)
+            buffer.append(now, value)
+
+    def window(self, name, seconds, now=None):
+        """Return the (times, values) arrays of the last seconds of a signal."""
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            return array('d'), array('f')
+        now = self.clock() if now is None else now
+        return buffer.window(now - seconds)
+
+    def window_signals(self, names, seconds, now=None):
+        """
+            Derive the min, average and max of the last seconds of each signal in names.
+
+            Returns a dict of NAME_WINDOW_MIN/AVG/MAX -> value ready to be
+            published with the raw values, signals without samples in the
+            window are left out.
+        """
+        now = self.clock() if now is None else now
+        derived = {}
+        for name in names:
+            values = self.window(name, seconds, now)[1]
+            if not values:
+                continue
+            derived[name + '_WINDOW_MIN'] = round(min(values), 4)
+            derived[name + '_WINDOW_AVG'] = round(sum(values) / len(values), 4)
+            derived[name + '_WINDOW_MAX'] = round(max(values), 4)
+        return derived
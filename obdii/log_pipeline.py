@@ -0,0 +1,114 @@
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+
+
+class RateLimitFilter(logging.Filter):
+    """
+        Token bucket per logging call site for records up to a level.
+
+        Each call site (file and line) may log burst records at once and
+        rate records a second after that; the rest are dropped. The next
+        record let through tells how many were dropped. Records above
+        level always pass. No lock: concurrent loggers may only skew the
+        counts.
+    """
+
+    def __init__(self, rate=2.0, burst=20, level=logging.INFO, clock=time.monotonic):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.level = level
+        self.clock = clock
+        self.buckets = {}  # (pathname, lineno) -> [tokens, last refill, suppressed]
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        key = (record.pathname, record.lineno)
+        now = self.clock()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [self.burst, now, 0]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[2] += 1
+            return False
+        bucket[0] = tokens - 1
+        if bucket[2]:
+            record.msg = "{} ({} similar suppressed)".format(record.getMessage(), bucket[2])
+            record.args = None
+            bucket[2] = 0
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking or raising."""
+
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def gzip_namer(name):
+    return name + ".gz"
+
+
+def gzip_rotator(source, dest):
+    """Rename the log file right away and gzip it from a background thread, the handler doesn't wait for it."""
+    plain = dest[:-3] if dest.endswith(".gz") else dest + ".tmp"
+    os.rename(source, plain)
+
+    def compress():
+        try:
+            with open(plain, 'rb') as plain_file, gzip.open(dest, 'wb') as gzip_file:
+                shutil.copyfileobj(plain_file, gzip_file)
+            os.remove(plain)
+        except OSError as err:
+            logging.getLogger('obdii.log_pipeline').warning("Could not compress {}: {}".format(plain, err))
+
+    threading.Thread(target=compress, name='log-compress', daemon=True).start()
+
+
+class LogPipeline:
+    """
+        Hands log records to a background thread that formats and writes them.
+
+        The loggers get a DroppingQueueHandler (behind a RateLimitFilter),
+        so logging from the polling loop costs a filter check and a queue
+        put. The QueueListener thread runs the real handlers: console
+        output, and the file, rotated at midnight and gzip compressed.
+    """
+
+    def __init__(self, handlers, queue_size=10000, rate=2.0, burst=20, level=logging.INFO):
+        self.queue = queue.Queue(queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handler.addFilter(RateLimitFilter(rate, burst, level))
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+    def attach(self, *loggers):
+        for attached in loggers:
+            attached.addHandler(self.handler)
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        """Write out the records still queued and stop the thread."""
+        if self.handler.dropped:
+            logging.getLogger('obdii.log_pipeline').warning(
+                "{} log record(s) dropped, the queue was full".format(self.handler.dropped))
+        self.listener.stop()
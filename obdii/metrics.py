@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('obdii.metrics')
+
+# Upper bounds in seconds, ELM327 round trips range from a few ms for AT
+# commands to the 200 ms default timeout, retries add whole seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 1, 2.5, 5, 10)
+CYCLE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60, 120)
+
+
+class Histogram:
+    """Prometheus style histogram: a count per bucket, the sum and count of the observations."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q quantile, None if empty or beyond the last bucket."""
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank and total > 0:
+                return bound
+        return None
+
+    def summary(self):
+        return {'count': self.count,
+                'mean': round(self.sum / self.count, 4) if self.count else None,
+                'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95)}
+
+    def prometheus(self, name, labels):
+        """Exposition lines for this histogram, labels is a preformatted 'key="value",' prefix."""
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            lines.append('{}_bucket{{{}le="{}"}} {}'.format(name, labels, bound, total))
+        lines.append('{}_bucket{{{}le="+Inf"}} {}'.format(name, labels, self.count))
+        labels = '{{{}}}'.format(labels.rstrip(',')) if labels else ''
+        lines.append('{}_sum{} {}'.format(name, labels, self.sum))
+        lines.append('{}_count{} {}'.format(name, labels, self.count))
+        return lines
+
+
+class Metrics:
+    """
+        Query latency and bus health.
+
+        The planner reports every ECU query (latency, attempts, success)
+        and every polling cycle, instrument() times each adapter round
+        trip. Recording is a bisect and a few additions, with no lock: the
+        readers (snapshot() and prometheus(), from the publisher or the
+        HTTP thread) may see a query half recorded, which is fine for
+        monitoring.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, cycle_buckets=CYCLE_BUCKETS, clock=time.monotonic):
+        self.buckets = tuple(buckets)
+        self.clock = clock
+        self.commands = {}  # (ecu, command) -> Histogram
+        self.ecus = {}  # ecu -> Histogram
+        self.retries = defaultdict(int)  # (ecu, command) -> retries
+        self.failures = defaultdict(int)  # (ecu, command) -> failed queries
+        self.round_trip = {'at': Histogram(self.buckets), 'ecu': Histogram(self.buckets)}
+        self.cycles = Histogram(tuple(cycle_buckets))
+        self.signals_requested = 0
+        self.signals_answered = 0
+        self.reconnects = 0
+
+    def instrument(self, connection):
+        """Time every adapter round trip of a python-obd or AsyncELM327 connection."""
+        query = connection.query
+
+        def kind(command):
+            return 'at' if command.command[:2].upper() == b"AT" else 'ecu'
+
+        if asyncio.iscoroutinefunction(query):
+            async def timed_query(command, *args, **kwargs):
+                start = self.clock()
+                try:
+                    return await query(command, *args, **kwargs)
+                finally:
+                    self.round_trip[kind(command)].observe(self.clock() - start)
+        else:
+            def timed_query(command, *args, **kwargs):
+                start = self.clock()
+                try:
+                    return query(command, *args, **kwargs)
+                finally:
+                    self.round_trip[kind(command)].observe(self.clock() - start)
+        connection.query = timed_query
+
+    def observe_query(self, ecu, command, seconds, attempts, ok):
+        """Record one ECU query: ecu is the header ("7E4"), command the signal or request name."""
+        key = (ecu, command)
+        histogram = self.commands.get(key)
+        if histogram is None:
+            histogram = self.commands[key] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        histogram = self.ecus.get(ecu)
+        if histogram is None:
+            histogram = self.ecus[ecu] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        if attempts > 1:
+            self.retries[key] += attempts - 1
+        if not ok:
+            self.failures[key] += 1
+
+    def observe_cycle(self, seconds, requested, answered):
+        self.cycles.observe(seconds)
+        self.signals_requested += requested
+        self.signals_answered += answered
+
+    def snapshot(self):
+        """Summary of everything measured so far, for the MQTT metrics topic."""
+        # Copies, the polling thread may add keys while we iterate
+        retries, failures = dict(self.retries), dict(self.failures)
+        ecus = {}
+        for ecu, histogram in sorted(dict(self.ecus).items()):
+            ecus[ecu] = histogram.summary()
+            ecus[ecu]['retries'] = sum(count for key, count in retries.items() if key[0] == ecu)
+            ecus[ecu]['failures'] = sum(count for key, count in failures.items() if key[0] == ecu)
+        slowest = sorted(dict(self.commands).items(), key=lambda item: item[1].sum / item[1].count, reverse=True)[:5]
+        return {'cycles': self.cycles.summary(),
+                'round_trip': dict((kind, histogram.summary()) for kind, histogram in self.round_trip.items()),
+                'ecus': ecus,
+                'slowest_commands': dict((command, histogram.summary()) for (ecu, command), histogram in slowest),
+                'retries': sum(retries.values()),
+                'failures': sum(failures.values()),
+                'signals_requested': self.signals_requested,
+                'signals_answered': self.signals_answered,
+                'reconnects': self.reconnects}
+
+    def prometheus(self):
+        """Everything measured so far in the Prometheus text exposition format."""
+        lines = ['# HELP obdii_query_seconds ECU query latency, retries included.',
+                 '# TYPE obdii_query_seconds histogram']
+        for (ecu, command), histogram in sorted(dict(self.commands).items()):
+            lines += histogram.prometheus('obdii_query_seconds', 'ecu="{}",command="{}",'.format(ecu, command))
+        lines += ['# HELP obdii_ecu_query_seconds ECU query latency of all commands.',
+                  '# TYPE obdii_ecu_query_seconds histogram']
+        for ecu, histogram in sorted(dict(self.ecus).items()):
+            lines += histogram.prometheus('obdii_ecu_query_seconds', 'ecu="{}",'.format(ecu))
+        lines += ['# HELP obdii_round_trip_seconds Adapter round trip time, AT commands or ECU requests.',
+                  '# TYPE obdii_round_trip_seconds histogram']
+        for kind, histogram in sorted(self.round_trip.items()):
+            lines += histogram.prometheus('obdii_round_trip_seconds', 'kind="{}",'.format(kind))
+        lines += ['# HELP obdii_cycle_seconds Duration of a polling cycle.',
+                  '# TYPE obdii_cycle_seconds histogram']
+        lines += self.cycles.prometheus('obdii_cycle_seconds', '')
+        for name, help_text, counts in (('obdii_query_retries_total', 'Query attempts beyond the first.', self.retries),
+                                        ('obdii_query_failures_total', 'Queries that got no valid answer.', self.failures)):
+            lines += ['# HELP {} {}'.format(name, help_text), '# TYPE {} counter'.format(name)]
+            for (ecu, command), count in sorted(dict(counts).items()):
+                lines.append('{}{{ecu="{}",command="{}"}} {}'.format(name, ecu, command, count))
+        for name, help_text, value in (('obdii_signals_requested_total', 'Signals polled.', self.signals_requested),
+                                       ('obdii_signals_answered_total', 'Signals that got a value.', self.signals_answered),
+                                       ('obdii_reconnects_total', 'OBDII reconnections.', self.reconnects)):
+            lines += ['# HELP {} {}'.format(name, help_text), '# TYPE {} counter'.format(name),
+                      '{} {}'.format(name, value)]
+        return '\n'.join(lines) + '\n'
+
+    def message(self, topic_prefix):
+        """The metrics MQTT message."""
+        return {'topic': topic_prefix + "metrics",
+                'payload': json.dumps(self.snapshot()),
+                'qos': 0,
+                'retain': False}
+
+
+class MetricsServer:
+    """Serves Metrics.prometheus() on http://host:port/metrics from a background thread."""
+
+    def __init__(self, metrics, host='127.0.0.1', port=9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("{} {}".format(self.address_string(), format % args))
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='metrics-http', daemon=True).start()
+        logger.info("Serving metrics on http://{}:{}/metrics".format(self.host, self.server.server_address[1]))
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
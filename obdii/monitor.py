@@ -0,0 +1,140 @@
+import asyncio
+import contextlib
+import logging
+
+from elm_errors import OBDIIConnectionError
+
+logger = logging.getLogger('obdii.monitor')
+
+
+class MonitorUnsupported(Exception):
+    """The adapter did not answer OK to a monitor setup command, e.g. ? from a clone."""
+    pass
+
+
+class BroadcastDecoder:
+    """
+        Decodes periodic CAN broadcast frames into state signals.
+
+        frames is a list of signal specs as found in the config file:
+
+            {"id": "3E9", "name": "BAT_PACK_CURRENT_HD", "byte": 0,
+             "length": 2, "signed": true, "scale": 0.05, "offset": 0}
+
+        "byte" is the offset of the first data byte (big endian), value is
+        raw * scale + offset. Several specs may share the same CAN ID.
+    """
+
+    def __init__(self, frames):
+        self.signals = {}
+        for spec in frames:
+            can_id = int(spec['id'], 16)
+            self.signals.setdefault(can_id, []).append((spec['name'].upper(),
+                                                        int(spec.get('byte', 0)),
+                                                        int(spec.get('length', 1)),
+                                                        bool(spec.get('signed', False)),
+                                                        float(spec.get('scale', 1)),
+                                                        float(spec.get('offset', 0))))
+
+    @property
+    def can_ids(self):
+        return sorted(self.signals)
+
+    def decode(self, line):
+        """Decode one monitor line ("3E9 01 02 03 ..."), returns a dict of name -> value."""
+        tokens = line.split()
+        if len(tokens) < 2:
+            return {}
+        try:
+            can_id = int(tokens[0], 16)
+            data = bytes.fromhex("".join(tokens[1:]))
+        except ValueError:
+            return {}  # adapter messages like BUFFER FULL or STOPPED
+
+        values = {}
+        for name, start, length, signed, scale, offset in self.signals.get(can_id, ()):
+            raw = data[start:start + length]
+            if len(raw) != length:
+                continue
+            values[name] = int.from_bytes(raw, 'big', signed=signed) * scale + offset
+        return values
+
+
+def elm327_filter(can_ids):
+    """
+        Return the ATCF/ATCM values letting all the given 11 bit IDs through.
+
+        The ELM327 has a single filter/mask pair, so IDs that differ in many
+        bits let extra frames through. decode() ignores those.
+    """
+    mask = 0x7FF
+    for can_id in can_ids[1:]:
+        mask &= ~(can_id ^ can_ids[0])
+    return can_ids[0] & mask, mask & 0x7FF
+
+
+def monitor_setup_commands(can_ids, adapter='elm327'):
+    """
+        Return the raw commands that filter monitor mode down to the given IDs, and the monitor command.
+
+        Each setup command comes with the command undoing it before going
+        back to queries (None if there is nothing to undo). CAN auto
+        formatting is turned off first: with it on, the adapter takes the
+        first data byte of a frame for an ISO-TP PCI byte and strips it or
+        drops the frame, so the monitor.frames byte offsets would not hold.
+    """
+    setup = [(b"ATCAF0", b"ATCAF1")]
+    if adapter == 'stn':
+        setup += [(b"STFCP", None)]  # clear pass filters
+        setup += [(b"STFAP %03X,7FF" % can_id, b"STFCP") for can_id in can_ids]
+        return setup, b"STMA"
+
+    can_filter, mask = elm327_filter(can_ids)
+    # ATAR: back to automatic receive filtering, ATCRA is sent again by the planner
+    return setup + [(b"ATCF %03X" % can_filter, b"ATAR"), (b"ATCM %03X" % mask, b"ATAR")], b"ATMA"
+
+
+async def monitor_window(transport, decoder, duration, adapter='elm327'):
+    """
+        Listen to broadcast frames for duration seconds.
+
+        Returns a dict of name -> latest decoded value. The caller has to
+        reset its query planner afterwards, the receive filter changed.
+        Raises MonitorUnsupported if the adapter refuses a setup command
+        and OBDIIConnectionError if it stops answering; either way what
+        the setup changed is undone first, if the adapter lets us.
+    """
+    setup, command = monitor_setup_commands(decoder.can_ids, adapter)
+    values = {}
+    frames = 0
+    cleanup = []
+    try:
+        try:
+            for cmd, undo in setup:
+                lines = await transport.send(cmd)
+                if undo is not None and undo not in cleanup:
+                    cleanup.insert(0, undo)  # undone in reverse order, even if refused: it may be half applied
+                if 'OK' not in lines:
+                    raise MonitorUnsupported("{} answered {}".format(cmd.decode(), " ".join(lines) or "nothing"))
+
+            # aclosing: leaving the loop early must release the transport lock now, not when the generator is collected
+            async with contextlib.aclosing(transport.monitor(command, duration)) as lines:
+                async for line in lines:
+                    if line in ("BUFFER FULL", "STOPPED"):
+                        logger.warning("Monitor stopped by the adapter: {}".format(line))
+                        break
+                    decoded = decoder.decode(line)
+                    if decoded:
+                        frames += 1
+                        values.update(decoded)
+        finally:
+            for cmd in cleanup:
+                lines = await transport.send(cmd)
+                if 'OK' not in lines:
+                    raise OBDIIConnectionError("{} answered {} after monitoring, the adapter state is unknown"
+                                               .format(cmd.decode(), " ".join(lines) or "nothing"))
+    except (asyncio.TimeoutError, ConnectionError, OSError) as err:
+        raise OBDIIConnectionError("Adapter failed while monitoring: {}".format(str(err) or type(err).__name__))
+
+    logger.info("Decoded {} broadcast frame(s) into {} signal(s)".format(frames, len(values)))
+    return values
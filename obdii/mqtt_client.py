@@ -0,0 +1,134 @@
+import logging
+import ssl
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+logger = logging.getLogger('obdii.mqtt_client')
+
+
+class SessionReuseContext(ssl.SSLContext):
+    """
+        SSLContext that resumes the previous TLS session.
+
+        paho wraps a fresh socket on every reconnect. Handing it the last
+        session lets the broker skip the full handshake (certificate
+        exchange and key agreement), which is most of the connection cost
+        on a slow uplink.
+    """
+
+    session = None
+
+    def wrap_socket(self, sock, *args, **kwargs):
+        if self.session is not None and kwargs.get('session') is None:
+            kwargs['session'] = self.session
+        return super().wrap_socket(sock, *args, **kwargs)
+
+
+class MQTTPublisher:
+    """
+        Long-lived MQTT connection.
+
+        The network loop runs in a background thread and reconnects with
+        an exponential backoff between min_delay and max_delay seconds.
+        At most max_inflight QoS 1/2 messages wait for their
+        acknowledgement at a time, max_queued more are kept for later,
+        including while the broker is unreachable. qos is the minimum QoS
+        of every published message.
+
+        tls is None for a plain connection, or a dict with the optional
+        keys ca_certs, certfile, keyfile and insecure.
+    """
+
+    def __init__(self, hostname, port, client_id, user, password, keepalive=60, tls=None,
+                 qos=0, max_inflight=20, max_queued=1000, min_delay=1, max_delay=120):
+        self.hostname = hostname
+        self.port = port
+        self.keepalive = keepalive
+        self.qos = qos
+        self.connected = threading.Event()
+        self.tls_context = None
+
+        self.client = mqtt.Client(client_id=client_id)
+        self.client.username_pw_set(user, password)
+        self.client.reconnect_delay_set(min_delay=min_delay, max_delay=max_delay)
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.max_queued_messages_set(max_queued)
+        self.client.on_connect = self.__on_connect
+        self.client.on_disconnect = self.__on_disconnect
+
+        if tls is not None:
+            self.tls_context = SessionReuseContext(ssl.PROTOCOL_TLS_CLIENT)
+            if tls.get('ca_certs'):
+                self.tls_context.load_verify_locations(tls['ca_certs'])
+            else:
+                self.tls_context.load_default_certs()
+            if tls.get('certfile'):
+                self.tls_context.load_cert_chain(tls['certfile'], tls.get('keyfile'))
+            if tls.get('insecure', False):
+                self.tls_context.check_hostname = False
+                self.tls_context.verify_mode = ssl.CERT_NONE
+            self.client.tls_set_context(self.tls_context)
+            self.client.tls_insecure_set(bool(tls.get('insecure', False)))
+
+    def start(self):
+        """Connect in the background, publish() can be called right away."""
+        self.client.connect_async(self.hostname, self.port, self.keepalive)
+        self.client.loop_start()
+
+    def wait_connected(self, timeout=None):
+        """Wait for the broker to accept the connection. Returns False on timeout."""
+        return self.connected.wait(timeout)
+
+    def publish(self, msgs):
+        """
+            Queue messages for publishing.
+
+            QoS 0 messages published while disconnected are dropped, QoS 1/2
+            ones are sent once the connection is back. Returns the
+            MQTTMessageInfo of the messages that are on their way.
+        """
+        infos = []
+        for msg in msgs:
+            logger.debug("{}".format(msg))
+            qos = max(msg.get('qos', 0), self.qos)
+            info = self.client.publish(msg['topic'], msg['payload'], qos=qos, retain=msg.get('retain', False))
+            if info.rc == mqtt.MQTT_ERR_SUCCESS or (info.rc == mqtt.MQTT_ERR_NO_CONN and qos > 0):
+                infos.append(info)
+            else:
+                logger.warning("Message to {} dropped: {}".format(msg['topic'], mqtt.error_string(info.rc)))
+        return infos
+
+    def wait_published(self, infos, timeout):
+        """Wait until the given messages left (QoS 0) or were acknowledged (QoS 1/2). Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        for info in infos:
+            # MQTTMessageInfo.wait_for_publish() has no timeout in paho 1.5
+            while not info.is_published():
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+        return True
+
+    def stop(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def __on_connect(self, client, userdata, flags, rc):
+        if rc != mqtt.CONNACK_ACCEPTED:
+            logger.error("MQTT connection refused: {}".format(mqtt.connack_string(rc)))
+            return
+        logger.info("Connected to MQTT broker {}:{}".format(self.hostname, self.port))
+        self.connected.set()
+        if self.tls_context is not None:
+            sock = client.socket()
+            if getattr(sock, 'session', None) is not None:
+                if self.tls_context.session is not None:
+                    logger.debug("TLS session reused: {}".format(sock.session_reused))
+                self.tls_context.session = sock.session
+
+    def __on_disconnect(self, client, userdata, rc):
+        self.connected.clear()
+        if rc != mqtt.MQTT_ERR_SUCCESS:
+            logger.warning("Lost MQTT connection: {}, reconnecting".format(mqtt.error_string(rc)))
@@ -1,25 +1,39 @@
 #!/usr/bin/env python3
 
-import ssl
 import time
+import asyncio
+import argparse
+import signal
+import threading
 import json
 import os
 import logging
 import logging.handlers
-import paho.mqtt.publish as publish
-import paho.mqtt.client as mqtt
 import obd
 from obd import OBDStatus
 
-from commands import ext_commands
-
-
-class OBDIIConnectionError(Exception):
-    pass
-
-
-class CanError(Exception):
-    pass
+from commands import ECU_7E0, ext_commands, ext_command_ecus
+from planner import AsyncQueryPlanner, QueryPlanner
+from async_elm327 import AsyncELM327
+from monitor import BroadcastDecoder, MonitorUnsupported, monitor_window
+from scheduler import PollScheduler
+from fastpath import FastPath
+from support_cache import SupportCache
+from deadband import ChangeFilter
+from mqtt_client import MQTTPublisher
+from store_forward import DiskQueue, StoreAndForward
+from history import History
+from cell_analytics import CELL_SIGNALS, cell_signals
+from capture import CaptureWriter, capture_path
+from metrics import Metrics, MetricsServer
+from gps_reader import GPSReader, gps_signals
+from log_pipeline import LogPipeline, gzip_namer, gzip_rotator
+from quick_connect import PROTOCOLS, ConnectionCache, QuickOBD
+from elm_errors import (AdapterReset, CanError, OBDIIConnectionError, ERROR_POLICIES, WARM_START, async_recover, backoff,
+                        recover, response_error)
+
+# Signals published in the state message, in publishing order
+state_signals = [name for name in ext_commands if name in ext_command_ecus]
 
 
 def obd_connect(portstr, baudrate, fast=False, timeout=30, max_attempts=3):
@@ -42,2527 +56,795 @@ def obd_connect(portstr, baudrate, fast=False, timeout=30, max_attempts=3):
         return obd_connection
 
 
-def query_command(connection, command, max_attempts=3):
+def make_connection_cache(config):
+    """Open the connection cache, None if disabled."""
+    path = config['serial'].get('connection_cache')
+    if not path:
+        return None
+    return ConnectionCache(os.path.join(os.path.dirname(os.path.realpath(__file__)), path))
+
+
+def known_protocol(config, cache):
+    """The protocol to connect with: the last one that worked on this port, else serial.protocol, None if unknown."""
+    protocol = None
+    if cache is not None:
+        protocol = cache.protocol(config['serial']['port'], int(config['serial']['baudrate']))
+    protocol = protocol or str(config['serial'].get('protocol', '')).upper()
+    return protocol if protocol in PROTOCOLS else None
+
+
+def quick_obd_connect(config, cache):
+    """
+        Connect with a minimal adapter init if the protocol is known.
+
+        Skips python-obd's ATZ wait, protocol search and PID probing.
+        Falls back to obd_connect() if the protocol is unknown or the
+        quick init failed, and remembers the protocol that worked.
+    """
+    portstr = config['serial']['port']
+    baudrate = int(config['serial']['baudrate'])
+    protocol = known_protocol(config, cache)
+    obd_connection = None
+    if protocol is not None:
+        start = time.monotonic()
+        obd_connection = QuickOBD(portstr, baudrate, protocol)
+        if obd_connection.status() == OBDStatus.CAR_CONNECTED:
+            logger.info("Quick connect with protocol {} in {:.2f} s".format(protocol, time.monotonic() - start))
+        else:
+            logger.warning("Quick connect with protocol {} failed: {}, searching"
+                           .format(protocol, obd_connection.status()))
+            obd_connection.close()
+            obd_connection = None
+    if obd_connection is None:
+        obd_connection = obd_connect(portstr=portstr,
+                                     baudrate=baudrate,
+                                     fast=False,
+                                     timeout=30)
+    if cache is not None:
+        cache.save(portstr, baudrate, obd_connection.protocol_id())
+    return obd_connection
+
+
+def query_command(connection, command, max_attempts=3, on_attempt=None):
+    """
+        Query a command, handling each ELM327 error its own way.
+
+        NO DATA, ? and negative responses fail at once, bus contention is
+        retried after a short jittered backoff, a CAN error closes the
+        protocol first and a wedged adapter is warm started. Raises
+        ValueError or CanError when giving up, AdapterReset after a warm
+        start (the ECU has to be selected again) and OBDIIConnectionError
+        if the adapter can't be recovered. on_attempt, if given, is called
+        with the command every time it is sent, recovery commands aside.
+    """
     command_count = 0
-    cmd_response = None
-    exception = False
-    valid_response = False
-    while not valid_response and command_count < max_attempts:
+    recovered = False
+    while True:
         command_count += 1
+        if on_attempt is not None:
+            on_attempt(command)
+        cmd_response = None
         try:
             cmd_response = connection.query(command, force=True)
         except Exception:
-            exception = True
-        valid_response = not(cmd_response is None or cmd_response.is_null() or cmd_response.value is None or cmd_response.value == "?" or cmd_response.value == "" or exception)
-        if not valid_response and command_count < max_attempts:
-            logger.warning("No valid response for {}. Retrying in {} second(s)...".format(command, command_count))
-            time.sleep(command_count)
-
-    if not valid_response:
-        raise ValueError("No valid response for {}. Max attempts ({}) exceeded."
-                         .format(command, max_attempts))
+            pass
+        error = response_error(cmd_response)
+        if error is None:
+            logger.info("Got response from command: {} ".format(command))
+            return cmd_response
+        policy = ERROR_POLICIES[error]
+        if not policy.retry or command_count >= max_attempts:
+            raise policy.exception("{} for {} after {} attempt(s)".format(error, command, command_count))
+        if policy.recovery is not None and not recovered:
+            recovered = True
+            recover(connection, policy.recovery)
+            if policy.recovery is WARM_START:
+                raise AdapterReset("{} for {}, adapter warm started".format(error, command))
+        delay = backoff(policy, command_count)
+        logger.warning("{} for {}. Retrying in {:.2f} second(s)...".format(error, command, delay))
+        time.sleep(delay)
+
+
+async def async_query_command(connection, command, max_attempts=3, on_attempt=None, timeout=None):
+    """query_command() for an AsyncELM327 transport, with a per-call timeout in seconds."""
+    command_count = 0
+    recovered = False
+    while True:
+        command_count += 1
+        if on_attempt is not None:
+            on_attempt(command)
+        cmd_response = None
+        try:
+            cmd_response = await connection.query(command, timeout=timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass
+        error = response_error(cmd_response)
+        if error is None:
+            logger.info("Got response from command: {} ".format(command))
+            return cmd_response
+        policy = ERROR_POLICIES[error]
+        if not policy.retry or command_count >= max_attempts:
+            raise policy.exception("{} for {} after {} attempt(s)".format(error, command, command_count))
+        if policy.recovery is not None and not recovered:
+            recovered = True
+            await async_recover(connection, policy.recovery)
+            if policy.recovery is WARM_START:
+                raise AdapterReset("{} for {}, adapter warm started".format(error, command))
+        delay = backoff(policy, command_count)
+        logger.warning("{} for {}. Retrying in {:.2f} second(s)...".format(error, command, delay))
+        await asyncio.sleep(delay)
+
+
+def mqtt_connect(config, client_id):
+    """Start a persistent MQTT connection as configured in the mqtt section."""
+    mqtt_config = config['mqtt']
+    tls = None
+    if mqtt_config.get('tls', False):
+        tls = {'ca_certs': mqtt_config.get('ca_certs'),
+               'insecure': mqtt_config.get('tls_insecure', False)}
+    client = MQTTPublisher(hostname=mqtt_config['broker'],
+                           port=int(mqtt_config['port']),
+                           client_id=client_id,
+                           user=mqtt_config['user'],
+                           password=mqtt_config['password'],
+                           tls=tls,
+                           qos=int(mqtt_config.get('qos', 0)),
+                           max_inflight=int(mqtt_config.get('max_inflight', 20)),
+                           max_queued=int(mqtt_config.get('max_queued', 1000)))
+    client.start()
+    return client
+
+
+def make_store_forward(config, client):
+    """Return a StoreAndForward for the client if unsent readings should be kept on disk."""
+    sf_config = config.get('store_forward', {})
+    if not sf_config.get('enabled', False):
+        return None
+    queue = DiskQueue(os.path.join(os.path.dirname(os.path.realpath(__file__)), sf_config.get('path', 'queue')),
+                      max_bytes=int(float(sf_config.get('max_mb', 50)) * 1024 * 1024),
+                      segment_bytes=int(float(sf_config.get('segment_kb', 1024)) * 1024))
+    return StoreAndForward(queue,
+                           client,
+                           config['mqtt']['topic_prefix'] + sf_config.get('topic', 'backlog'),
+                           batch_size=int(sf_config.get('batch_size', 100)),
+                           max_rate=float(sf_config.get('max_batches_per_second', 2)))
+
+
+def publish_or_store(client, forwarder, msgs):
+    """Publish messages right away, or store them for later if the broker is unreachable."""
+    if forwarder is not None and not client.connected.is_set():
+        forwarder.put(msgs)
     else:
-        logger.info("Got response from command: {} ".format(command))
-        return cmd_response
-
-def query_charging_level(connection):
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["CHARGING_LEVEL"],3)
-
-    return resp.value
-
-#########################################################
-
-
-def query_bat_pack_cap_ah_raw_2018(connection):
-    logger.info("**** Querying bat_pack_cap_ah_raw_2018 information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_CAP_AH_RAW_2018"],3)
-
-    return resp.value
-
-
-def query_bat_pack_cap_ah_raw_2019(connection):
-    logger.info("**** Querying bat_pack_cap_ah_raw_2019 information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_CAP_AH_RAW_2019"],3)
-
-    return resp.value
-
-
-def query_bat_pack_cap_kwh_est_2018(connection):
-    logger.info("**** Querying bat_pack_cap_kwh_est_2018 information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_CAP_KWH_EST_2018"],3)
-
-    return resp.value
-
-
-def query_bat_pack_cap_kwh_est_2019(connection):
-    logger.info("**** Querying bat_pack_cap_kwh_est_2019 information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_CAP_KWH_EST_2019"],3)
-
-    return resp.value
-
-
-def query_bat_pack_soc_disp(connection):
-    logger.info("**** Querying bat_pack_soc_disp information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_SOC_DISP"],3)
-
-    return resp.value
-
-
-def query_bat_pack_soc_raw_hd(connection):
-    logger.info("**** Querying bat_pack_soc_raw_hd information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_SOC_RAW_HD"],3)
-
-    return resp.value
-
-
-def query_bat_pack_soc_raw_ld(connection):
-    logger.info("**** Querying bat_pack_soc_raw_ld information ****")
-    # Set header to 7E0
-    query_command(connection, ext_commands["CAN_HEADER_7E0"])
-    # Set the CAN receive address to 7E8
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7E8"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_SOC_RAW_LD"],3)
-
-    return resp.value
-
-
-def query_bat_pack_soc_raw_ld2(connection):
-    logger.info("**** Querying bat_pack_soc_raw_ld2 information ****")
-    # Set header to 7E1
-    query_command(connection, ext_commands["CAN_HEADER_7E1"])
-    # Set the CAN receive address to 7E9
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7E9"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_SOC_RAW_LD2"],3)
-
-    return resp.value
-
-
-def query_bat_pack_soc_raw_ld3(connection):
-    logger.info("**** Querying bat_pack_soc_raw_ld3 information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_SOC_RAW_LD3"],3)
-
-    return resp.value
-
-
-def query_bat_pack_soc_var(connection):
-    logger.info("**** Querying bat_pack_soc_var information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_SOC_VAR"],3)
-
-    return resp.value
-
-
-def query_bat_pack_current_hd(connection):
-    logger.info("**** Querying bat_pack_current_hd information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_CURRENT_HD"],3)
-
-    return resp.value
-
-
-def query_bat_pack_num_charges(connection):
-    logger.info("**** Querying bat_pack_num_charges information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_NUM_CHARGES"],3)
-
-    return resp.value
-
-
-def query_bat_mod_temp_max(connection):
-    logger.info("**** Querying bat_mod_temp_max information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_MOD_TEMP_MAX"],3)
-
-    return resp.value
-
-
-def query_bat_mod_temp_min(connection):
-    logger.info("**** Querying bat_mod_temp_min information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_MOD_TEMP_MIN"],3)
-
-    return resp.value
-
-
-def query_bat_mod_temp_avg(connection):
-    logger.info("**** Querying bat_mod_temp_avg information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_MOD_TEMP_AVG"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_min(connection):
-    logger.info("**** Querying bat_cell_volt_min information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_MIN"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_min_num(connection):
-    logger.info("**** Querying bat_cell_volt_min_num information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_MIN_NUM"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_max(connection):
-    logger.info("**** Querying bat_cell_volt_max information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_MAX"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_max_num(connection):
-    logger.info("**** Querying bat_cell_volt_max_num information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_MAX_NUM"],3)
-
-    return resp.value
-
-
-def query_bat_pack_resistance(connection):
-    logger.info("**** Querying bat_pack_resistance information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_RESISTANCE"],3)
-
-    return resp.value
-
-
-def query_bat_pack_volt_min(connection):
-    logger.info("**** Querying bat_pack_volt_min information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_VOLT_MIN"],3)
-
-    return resp.value
-
-
-def query_bat_pack_volt_max(connection):
-    logger.info("**** Querying bat_pack_volt_max information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_PACK_VOLT_MAX"],3)
-
-    return resp.value
-
-
-def query_hv_current(connection):
-    logger.info("**** Querying hv_current information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["HV_CURRENT"],3)
-
-    return resp.value
-
-
-def query_ambient_air_temp(connection):
-    logger.info("**** Querying ambient_air_temp information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["AMBIENT_AIR_TEMP"],3)
-
-    return resp.value
-
-
-def query_hv_current_hd(connection):
-    logger.info("**** Querying hv_current_hd information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["HV_CURRENT_HD"],3)
-
-    return resp.value
-
-
-def query_bat_mod_temp_1(connection):
-    logger.info("**** Querying bat_mod_temp_1 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_MOD_TEMP_1"],3)
-
-    return resp.value
-
-
-def query_bat_mod_temp_2(connection):
-    logger.info("**** Querying bat_mod_temp_2 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_MOD_TEMP_2"],3)
-
-    return resp.value
-
-
-def query_bat_mod_temp_3(connection):
-    logger.info("**** Querying bat_mod_temp_3 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
+        client.publish(msgs)
 
-    resp = query_command(connection, ext_commands["BAT_MOD_TEMP_3"],3)
 
-    return resp.value
-
-
-def query_bat_mod_temp_4(connection):
-    logger.info("**** Querying bat_mod_temp_4 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_MOD_TEMP_4"],3)
-
-    return resp.value
-
-
-def query_bat_mod_temp_5(connection):
-    logger.info("**** Querying bat_mod_temp_5 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_MOD_TEMP_5"],3)
-
-    return resp.value
-
-
-def query_bat_mod_temp_6(connection):
-    logger.info("**** Querying bat_mod_temp_6 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_MOD_TEMP_6"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_avg(connection):
-    logger.info("**** Querying bat_cell_volt_avg information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_AVG"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_01(connection):
-    logger.info("**** Querying bat_cell_volt_01 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_01"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_02(connection):
-    logger.info("**** Querying bat_cell_volt_02 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_02"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_03(connection):
-    logger.info("**** Querying bat_cell_volt_03 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_03"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_04(connection):
-    logger.info("**** Querying bat_cell_volt_04 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_04"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_05(connection):
-    logger.info("**** Querying bat_cell_volt_05 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_05"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_06(connection):
-    logger.info("**** Querying bat_cell_volt_06 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_06"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_07(connection):
-    logger.info("**** Querying bat_cell_volt_07 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_07"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_08(connection):
-    logger.info("**** Querying bat_cell_volt_08 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_08"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_09(connection):
-    logger.info("**** Querying bat_cell_volt_09 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_09"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_10(connection):
-    logger.info("**** Querying bat_cell_volt_10 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_10"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_11(connection):
-    logger.info("**** Querying bat_cell_volt_11 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_11"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_12(connection):
-    logger.info("**** Querying bat_cell_volt_12 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_12"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_13(connection):
-    logger.info("**** Querying bat_cell_volt_13 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_13"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_14(connection):
-    logger.info("**** Querying bat_cell_volt_14 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_14"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_15(connection):
-    logger.info("**** Querying bat_cell_volt_15 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_15"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_16(connection):
-    logger.info("**** Querying bat_cell_volt_16 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_16"],3)
-
-    return resp.value
+def publish_data_mqtt(msgs, config, client_id, timeout=30):
+    """
+        Publish all messages to MQTT and wait for them to leave. Returns False if publishing failed.
 
+        With store_forward enabled, messages that could not be published
+        are queued on disk, and the queue is forwarded whenever the
+        broker is reachable.
+    """
+    logger.info("Publish messages to MQTT")
+    client = mqtt_connect(config, client_id)
+    forwarder = make_store_forward(config, client)
+    try:
+        if not client.wait_connected(timeout):
+            logger.error("Error publishing to MQTT: could not connect to {}".format(config['mqtt']['broker']))
+        elif not client.wait_published(client.publish(msgs), timeout):
+            logger.error("Error publishing to MQTT: timed out waiting for the broker")
+        else:
+            logger.info("{} message(s) published to MQTT".format(len(msgs)))
+            if forwarder is not None:
+                forwarder.forward(timeout)
+            return True
+
+        if forwarder is not None and msgs:
+            forwarder.put(msgs)
+        return False
+    finally:
+        client.stop()
+        if forwarder is not None:
+            forwarder.queue.close()
 
-def query_bat_cell_volt_17(connection):
-    logger.info("**** Querying bat_cell_volt_17 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
 
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_17"],3)
+def setup_logging(log_config):
+    """
+        Log to the console and to obdii_data.log through a LogPipeline.
 
-    return resp.value
+        Returns the pipeline, to stop() before exiting.
+    """
+    console_handler = logging.StreamHandler()  # sends output to stderr
+    console_handler.setFormatter(logging.Formatter("%(asctime)s %(name)-10s %(levelname)-8s %(message)s"))
+    console_handler.setLevel(logging.DEBUG)
 
+    file_handler = logging.handlers.TimedRotatingFileHandler(os.path.dirname(os.path.realpath(__file__)) + '/../obdii_data.log',
+                                                             when='midnight',
+                                                             backupCount=15
+                                                             )  # sends output to obdii_data.log file rotating it at midnight and storing latest 15 days
+    file_handler.setFormatter(logging.Formatter("%(asctime)s %(name)-10s %(levelname)-8s %(message)s"))
+    file_handler.setLevel(logging.INFO)
+    if log_config.get('compress', True):
+        file_handler.namer = gzip_namer
+        file_handler.rotator = gzip_rotator
 
-def query_bat_cell_volt_18(connection):
-    logger.info("**** Querying bat_cell_volt_18 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
+    pipeline = LogPipeline([console_handler, file_handler],
+                           queue_size=int(log_config.get('queue_size', 10000)),
+                           rate=float(log_config.get('rate', 2.0)),
+                           burst=int(log_config.get('burst', 20)),
+                           level=logging.getLevelName(log_config.get('rate_limit_level', 'INFO')))
 
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_18"],3)
+    logger.setLevel(logging.DEBUG)
 
-    return resp.value
+    obd.logger.setLevel(logging.getLevelName(log_config.get('obd_level', 'DEBUG')))
+    # Remove obd logger existing handlers
+    for handler in obd.logger.handlers[:]:
+        obd.logger.removeHandler(handler)
+    pipeline.attach(logger, obd.logger)
+    pipeline.start()
+    return pipeline
 
 
-def query_bat_cell_volt_19(connection):
-    logger.info("**** Querying bat_cell_volt_19 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
+def load_config():
+    with open(os.path.dirname(os.path.realpath(__file__)) + '/obdii_data.config.json') as config_file:
+        return json.loads(config_file.read())
 
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_19"],3)
 
-    return resp.value
+def make_fast_path(config):
+    """Return a FastPath if the response-count fast mode is enabled."""
+    query_config = config.get('query', {})
+    if not query_config.get('fast', False):
+        return None
+    return FastPath(latency_factor=float(query_config.get('timeout_latency_factor', 3.0)))
 
 
-def query_bat_cell_volt_20(connection):
-    logger.info("**** Querying bat_cell_volt_20 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
+def make_support_cache(config, vin):
+    """Open the support cache for this car and adapter."""
+    query_config = config.get('query', {})
+    path = os.path.join(os.path.dirname(os.path.realpath(__file__)), query_config['support_cache'])
+    return SupportCache(path,
+                        "{}@{}".format(vin or "unknown", config['serial']['port']),
+                        max_failures=int(query_config.get('support_max_failures', 2)),
+                        revalidate_after=float(query_config.get('support_revalidate_days', 7)) * 24 * 3600)
 
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_20"],3)
 
-    return resp.value
+def read_vin(planner):
+    """Read the VIN from the ECM, None if it doesn't answer."""
+    try:
+        planner.select_ecu(ECU_7E0)
+        return query_command(planner.connection, ext_commands["VIN"]).value
+    except (ValueError, CanError) as err:
+        logger.warning("**** Error reading VIN: {} ****".format(err), exc_info=False)
+        return None
 
 
-def query_bat_cell_volt_21(connection):
-    logger.info("**** Querying bat_cell_volt_21 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
+async def async_read_vin(planner):
+    """read_vin() for an AsyncQueryPlanner."""
+    try:
+        await planner.select_ecu(ECU_7E0)
+        return (await async_query_command(planner.connection, ext_commands["VIN"])).value
+    except (ValueError, CanError) as err:
+        logger.warning("**** Error reading VIN: {} ****".format(err), exc_info=False)
+        return None
+
+
+def make_capture(config):
+    """Return a CaptureWriter for this run if capture.enabled is set."""
+    capture_config = config.get('capture', {})
+    if not capture_config.get('enabled', False):
+        return None
+    return CaptureWriter(capture_path(config),
+                         block_records=int(capture_config.get('block_records', 4096)),
+                         flush_interval=float(capture_config.get('flush_interval', 10)))
+
+
+def make_metrics(config):
+    """Return Metrics if metrics.enabled is set."""
+    metrics_config = config.get('metrics', {})
+    if not metrics_config.get('enabled', False):
+        return None
+    if metrics_config.get('buckets'):
+        return Metrics(buckets=sorted(float(bound) for bound in metrics_config['buckets']))
+    return Metrics()
+
+
+def make_metrics_server(config, metrics):
+    """Start the Prometheus endpoint if there are metrics and metrics.http_port is set."""
+    metrics_config = config.get('metrics', {})
+    if metrics is None or not metrics_config.get('http_port'):
+        return None
+    server = MetricsServer(metrics, metrics_config.get('http_host', '127.0.0.1'), int(metrics_config['http_port']))
+    try:
+        server.start()
+    except OSError as err:
+        logger.error("Could not serve metrics on port {}: {}".format(metrics_config['http_port'], err))
+        return None
+    return server
+
+
+def connect(config, capture=None, metrics=None):
+    """Connect to the OBDII dongle and set up the query planner for it."""
+    connection = quick_obd_connect(config, make_connection_cache(config))
+    if metrics is not None:
+        metrics.instrument(connection)
+
+    # Print supported commands
+    # DTC = Diagnostic Trouble Codes
+    # MIL = Malfunction Indicator Lamp
+    logger.debug(connection.print_commands())
+
+    planner = QueryPlanner(connection,
+                           query_command,
+                           max_dids=int(config.get('query', {}).get('max_dids_per_request', 1)),
+                           fast_path=make_fast_path(config),
+                           capture=capture,
+                           metrics=metrics)
+    if config.get('query', {}).get('support_cache'):
+        planner.support_cache = make_support_cache(config, read_vin(planner))
+    return connection, planner
+
+
+def selected_signals(config):
+    """
+        Return the signals to poll: query.signals if set, every state signal otherwise.
+
+        Raises ValueError if query.signals doesn't name a single known
+        signal, there would be nothing to poll.
+    """
+    selected = config.get('query', {}).get('signals')
+    if not selected:
+        return state_signals
+    selected = set(name.upper() for name in selected)
+    unknown = selected.difference(state_signals)
+    if unknown == selected:
+        raise ValueError("No known signal in query.signals: {}".format(", ".join(sorted(unknown))))
+    if unknown:
+        logger.warning("Ignoring unknown signals in query.signals: {}".format(", ".join(sorted(unknown))))
+    return [name for name in state_signals if name in selected]
+
+
+def cycle_budget(config):
+    """Seconds a polling cycle may take, None for no limit (query.cycle_budget)."""
+    budget = float(config.get('query', {}).get('cycle_budget', 0) or 0)
+    return budget if budget > 0 else None
+
+
+def make_scheduler(config):
+    poll_config = config.get('poll', {})
+    return PollScheduler(selected_signals(config),
+                         intervals=poll_config.get('intervals'),
+                         signal_intervals=poll_config.get('signal_intervals'),
+                         batch_size=int(poll_config.get('batch_size', 12)))
+
+
+def make_gps_reader(config):
+    """Start reading gpsd in the background, None if disabled."""
+    gps_config = config.get('gps', {})
+    if not gps_config.get('enabled', False):
+        return None
+    gps_reader = GPSReader(host=gps_config.get('host', '127.0.0.1'),
+                           port=int(gps_config.get('port', 2947)),
+                           keep=int(gps_config.get('keep', 64)),
+                           max_age=float(gps_config.get('max_age', 2.0)))
+    gps_reader.start()
+    return gps_reader
+
+
+def tag_gps(samples, gps_reader, start):
+    """Add the GPS fix nearest to the middle of the acquisition started at time.monotonic() start to samples."""
+    if gps_reader is None or not samples:
+        return
+    sampled_at = (start + time.monotonic()) / 2
+    samples.update(gps_signals(gps_reader.nearest(sampled_at), sampled_at))
+
+
+def make_history(config):
+    """Return a History if the daemon should keep recent samples in memory."""
+    history_config = config.get('history', {})
+    if not history_config.get('enabled', False):
+        return None
+    return History(capacity=int(history_config.get('capacity', 2400)))
+
+
+def state_message(values, topic_prefix):
+    """Build the retained state message from the latest value of each signal."""
+    bolt_state = {}
+    for name in state_signals:
+        if name in values:
+            bolt_state[name.lower()] = values[name]
+    # Signals only known from CAN broadcasts go last
+    for name in values:
+        if name.lower() not in bolt_state:
+            bolt_state[name.lower()] = values[name]
+
+    return {'topic': topic_prefix + "state",
+            'payload': json.dumps(bolt_state),
+            'qos': 0,
+            'retain': True}
+
+
+def make_change_filter(config):
+    """Return a ChangeFilter if signals are published on their own topics."""
+    publish_config = config.get('publish', {})
+    if publish_config.get('mode', 'state') == 'state':
+        return None
+    path = publish_config.get('state_file')
+    if path:
+        path = os.path.join(os.path.dirname(os.path.realpath(__file__)), path)
+    return ChangeFilter(absolute=float(publish_config.get('absolute_deadband', 0)),
+                        relative=float(publish_config.get('relative_deadband', 0)),
+                        signal_deadbands=publish_config.get('signal_deadbands'),
+                        heartbeat=float(publish_config.get('heartbeat', 300)),
+                        path=path)
+
+
+def publish_messages(config, change_filter, values, fresh, history=None):
+    """
+        Build the messages of one publish.
+
+        values holds the latest value of every signal, fresh only the ones
+        read since the previous publish. Depending on publish.mode this is
+        the state message, the changed signals or both. With
+        analytics.cells, the pack statistics derived from the cell
+        voltages are published along with them, and with a history, the
+        min/avg/max over history.window seconds of history.window_signals.
+    """
+    topic_prefix = config['mqtt']['topic_prefix']
+    analytics_config = config.get('analytics', {})
+    if analytics_config.get('cells', False) and any(name in fresh for name in CELL_SIGNALS):
+        derived = cell_signals(values, analytics_config.get('module_size', 8))
+        values = dict(values, **derived)
+        fresh = dict(fresh, **derived)
+    if history is not None:
+        history_config = config.get('history', {})
+        derived = history.window_signals(history_config.get('window_signals', []),
+                                         float(history_config.get('window', 60)))
+        values = dict(values, **derived)
+        fresh = dict(fresh, **derived)
+    msgs = []
+    if config.get('publish', {}).get('mode', 'state') != 'signals' and values:
+        msgs.append(state_message(values, topic_prefix))
+    if change_filter is not None:
+        msgs += change_filter.messages(fresh, topic_prefix + "signals/")
+    return msgs
+
+
+def run_once(config):
+    """Poll every signal once and publish a single snapshot."""
+    mqtt_msgs = []
+    change_filter = make_change_filter(config)
+    capture = make_capture(config)
+    metrics = make_metrics(config)
+    gps_reader = make_gps_reader(config)
 
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_21"],3)
+    try:
+        logger.info("=== Script start ===")
 
-    return resp.value
+        connection, planner = connect(config, capture, metrics)
 
+        scheduler = make_scheduler(config)
+        # A single run polls every signal once, highest priority first
+        budget = cycle_budget(config)
+        start = time.monotonic()
+        values = planner.run(scheduler.due(), errors=(ValueError, CanError),
+                             deadline=start + budget if budget else None)
+        tag_gps(values, gps_reader, start)
 
-def query_bat_cell_volt_22(connection):
-    logger.info("**** Querying bat_cell_volt_22 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
+        mqtt_msgs += publish_messages(config, change_filter, values, values)
+        if metrics is not None:
+            mqtt_msgs.append(metrics.message(config['mqtt']['topic_prefix']))
 
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_22"],3)
+    except OBDIIConnectionError as err:
+        logger.error("OBDII connection error: {0}".format(err),
+                     exc_info=False)
+    except ValueError as err:
+        logger.error("Error found: {0}".format(err),
+                     exc_info=False)
+    except CanError as err:
+        logger.error("Error found reading CAN response: {0}".format(err),
+                     exc_info=False)
+    except Exception as ex:
+        logger.error("Unexpected error: {}".format(ex),
+                     exc_info=True)
 
-    return resp.value
+    finally:
+        published = publish_data_mqtt(mqtt_msgs, config, client_id="battery-data-script")
+        if published and change_filter is not None:
+            change_filter.save()
+        if 'connection' in locals() and connection is not None:
+            connection.close()
+        if capture is not None:
+            capture.close()
+        if gps_reader is not None:
+            gps_reader.stop()
+        logger.info("===  Script end  ===")
 
 
-def query_bat_cell_volt_23(connection):
-    logger.info("**** Querying bat_cell_volt_23 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
+def run_daemon(config, publish_interval):
+    """
+        Keep the OBDII and MQTT connections open and poll continuously.
+
+        Signals are refreshed as the scheduler sees fit and the latest
+        state is published every publish_interval seconds. The OBDII
+        connection is only reopened when it fails. SIGTERM and SIGINT
+        stop the loop cleanly.
+    """
+    if config.get('monitor', {}).get('enabled', False):
+        raise ValueError("monitor.enabled needs serial.transport set to asyncio")
+    stop = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info("Received signal {}, stopping".format(signum))
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    scheduler = make_scheduler(config)
+    reconnect_delay = float(config.get('daemon', {}).get('reconnect_delay', 10))
+    change_filter = make_change_filter(config)
+    history = make_history(config)
+    capture = make_capture(config)
+    metrics = make_metrics(config)
+    metrics_interval = float(config.get('metrics', {}).get('mqtt_interval', 60))
+    gps_reader = make_gps_reader(config)
+
+    logger.info("=== Daemon start ===")
+    metrics_server = make_metrics_server(config, metrics)
+    client = mqtt_connect(config, client_id="battery-data-daemon")
+    forwarder = make_store_forward(config, client)
+    if forwarder is not None:
+        forwarder.start()
+    connection = None
+    values = {}
+    fresh = {}  # values read since the last publish
+    next_publish = time.monotonic() + publish_interval
+    next_metrics = time.monotonic() + metrics_interval
 
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_23"],3)
+    try:
+        while not stop.is_set():
+            try:
+                if connection is None:
+                    connection, planner = connect(config, capture, metrics)
+
+                start = time.monotonic()
+                polled = scheduler.poll(planner, errors=(ValueError, CanError), budget=cycle_budget(config))
+                tag_gps(polled, gps_reader, start)
+                values.update(polled)
+                fresh.update(polled)
+                if history is not None:
+                    history.record(polled)
+
+                if connection.status() != OBDStatus.CAR_CONNECTED:
+                    raise OBDIIConnectionError(connection.status())
+            except OBDIIConnectionError as err:
+                logger.error("OBDII connection error: {0}. Reconnecting in {1} second(s)..."
+                             .format(err, reconnect_delay), exc_info=False)
+                if connection is not None:
+                    connection.close()
+                    if metrics is not None:
+                        metrics.reconnects += 1
+                connection = None
+                stop.wait(reconnect_delay)
+                continue
+            except Exception as ex:
+                logger.error("Unexpected error: {}".format(ex),
+                             exc_info=True)
+                stop.wait(reconnect_delay)
+                continue
+
+            now = time.monotonic()
+            if now >= next_publish and values:
+                publish_or_store(client, forwarder, publish_messages(config, change_filter, values, fresh, history))
+                fresh.clear()
+                next_publish = now + publish_interval
+            if metrics is not None and metrics_interval > 0 and now >= next_metrics:
+                client.publish([metrics.message(config['mqtt']['topic_prefix'])])
+                next_metrics = now + metrics_interval
+
+            stop.wait(min(scheduler.wait_time(), max(0, next_publish - time.monotonic())))
+    finally:
+        if connection is not None:
+            connection.close()
+        if forwarder is not None:
+            forwarder.stop()
+        client.stop()
+        if change_filter is not None:
+            change_filter.save()
+        if capture is not None:
+            capture.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if gps_reader is not None:
+            gps_reader.stop()
+        logger.info("===  Daemon end  ===")
+
+
+async def async_connect(config, capture=None, metrics=None):
+    """connect() using the asyncio ELM327 transport."""
+    cache = make_connection_cache(config)
+    protocol = known_protocol(config, cache)
+    if protocol is not None:
+        connection = AsyncELM327(config['serial']['port'], int(config['serial']['baudrate']),
+                                 protocol=PROTOCOLS[protocol], warm_start=True)
+    else:
+        connection = AsyncELM327(config['serial']['port'], int(config['serial']['baudrate']))
+    try:
+        await connection.open()
+    except (ConnectionError, OSError, asyncio.TimeoutError) as err:
+        raise OBDIIConnectionError(err)
+    # Nobody else gets to close the connection until it is returned
+    try:
+        if cache is not None:
+            cache.save(config['serial']['port'], int(config['serial']['baudrate']), connection.protocol.ELM_ID)
+        if metrics is not None:
+            metrics.instrument(connection)
+
+        planner = AsyncQueryPlanner(connection,
+                                    async_query_command,
+                                    max_dids=int(config.get('query', {}).get('max_dids_per_request', 1)),
+                                    fast_path=make_fast_path(config),
+                                    capture=capture,
+                                    metrics=metrics)
+        if config.get('query', {}).get('support_cache'):
+            planner.support_cache = make_support_cache(config, await async_read_vin(planner))
+    except BaseException:
+        connection.close()
+        raise
+    return connection, planner
+
+
+async def run_daemon_async(config, publish_interval):
+    """run_daemon() on a single event loop using the asyncio ELM327 transport."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    scheduler = make_scheduler(config)
+    monitor_config = config.get('monitor', {})
+    decoder = None
+    if monitor_config.get('enabled', False):
+        if not monitor_config.get('frames'):
+            raise ValueError("monitor.enabled needs monitor.frames, the broadcast frames of your car")
+        decoder = BroadcastDecoder(monitor_config['frames'])
+    monitor_duration = float(monitor_config.get('window', 1.0))
+    monitor_adapter = monitor_config.get('adapter', 'elm327')
+
+    reconnect_delay = float(config.get('daemon', {}).get('reconnect_delay', 10))
+    change_filter = make_change_filter(config)
+    history = make_history(config)
+    capture = make_capture(config)
+    metrics = make_metrics(config)
+    metrics_interval = float(config.get('metrics', {}).get('mqtt_interval', 60))
+    gps_reader = make_gps_reader(config)
+    values = {}
+    fresh = {}  # values read since the last publish
+
+    async def wait(timeout):
+        try:
+            await asyncio.wait_for(stop.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def acquire():
+        nonlocal decoder
+        connection = None
+        try:
+            while not stop.is_set():
+                try:
+                    if connection is None:
+                        connection, planner = await async_connect(config, capture, metrics)
+
+                    if decoder is not None:
+                        start = time.monotonic()
+                        broadcast = await monitor_window(connection, decoder, monitor_duration, monitor_adapter)
+                        tag_gps(broadcast, gps_reader, start)
+                        planner.reset()
+                        values.update(broadcast)
+                        fresh.update(broadcast)
+                        if history is not None:
+                            history.record(broadcast)
+                        # Broadcast values count as fresh, don't poll them as well
+                        scheduler.done([name for name in broadcast if name in scheduler.next_due])
+
+                    if decoder is None or monitor_config.get('mode', 'alongside') == 'alongside':
+                        start = time.monotonic()
+                        polled = await scheduler.poll_async(planner, errors=(ValueError, CanError),
+                                                            budget=cycle_budget(config))
+                        tag_gps(polled, gps_reader, start)
+                        values.update(polled)
+                        fresh.update(polled)
+                        if history is not None:
+                            history.record(polled)
+
+                    if connection.status() != OBDStatus.CAR_CONNECTED:
+                        raise OBDIIConnectionError(connection.status())
+                except MonitorUnsupported as err:
+                    logger.error("CAN monitor mode not supported by the adapter ({}), polling only".format(err))
+                    decoder = None
+                    planner.reset()
+                    continue
+                except OBDIIConnectionError as err:
+                    logger.error("OBDII connection error: {0}. Reconnecting in {1} second(s)..."
+                                 .format(err, reconnect_delay), exc_info=False)
+                    if connection is not None:
+                        connection.close()
+                        if metrics is not None:
+                            metrics.reconnects += 1
+                    connection = None
+                    await wait(reconnect_delay)
+                    continue
+                if decoder is None:
+                    await wait(scheduler.wait_time())
+        finally:
+            if connection is not None:
+                connection.close()
+
+    async def publish_state(client):
+        next_metrics = time.monotonic() + metrics_interval
+        while not stop.is_set():
+            await wait(publish_interval)
+            if values:
+                publish_or_store(client, forwarder, publish_messages(config, change_filter, values, fresh, history))
+                fresh.clear()
+            if metrics is not None and metrics_interval > 0 and time.monotonic() >= next_metrics:
+                client.publish([metrics.message(config['mqtt']['topic_prefix'])])
+                next_metrics = time.monotonic() + metrics_interval
+
+    logger.info("=== Daemon start ===")
+    metrics_server = make_metrics_server(config, metrics)
+    client = mqtt_connect(config, client_id="battery-data-daemon")
+    forwarder = make_store_forward(config, client)
+    if forwarder is not None:
+        forwarder.start()
+    try:
+        await asyncio.gather(acquire(), publish_state(client))
+    finally:
+        if forwarder is not None:
+            forwarder.stop()
+        client.stop()
+        if change_filter is not None:
+            change_filter.save()
+        if capture is not None:
+            capture.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if gps_reader is not None:
+            gps_reader.stop()
+        logger.info("===  Daemon end  ===")
 
-    return resp.value
 
+def main():
+    parser = argparse.ArgumentParser(description="Read Chevy Bolt EV battery data over OBDII and publish it to MQTT.")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running and poll continuously instead of publishing a single snapshot")
+    parser.add_argument('--interval', type=float, default=None,
+                        help="seconds between published snapshots in daemon mode")
+    args = parser.parse_args()
 
-def query_bat_cell_volt_24(connection):
-    logger.info("**** Querying bat_cell_volt_24 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
+    config = load_config()
 
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_24"],3)
+    log_pipeline = setup_logging(config.get('logging', {}))
 
-    return resp.value
-
-
-def query_bat_cell_volt_25(connection):
-    logger.info("**** Querying bat_cell_volt_25 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_25"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_26(connection):
-    logger.info("**** Querying bat_cell_volt_26 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_26"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_27(connection):
-    logger.info("**** Querying bat_cell_volt_27 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_27"],3)
-    return resp.value
-
-
-def query_bat_cell_volt_28(connection):
-    logger.info("**** Querying bat_cell_volt_28 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_28"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_29(connection):
-    logger.info("**** Querying bat_cell_volt_29 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_29"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_30(connection):
-    logger.info("**** Querying bat_cell_volt_30 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_30"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_31(connection):
-    logger.info("**** Querying bat_cell_volt_31 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_31"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_32(connection):
-    logger.info("**** Querying bat_cell_volt_32 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_32"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_33(connection):
-    logger.info("**** Querying bat_cell_volt_33 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_33"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_34(connection):
-    logger.info("**** Querying bat_cell_volt_34 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_34"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_35(connection):
-    logger.info("**** Querying bat_cell_volt_35 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_35"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_36(connection):
-    logger.info("**** Querying bat_cell_volt_36 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_36"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_37(connection):
-    logger.info("**** Querying bat_cell_volt_37 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_37"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_38(connection):
-    logger.info("**** Querying bat_cell_volt_38 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_38"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_39(connection):
-    logger.info("**** Querying bat_cell_volt_39 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_39"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_40(connection):
-    logger.info("**** Querying bat_cell_volt_40 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_40"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_41(connection):
-    logger.info("**** Querying bat_cell_volt_41 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_41"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_42(connection):
-    logger.info("**** Querying bat_cell_volt_42 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_42"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_43(connection):
-    logger.info("**** Querying bat_cell_volt_43 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_43"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_44(connection):
-    logger.info("**** Querying bat_cell_volt_44 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_44"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_45(connection):
-    logger.info("**** Querying bat_cell_volt_45 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_45"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_46(connection):
-    logger.info("**** Querying bat_cell_volt_46 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_46"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_47(connection):
-    logger.info("**** Querying bat_cell_volt_47 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_47"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_48(connection):
-    logger.info("**** Querying bat_cell_volt_48 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_48"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_49(connection):
-    logger.info("**** Querying bat_cell_volt_49 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_49"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_50(connection):
-    logger.info("**** Querying bat_cell_volt_50 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_50"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_51(connection):
-    logger.info("**** Querying bat_cell_volt_51 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_51"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_52(connection):
-    logger.info("**** Querying bat_cell_volt_52 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_52"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_53(connection):
-    logger.info("**** Querying bat_cell_volt_53 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_53"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_54(connection):
-    logger.info("**** Querying bat_cell_volt_54 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_54"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_55(connection):
-    logger.info("**** Querying bat_cell_volt_55 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_55"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_56(connection):
-    logger.info("**** Querying bat_cell_volt_56 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_56"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_57(connection):
-    logger.info("**** Querying bat_cell_volt_57 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_57"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_58(connection):
-    logger.info("**** Querying bat_cell_volt_58 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_58"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_59(connection):
-    logger.info("**** Querying bat_cell_volt_59 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_59"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_60(connection):
-    logger.info("**** Querying bat_cell_volt_60 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_60"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_61(connection):
-    logger.info("**** Querying bat_cell_volt_61 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_61"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_62(connection):
-    logger.info("**** Querying bat_cell_volt_62 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_62"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_63(connection):
-    logger.info("**** Querying bat_cell_volt_63 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_63"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_64(connection):
-    logger.info("**** Querying bat_cell_volt_64 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_64"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_65(connection):
-    logger.info("**** Querying bat_cell_volt_65 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_65"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_66(connection):
-    logger.info("**** Querying bat_cell_volt_66 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_66"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_67(connection):
-    logger.info("**** Querying bat_cell_volt_67 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_67"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_68(connection):
-    logger.info("**** Querying bat_cell_volt_68 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_68"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_69(connection):
-    logger.info("**** Querying bat_cell_volt_69 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_69"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_70(connection):
-    logger.info("**** Querying bat_cell_volt_70 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_70"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_71(connection):
-    logger.info("**** Querying bat_cell_volt_71 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_71"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_72(connection):
-    logger.info("**** Querying bat_cell_volt_72 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_72"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_73(connection):
-    logger.info("**** Querying bat_cell_volt_73 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_73"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_74(connection):
-    logger.info("**** Querying bat_cell_volt_74 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_74"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_75(connection):
-    logger.info("**** Querying bat_cell_volt_75 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_75"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_76(connection):
-    logger.info("**** Querying bat_cell_volt_76 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_76"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_77(connection):
-    logger.info("**** Querying bat_cell_volt_77 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_77"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_78(connection):
-    logger.info("**** Querying bat_cell_volt_78 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_78"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_79(connection):
-    logger.info("**** Querying bat_cell_volt_79 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_79"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_80(connection):
-    logger.info("**** Querying bat_cell_volt_80 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_80"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_81(connection):
-    logger.info("**** Querying bat_cell_volt_81 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_81"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_82(connection):
-    logger.info("**** Querying bat_cell_volt_82 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_82"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_83(connection):
-    logger.info("**** Querying bat_cell_volt_83 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_83"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_84(connection):
-    logger.info("**** Querying bat_cell_volt_84 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_84"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_85(connection):
-    logger.info("**** Querying bat_cell_volt_85 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_85"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_86(connection):
-    logger.info("**** Querying bat_cell_volt_86 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_86"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_87(connection):
-    logger.info("**** Querying bat_cell_volt_87 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_87"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_88(connection):
-    logger.info("**** Querying bat_cell_volt_88 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_88"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_89(connection):
-    logger.info("**** Querying bat_cell_volt_89 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_89"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_90(connection):
-    logger.info("**** Querying bat_cell_volt_90 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_90"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_91(connection):
-    logger.info("**** Querying bat_cell_volt_91 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_91"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_92(connection):
-    logger.info("**** Querying bat_cell_volt_92 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_92"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_93(connection):
-    logger.info("**** Querying bat_cell_volt_93 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_93"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_94(connection):
-    logger.info("**** Querying bat_cell_volt_94 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_94"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_95(connection):
-    logger.info("**** Querying bat_cell_volt_95 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_95"],3)
-
-    return resp.value
-
-
-def query_bat_cell_volt_96(connection):
-    logger.info("**** Querying bat_cell_volt_96 information ****")
-    # Set header to 7E7
-    query_command(connection, ext_commands["CAN_HEADER_7E7"])
-    # Set the CAN receive address to 7EF
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EF"])
-
-    resp = query_command(connection, ext_commands["BAT_CELL_VOLT_96"],3)
-
-    return resp.value
-
-
-
-#########################################################
-def query_ac_voltage(connection):
-    logger.info("**** Querying battery information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["AC_VOLTAGE"],3)
-
-    return resp.value
-
-def query_ac_current(connection):
-    logger.info("**** Querying battery information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["AC_CURRENT"],3)
-
-    return resp.value
-
-
-def query_elec_coolant_temp(connection):
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["ELEC_COOLANT_TEMP"],3)
-
-    return resp.value
-
-def query_ambient_air_temp(connection):
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["AMBIENT_AIR_TEMP"],3)
-
-    return resp.value
-
-
-def query_bat_coolant_temp(connection):
-    logger.info("**** Querying battery information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_COOLANT_TEMP"],3)
-
-    return resp.value
-
-
-def query_bat_soc(connection):
-    logger.info("**** Querying battery information ****")
-    # Set header to 7E4
-    query_command(connection, ext_commands["CAN_HEADER_7E4"])
-    # Set the CAN receive address to 7EC
-    query_command(connection, ext_commands["CAN_RECEIVE_ADDRESS_7EC"])
-
-    resp = query_command(connection, ext_commands["BAT_SOC"],3)
-
-    return resp.value
-
-
-def publish_data_mqtt(msgs,
-                      hostname,
-                      port,
-                      client_id,
-                      user,
-                      password,
-                      keepalive=60,
-                      will=None):
-    """Publish all messages to MQTT."""
-    try:
-        logger.info("Publish messages to MQTT")
-        for msg in msgs:
-            logger.info("{}".format(msg))
-
-        publish.multiple(msgs,
-                         hostname=hostname,
-                         port=port,
-                         client_id=client_id,
-                         keepalive=keepalive,
-                         will=will,
-                         auth={'username': user, 'password': password},
-                         #tls={'tls_version': ssl.PROTOCOL_TLS},
-                         #protocol=mqtt.MQTTv311,
-                         transport="tcp"
-                         )
-        logger.info("{} message(s) published to MQTT".format(len(msgs)))
-    except Exception as err:
-        logger.error("Error publishing to MQTT: {}".format(err), exc_info=False)
-
-
-def main():
-    console_handler = logging.StreamHandler()  # sends output to stderr
-    console_handler.setFormatter(logging.Formatter("%(asctime)s %(name)-10s %(levelname)-8s %(message)s"))
-    console_handler.setLevel(logging.DEBUG)
-    logger.addHandler(console_handler)
-
-    file_handler = logging.handlers.TimedRotatingFileHandler(os.path.dirname(os.path.realpath(__file__)) + '/../obdii_data.log',
-                                                             when='midnight',
-                                                             backupCount=15
-                                                             )  # sends output to obdii_data.log file rotating it at midnight and storing latest 15 days
-    file_handler.setFormatter(logging.Formatter("%(asctime)s %(name)-10s %(levelname)-8s %(message)s"))
-    file_handler.setLevel(logging.INFO)
-    logger.addHandler(file_handler)
-
-    logger.setLevel(logging.DEBUG)
-
-    obd.logger.setLevel(obd.logging.DEBUG)
-    # Remove obd logger existing handlers
-    for handler in obd.logger.handlers[:]:
-        obd.logger.removeHandler(handler)
-    # Add handlers to obd logger
-    obd.logger.addHandler(console_handler)
-    obd.logger.addHandler(file_handler)
-
-    with open(os.path.dirname(os.path.realpath(__file__)) + '/obdii_data.config.json') as config_file:
-        config = json.loads(config_file.read())
-
-
-    broker_address = config['mqtt']['broker']
-    port = int(config['mqtt']['port'])
-    user = config['mqtt']['user']
-    password = config['mqtt']['password']
-    topic_prefix = config['mqtt']['topic_prefix']
-
-    print(broker_address,user,topic_prefix) 
-
-    mqtt_msgs = []
-
-    try:
-        logger.info("=== Script start ===")
-
-        connection = obd_connect(portstr=config['serial']['port'],
-                                 baudrate=int(config['serial']['baudrate']),
-                                 fast=False,
-                                 timeout=30)
-
-        # Print supported commands
-        # DTC = Diagnostic Trouble Codes
-        # MIL = Malfunction Indicator Lamp
-        logger.debug(connection.print_commands())
-
-        bolt_state={}
-
-        try:
-            bolt_state["bat_pack_cap_ah_raw_2018"]=query_bat_pack_cap_ah_raw_2018(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_cap_ah_raw_2018: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_cap_ah_raw_2019"]=query_bat_pack_cap_ah_raw_2019(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_cap_ah_raw_2019: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_cap_kwh_est_2018"]=query_bat_pack_cap_kwh_est_2018(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_cap_kwh_est_2018: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_cap_kwh_est_2019"]=query_bat_pack_cap_kwh_est_2019(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_cap_kwh_est_2019: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_soc_disp"]=query_bat_pack_soc_disp(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_soc_disp: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_soc_raw_hd"]=query_bat_pack_soc_raw_hd(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_soc_raw_hd: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_soc_raw_ld"]=query_bat_pack_soc_raw_ld(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_soc_raw_ld: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_soc_raw_ld2"]=query_bat_pack_soc_raw_ld2(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_soc_raw_ld2: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_soc_raw_ld3"]=query_bat_pack_soc_raw_ld3(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_soc_raw_ld3: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_soc_var"]=query_bat_pack_soc_var(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_soc_var: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_current_hd"]=query_bat_pack_current_hd(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_current_hd: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_num_charges"]=query_bat_pack_num_charges(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_num_charges: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_mod_temp_1"]=query_bat_mod_temp_1(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_mod_temp_1: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_mod_temp_2"]=query_bat_mod_temp_2(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_mod_temp_2: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_mod_temp_3"]=query_bat_mod_temp_3(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_mod_temp_3: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_mod_temp_4"]=query_bat_mod_temp_4(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_mod_temp_4: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_mod_temp_5"]=query_bat_mod_temp_5(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_mod_temp_5: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_mod_temp_6"]=query_bat_mod_temp_6(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_mod_temp_6: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_mod_temp_max"]=query_bat_mod_temp_max(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_mod_temp_max: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_mod_temp_min"]=query_bat_mod_temp_min(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_mod_temp_min: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_mod_temp_avg"]=query_bat_mod_temp_avg(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_mod_temp_avg: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_min"]=query_bat_cell_volt_min(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_min: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_min_num"]=query_bat_cell_volt_min_num(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_min_num: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_max"]=query_bat_cell_volt_max(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_max: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_max_num"]=query_bat_cell_volt_max_num(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_max_num: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_avg"]=query_bat_cell_volt_avg(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_avg: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_resistance"]=query_bat_pack_resistance(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_resistance: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_volt_min"]=query_bat_pack_volt_min(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_volt_min: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_pack_volt_max"]=query_bat_pack_volt_max(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_pack_volt_max: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["hv_current_hd"]=query_hv_current_hd(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying hv_current_hd: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["hv_current"]=query_hv_current(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying hv_current: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["ambient_air_temp"]=query_ambient_air_temp(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying ambient_air_temp: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_01"]=query_bat_cell_volt_01(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_01: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_02"]=query_bat_cell_volt_02(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_02: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_03"]=query_bat_cell_volt_03(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_03: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_04"]=query_bat_cell_volt_04(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_04: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_05"]=query_bat_cell_volt_05(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_05: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_06"]=query_bat_cell_volt_06(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_06: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_07"]=query_bat_cell_volt_07(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_07: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_08"]=query_bat_cell_volt_08(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_08: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_09"]=query_bat_cell_volt_09(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_09: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_10"]=query_bat_cell_volt_10(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_10: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_11"]=query_bat_cell_volt_11(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_11: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_12"]=query_bat_cell_volt_12(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_12: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_13"]=query_bat_cell_volt_13(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_13: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_14"]=query_bat_cell_volt_14(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_14: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_15"]=query_bat_cell_volt_15(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_15: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_16"]=query_bat_cell_volt_16(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_16: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_17"]=query_bat_cell_volt_17(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_17: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_18"]=query_bat_cell_volt_18(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_18: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_19"]=query_bat_cell_volt_19(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_19: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_20"]=query_bat_cell_volt_20(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_20: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_21"]=query_bat_cell_volt_21(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_21: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_22"]=query_bat_cell_volt_22(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_22: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_23"]=query_bat_cell_volt_23(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_23: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_24"]=query_bat_cell_volt_24(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_24: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_25"]=query_bat_cell_volt_25(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_25: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_26"]=query_bat_cell_volt_26(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_26: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_27"]=query_bat_cell_volt_27(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_27: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_28"]=query_bat_cell_volt_28(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_28: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_29"]=query_bat_cell_volt_29(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_29: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_30"]=query_bat_cell_volt_30(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_30: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_31"]=query_bat_cell_volt_31(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_31: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_32"]=query_bat_cell_volt_32(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_32: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_33"]=query_bat_cell_volt_33(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_33: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_34"]=query_bat_cell_volt_34(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_34: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_35"]=query_bat_cell_volt_35(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_35: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_36"]=query_bat_cell_volt_36(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_36: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_37"]=query_bat_cell_volt_37(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_37: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_38"]=query_bat_cell_volt_38(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_38: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_39"]=query_bat_cell_volt_39(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_39: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_40"]=query_bat_cell_volt_40(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_40: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_41"]=query_bat_cell_volt_41(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_41: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_42"]=query_bat_cell_volt_42(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_42: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_43"]=query_bat_cell_volt_43(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_43: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_44"]=query_bat_cell_volt_44(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_44: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_45"]=query_bat_cell_volt_45(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_45: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_46"]=query_bat_cell_volt_46(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_46: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_47"]=query_bat_cell_volt_47(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_47: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_48"]=query_bat_cell_volt_48(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_48: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_49"]=query_bat_cell_volt_49(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_49: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_50"]=query_bat_cell_volt_50(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_50: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_51"]=query_bat_cell_volt_51(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_51: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_52"]=query_bat_cell_volt_52(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_52: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_53"]=query_bat_cell_volt_53(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_53: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_54"]=query_bat_cell_volt_54(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_54: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_55"]=query_bat_cell_volt_55(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_55: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_56"]=query_bat_cell_volt_56(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_56: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_57"]=query_bat_cell_volt_57(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_57: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_58"]=query_bat_cell_volt_58(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_58: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_59"]=query_bat_cell_volt_59(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_59: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_60"]=query_bat_cell_volt_60(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_60: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_61"]=query_bat_cell_volt_61(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_61: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_62"]=query_bat_cell_volt_62(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_62: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_63"]=query_bat_cell_volt_63(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_63: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_64"]=query_bat_cell_volt_64(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_64: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_65"]=query_bat_cell_volt_65(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_65: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_66"]=query_bat_cell_volt_66(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_66: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_67"]=query_bat_cell_volt_67(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_67: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_68"]=query_bat_cell_volt_68(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_68: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_69"]=query_bat_cell_volt_69(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_69: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_70"]=query_bat_cell_volt_70(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_70: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_71"]=query_bat_cell_volt_71(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_71: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_72"]=query_bat_cell_volt_72(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_72: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_73"]=query_bat_cell_volt_73(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_73: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_74"]=query_bat_cell_volt_74(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_74: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_75"]=query_bat_cell_volt_75(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_75: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_76"]=query_bat_cell_volt_76(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_76: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_77"]=query_bat_cell_volt_77(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_77: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_78"]=query_bat_cell_volt_78(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_78: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_79"]=query_bat_cell_volt_79(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_79: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_80"]=query_bat_cell_volt_80(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_80: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_81"]=query_bat_cell_volt_81(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_81: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_82"]=query_bat_cell_volt_82(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_82: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_83"]=query_bat_cell_volt_83(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_83: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_84"]=query_bat_cell_volt_84(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_84: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_85"]=query_bat_cell_volt_85(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_85: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_86"]=query_bat_cell_volt_86(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_86: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_87"]=query_bat_cell_volt_87(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_87: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_88"]=query_bat_cell_volt_88(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_88: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_89"]=query_bat_cell_volt_89(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_89: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_90"]=query_bat_cell_volt_90(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_90: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_91"]=query_bat_cell_volt_91(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_91: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_92"]=query_bat_cell_volt_92(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_92: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_93"]=query_bat_cell_volt_93(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_93: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_94"]=query_bat_cell_volt_94(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_94: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_95"]=query_bat_cell_volt_95(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_95: {} ****".format(err), exc_info=False)
-        
-
-        try:
-            bolt_state["bat_cell_volt_96"]=query_bat_cell_volt_96(connection)
-        except (ValueError, CanError) as err:
-            logger.warning("**** Error querying bat_cell_volt_96: {} ****".format(err), exc_info=False)
-        
-
-        mqtt_msgs.extend([{'topic': topic_prefix + "state",
-                           'payload': json.dumps(bolt_state),
-                           'qos': 0,
-                           'retain': True}]
-                         )
-
-    except OBDIIConnectionError as err:
-        logger.error("OBDII connection error: {0}".format(err),
-                     exc_info=False)
-    except ValueError as err:
-        logger.error("Error found: {0}".format(err),
-                     exc_info=False)
-    except CanError as err:
-        logger.error("Error found reading CAN response: {0}".format(err),
-                     exc_info=False)
-    except Exception as ex:
-        logger.error("Unexpected error: {}".format(ex),
-                     exc_info=True)
+    print(config['mqtt']['broker'], config['mqtt']['user'], config['mqtt']['topic_prefix'])
 
+    try:
+        if args.daemon:
+            publish_interval = args.interval
+            if publish_interval is None:
+                publish_interval = float(config.get('daemon', {}).get('publish_interval', 10))
+            if config['serial'].get('transport', 'python-obd') == 'asyncio':
+                asyncio.run(run_daemon_async(config, publish_interval))
+            else:
+                run_daemon(config, publish_interval)
+        else:
+            run_once(config)
     finally:
-        publish_data_mqtt(msgs=mqtt_msgs,
-                          hostname=broker_address,
-                          port=port,
-                          client_id="battery-data-script",
-                          user=user,
-                          password=password)
-        if 'connection' in locals() and connection is not None:
-            connection.close()
-        logger.info("===  Script end  ===")
+        log_pipeline.stop()
 
 
 if __name__ == '__main__':
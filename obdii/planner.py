@@ -0,0 +1,405 @@
+import logging
+import time
+
+from commands import (DEFAULT_ATTEMPTS, critical_signals, ext_command_attempts, ext_command_priorities, ext_commands,
+                      ext_command_ecus, shared_requests)
+from elm_errors import MAX_BACKOFF, AdapterReset, UnknownCommand
+from uds import MAX_DIDS_PER_REQUEST, can_pack, decode_multi_did_response, multi_did_command
+
+logger = logging.getLogger('obdii.planner')
+
+# Time a request is expected to take when the fast path has no latency for its ECU yet (ELM327 default ATST)
+DEFAULT_REQUEST_SECONDS = 0.2
+
+
+class QueryPlanner:
+    """
+        Plans and runs ext_commands queries grouped by ECU.
+
+        The adapter keeps its ATSH/ATCRA settings until they are changed,
+        so the planner remembers which ECU is currently selected and only
+        sends the header and receive address commands when the next signal
+        lives on a different ECU.
+
+        With max_dids > 1, signals with a known payload size are packed into
+        multi-DID ReadDataByIdentifier requests. ECUs that refuse them are
+        remembered and queried one DID at a time from then on.
+
+        Signals decoded from the same DID share a single request, the
+        answer is run through the decoder of each of them.
+
+        An optional FastPath appends the expected frame count to each query
+        and tunes ATST whenever the planner switches ECU. An optional
+        SupportCache skips signals the car is known not to answer. An
+        optional CaptureWriter records the raw answer to every query and
+        optional Metrics their latency and retries.
+
+        When query_command() had to warm start the adapter (AdapterReset)
+        the ECU is selected again and the query retried once, without the
+        frame count. An adapter answering ? to a frame count or to ATST
+        doesn't support it, the fast path stops using it.
+
+        run() can be given a deadline, see passes() and attempts_left().
+
+        The planning itself lives in the *_steps generators, drive() makes
+        the adapter calls they ask for. AsyncQueryPlanner only replaces
+        drive() with one that awaits them.
+    """
+
+    def __init__(self, connection, query, max_dids=1, fast_path=None, support_cache=None, capture=None, metrics=None):
+        self.connection = connection
+        self.query = query  # query_command(connection, command, max_attempts, on_attempt) compatible function
+        self.max_dids = min(max_dids, MAX_DIDS_PER_REQUEST)
+        self.fast_path = fast_path
+        self.support_cache = support_cache
+        self.capture = capture
+        self.metrics = metrics
+        self.current_ecu = None
+        self.single_did_ecus = set()
+        self.deferred = []  # signals the last run() left for the next cycle
+
+    def reset(self):
+        """Forget the adapter header state, e.g. after an ATZ or reconnect."""
+        self.current_ecu = None
+        if self.fast_path is not None:
+            self.fast_path.reset()
+
+    def drive(self, steps):
+        """
+            Run one of the *_steps generators, making the calls it yields.
+
+            The steps hold the planner logic for both transports. They yield
+            (function, args...) for every query or ECU selection and get the
+            result back, or the exception it raised thrown in.
+        """
+        result = error = None
+        while True:
+            try:
+                call = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as done:
+                return done.value
+            result = error = None
+            try:
+                result = call[0](*call[1:])
+            except Exception as err:
+                error = err
+
+    def select_ecu(self, ecu):
+        """Point the adapter at the given (header, receive address) pair if needed."""
+        return self.drive(self.select_ecu_steps(ecu))
+
+    def query_ecu(self, ecu, command, max_attempts=DEFAULT_ATTEMPTS):
+        """Query a command on the selected ECU, through the fast path if there is one."""
+        return self.drive(self.query_ecu_steps(ecu, command, max_attempts))
+
+    def run(self, names, errors=(ValueError,), deadline=None):
+        """
+            Queries all the requested signals.
+
+            Returns a dict of name -> decoded value for every signal that
+            answered. Failures are logged and left out of the result.
+            deadline is the time.monotonic() the run should be over by,
+            the signals it had to leave out are listed in self.deferred.
+        """
+        return self.drive(self.run_steps(names, errors, deadline))
+
+    def select_ecu_steps(self, ecu):
+        if ecu == self.current_ecu:
+            return
+        header, receive_address = ecu
+        # If any of these fail we no longer know what the adapter is set to
+        self.current_ecu = None
+        try:
+            yield self.query, self.connection, ext_commands[header]
+            yield self.query, self.connection, ext_commands[receive_address]
+        except AdapterReset:
+            self.reset()
+            raise
+        self.current_ecu = ecu
+
+        timeout_command = self.fast_path.timeout_command(ecu) if self.fast_path is not None else None
+        if timeout_command is not None:
+            try:
+                yield self.query, self.connection, timeout_command
+                self.fast_path.current_timeout = self.fast_path.timeout(ecu)
+            except AdapterReset:
+                self.reset()
+                raise
+            except UnknownCommand as err:
+                logger.warning("**** Adapter doesn't support ATST ({}), keeping its default timeout ****"
+                               .format(err), exc_info=False)
+                self.fast_path.timeouts_rejected()
+            except ValueError as err:
+                self.fast_path.current_timeout = None
+                logger.warning("**** Error setting timeout for ECU {}: {} ****".format(ecu[0], err), exc_info=False)
+
+    def query_ecu_steps(self, ecu, command, max_attempts=DEFAULT_ATTEMPTS):
+        fast_command = self.fast_path.command(ecu, command) if self.fast_path is not None else command
+        attempts = []  # every time the command went out, retries included
+        start = time.monotonic()
+        try:
+            try:
+                response = yield self.query, self.connection, fast_command, max_attempts, attempts.append
+            except UnknownCommand as err:
+                if fast_command is command:
+                    raise
+                logger.warning("**** Adapter doesn't support frame counts ({}), sending commands without ****"
+                               .format(err), exc_info=False)
+                self.fast_path.counts_rejected()
+                fast_command = command
+                response = yield self.query, self.connection, command, max_attempts, attempts.append
+            except AdapterReset as err:
+                logger.warning("**** {}, selecting ECU {} again ****".format(err, ecu[0]), exc_info=False)
+                self.reset()
+                yield self.select_ecu, ecu
+                fast_command = command
+                response = yield self.query, self.connection, command, max_attempts, attempts.append
+        except Exception as err:
+            if isinstance(err, AdapterReset):
+                self.reset()
+            if self.fast_path is not None:
+                self.fast_path.failed(ecu, command)
+            self.record_capture(ecu, command, None, start)
+            self.record_metrics(ecu, command, start, len(attempts), False)
+            raise
+        if self.fast_path is not None:
+            self.fast_path.observe(ecu, command, response, time.monotonic() - start, fast_command is not command)
+        self.record_capture(ecu, command, response, start)
+        self.record_metrics(ecu, command, start, len(attempts), True)
+        return response
+
+    def record_capture(self, ecu, command, response, start):
+        """Hand the raw answer to the capture writer, if any. response is None when the query failed."""
+        if self.capture is None:
+            return
+        data = None
+        if response is not None:
+            data = response.messages[0].data if response.messages else b""
+        self.capture.record(int(ecu[0][-3:], 16), command.command, data, start)
+
+    def record_metrics(self, ecu, command, start, attempts, ok):
+        """Report a query to the metrics, if any. attempts counts the requests sent, not the recovery commands."""
+        if self.metrics is None:
+            return
+        name = command.name if command.name != "MULTI_DID" else "MULTI_DID_" + command.command[2:].decode().upper()
+        self.metrics.observe_query(ecu[0][-3:], name, time.monotonic() - start, attempts, ok)
+
+    def plan(self, names):
+        """
+            Groups the requested signals by ECU.
+
+            Returns a list of (ecu, [names]) tuples. The ECU the adapter is
+            already pointing at goes first, the rest keep the order in which
+            they first appear in names.
+        """
+        groups = {}
+        for name in names:
+            ecu = ext_command_ecus[name]
+            if ecu not in groups:
+                groups[ecu] = []
+            groups[ecu].append(name)
+
+        plan = list(groups.items())
+        plan.sort(key=lambda group: group[0] != self.current_ecu)
+        return plan
+
+    def record_support(self, names, values):
+        """
+            Update the support cache after a run.
+
+            Failures only count for ECUs that answered at least one other
+            signal, so a dropped connection doesn't mark everything as
+            unsupported.
+        """
+        if self.support_cache is None:
+            return
+        answering_ecus = set(ext_command_ecus[name] for name in values)
+        for name in names:
+            if name in values or ext_command_ecus[name] in answering_ecus:
+                self.support_cache.record(name, name in values)
+        self.support_cache.save()
+
+    def batches(self, ecu, names):
+        """Split the signals of one ECU into requests, packing DIDs where possible."""
+        max_dids = 1 if ecu in self.single_did_ecus else self.max_dids
+        batch = []
+        for name in names:
+            if max_dids > 1 and can_pack(name):
+                batch.append(name)
+                if len(batch) == max_dids:
+                    yield batch
+                    batch = []
+            else:
+                yield [name]
+        if batch:
+            yield batch
+
+    def attempts(self, names):
+        """Number of attempts for a request shared by names, the most any of them asks for."""
+        return max(ext_command_attempts.get(name, DEFAULT_ATTEMPTS) for name in names)
+
+    def passes(self, names, deadline):
+        """
+            Split the signals of a run into the passes made over the ECUs.
+
+            Without a deadline everything goes in a single pass. With one,
+            requests holding a critical signal go first and requests with
+            only low priority signals last, so they are the first ones
+            left out when time runs short. Signals sharing a request stay
+            together.
+        """
+        if deadline is None:
+            return [names]
+        critical, normal, low = [], [], []
+        for requested in shared_requests(names).values():
+            if any(name in critical_signals for name in requested):
+                critical += requested
+            elif all(ext_command_priorities.get(name) == 'low' for name in requested):
+                low += requested
+            else:
+                normal += requested
+        return [part for part in (critical, normal, low) if part]
+
+    def request_seconds(self, ecu):
+        """How long a request to ecu is expected to take when nobody answers."""
+        if self.fast_path is not None and ecu in self.fast_path.latency:
+            return max(self.fast_path.latency[ecu] * self.fast_path.latency_factor, self.fast_path.min_timeout)
+        return DEFAULT_REQUEST_SECONDS
+
+    def attempts_left(self, ecu, names, deadline):
+        """
+            Attempts the request for names can make before the deadline, 0 if it should wait for the next cycle.
+
+            query_command() backs off up to MAX_BACKOFF, then twice that...
+            between attempts, n attempts cost at most
+            n * (n - 1) / 2 * MAX_BACKOFF seconds of sleep plus n requests.
+            Critical signals always get at least one attempt.
+        """
+        attempts = self.attempts(names)
+        if deadline is None:
+            return attempts
+        remaining = deadline - time.monotonic()
+        request = self.request_seconds(ecu)
+        allowed = 0
+        while allowed < attempts and allowed * (allowed + 1) / 2 * MAX_BACKOFF + (allowed + 1) * request <= remaining:
+            allowed += 1
+        if allowed == 0 and any(name in critical_signals for name in names):
+            return 1
+        return allowed
+
+    def shared_values(self, names, response):
+        """Decode the answer to one request for every signal in names, the first one is already decoded."""
+        values = {names[0]: response.value}
+        for name in names[1:]:
+            try:
+                value = ext_commands[name](response.messages).value
+            except Exception as err:
+                logger.warning("**** Error decoding {}: {} ****".format(name.lower(), err), exc_info=False)
+                continue
+            if value is None:
+                logger.warning("**** Error decoding {}: no value ****".format(name.lower()))
+                continue
+            values[name] = value
+        return values
+
+    def multi_did_values(self, response, names):
+        """Decode a multi-DID answer for every signal in names."""
+        values = {}
+        for name, resp in decode_multi_did_response(response, names).items():
+            values[name] = resp.value
+        for name in names:
+            if name not in values:
+                logger.warning("**** Error querying {}: missing from multi-DID response ****".format(name.lower()))
+        return values
+
+    def run_multi_steps(self, ecu, names, errors, shared, attempts=DEFAULT_ATTEMPTS):
+        """
+            Query several DIDs at once. Returns None if the ECU refused the request.
+
+            shared maps each name to all the signals decoded from its DID.
+        """
+        logger.info("**** Querying {} information ****".format(", ".join(name.lower() for name in names)))
+        try:
+            response = yield self.query_ecu, ecu, multi_did_command(names), attempts
+        except errors as err:
+            if isinstance(err, AdapterReset):
+                logger.warning("**** Multi-DID request to ECU {} failed, falling back to single DIDs: {} ****"
+                               .format(ecu[0], err), exc_info=False)
+                return None
+            logger.warning("**** Multi-DID request refused by ECU {}, falling back to single DIDs: {} ****"
+                           .format(ecu[0], err), exc_info=False)
+            self.single_did_ecus.add(ecu)
+            return None
+
+        return self.multi_did_values(response, [name for request in names for name in shared[request]])
+
+    def run_steps(self, names, errors=(ValueError,), deadline=None):
+        started = time.monotonic()
+        if self.support_cache is not None:
+            names = self.support_cache.filter(names)
+
+        values = {}
+        self.deferred = []
+        for part in self.passes(names, deadline):
+            for ecu, group in self.plan(part):
+                if self.attempts_left(ecu, group, deadline) == 0:
+                    self.deferred += group
+                    continue
+                try:
+                    yield self.select_ecu, ecu
+                except errors as err:
+                    logger.warning("**** Error selecting ECU {}: {} ****".format(ecu[0], err), exc_info=False)
+                    continue
+
+                # One request per DID, keyed by the first signal decoded from it
+                shared = dict((requested[0], requested) for requested in shared_requests(group).values())
+                for batch in self.batches(ecu, list(shared)):
+                    if len(batch) > 1:
+                        attempts = self.attempts_left(ecu, [name for request in batch for name in shared[request]], deadline)
+                        if attempts == 0:
+                            self.deferred += [name for request in batch for name in shared[request]]
+                            continue
+                        multi_values = yield from self.run_multi_steps(ecu, batch, errors, shared, attempts)
+                        if multi_values is not None:
+                            values.update(multi_values)
+                            continue
+
+                    for name in batch:
+                        attempts = self.attempts_left(ecu, shared[name], deadline)
+                        if attempts == 0:
+                            self.deferred += shared[name]
+                            continue
+                        logger.info("**** Querying {} information ****".format(", ".join(n.lower() for n in shared[name])))
+                        try:
+                            response = yield self.query_ecu, ecu, ext_commands[name], attempts
+                        except errors as err:
+                            logger.warning("**** Error querying {}: {} ****"
+                                           .format(", ".join(n.lower() for n in shared[name]), err), exc_info=False)
+                            continue
+                        values.update(self.shared_values(shared[name], response))
+
+        if self.deferred:
+            logger.warning("**** Cycle deadline reached, {} signal(s) deferred to the next cycle ****"
+                           .format(len(self.deferred)))
+        self.record_support([name for name in names if name not in self.deferred], values)
+        if self.metrics is not None:
+            self.metrics.observe_cycle(time.monotonic() - started, len(names), len(values))
+        return values
+
+
+class AsyncQueryPlanner(QueryPlanner):
+    """QueryPlanner for asyncio transports, query is a coroutine function."""
+
+    async def drive(self, steps):
+        """drive() awaiting the calls, select_ecu(), query_ecu() and run() return coroutines."""
+        result = error = None
+        while True:
+            try:
+                call = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as done:
+                return done.value
+            result = error = None
+            try:
+                result = await call[0](*call[1:])
+            except Exception as err:
+                error = err
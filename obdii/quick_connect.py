@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import time
+
+import obd
+from obd import OBDStatus
+from obd.elm327 import ELM327
+
+logger = logging.getLogger('obdii.quick_connect')
+
+# ELM327 protocol numbers python-obd has a parser for, e.g. "6" = ISO 15765-4 CAN 11 bit 500 kbaud
+PROTOCOLS = ELM327._SUPPORTED_PROTOCOLS
+
+
+class ConnectionCache:
+    """
+        Remembers the baud rate and protocol each adapter port last connected with.
+
+        Entries are kept per port in a small JSON file, written only when
+        they change.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.ports = {}
+        try:
+            with open(path) as cache_file:
+                self.ports = json.loads(cache_file.read())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as err:
+            logger.warning("Ignoring unreadable connection cache {}: {}".format(path, err))
+
+    def protocol(self, port, baudrate):
+        """Return the protocol the adapter on port last connected with at this baud rate, None if unknown."""
+        entry = self.ports.get(port)
+        if entry is None or entry.get('baudrate') != baudrate or entry.get('protocol') not in PROTOCOLS:
+            return None
+        return entry['protocol']
+
+    def save(self, port, baudrate, protocol):
+        if self.protocol(port, baudrate) == protocol:
+            return
+        self.ports[port] = {'baudrate': baudrate, 'protocol': protocol, 'updated': self.clock()}
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as cache_file:
+                cache_file.write(json.dumps(self.ports, indent=2, sort_keys=True))
+            os.replace(tmp_path, self.path)
+        except OSError as err:
+            logger.warning("Could not write connection cache {}: {}".format(self.path, err))
+
+
+class QuickELM327(ELM327):
+    """
+        ELM327 interface with a minimal init for a known baud rate and protocol.
+
+        Warm starts the adapter (ATWS) instead of the full ATZ reset and its
+        blind one second wait, and skips the AT RV voltage check. With the
+        protocol given, python-obd only sends ATTP and a single 0100 to
+        check the car answers, no protocol search.
+    """
+
+    def _ELM327__send(self, cmd, delay=None):
+        # python-obd's ELM327 methods call self.__send, so this replaces it for them too
+        if cmd == b"ATZ":
+            cmd, delay = b"ATWS", None
+        return ELM327._ELM327__send(self, cmd, delay)
+
+
+class QuickOBD(obd.OBD):
+    """
+        obd.OBD over a QuickELM327, without the PID support probing.
+
+        Every command here is sent with force=True, so the 0100/0120/...
+        support queries python-obd runs on connect are never used.
+    """
+
+    def __init__(self, portstr, baudrate, protocol):
+        super().__init__(portstr=portstr, baudrate=baudrate, protocol=protocol, fast=False, check_voltage=False)
+
+    def _OBD__connect(self, portstr, baudrate, protocol, check_voltage, start_low_power):
+        self.interface = QuickELM327(portstr, baudrate, protocol, self.timeout, check_voltage, start_low_power)
+        if self.interface.status() == OBDStatus.NOT_CONNECTED:
+            self.close()
+
+    def _OBD__load_commands(self):
+        logger.debug("Skipping PID support probing")
@@ -0,0 +1,99 @@
+import time
+
+from commands import ext_command_priorities, priority_intervals, shared_requests
+
+PRIORITY_CLASSES = ('high', 'normal', 'low')
+
+
+class PollScheduler:
+    """
+        Decides which signals are due for a refresh.
+
+        Every signal gets a refresh interval from its priority class (or a
+        per-signal override). Each poll serves a single priority class, the
+        highest one with anything due, most overdue signals first, so slow
+        low priority sweeps never hold back the fast changing values for
+        more than one batch.
+
+        Signals decoded from the same request are always polled together,
+        the answer costs nothing extra once it is on the bus.
+    """
+
+    def __init__(self, names, intervals=None, signal_intervals=None, batch_size=12, clock=time.monotonic):
+        class_intervals = dict(priority_intervals)
+        class_intervals.update(intervals or {})
+        signal_intervals = signal_intervals or {}
+
+        self.clock = clock
+        self.batch_size = batch_size
+        self.priority = {}
+        self.interval = {}
+        self.next_due = {}
+        self.siblings = {}
+        for requested in shared_requests(names).values():
+            for name in requested:
+                self.siblings[name] = requested
+        for name in names:
+            priority = ext_command_priorities.get(name, 'normal')
+            self.priority[name] = PRIORITY_CLASSES.index(priority)
+            self.interval[name] = float(signal_intervals.get(name, class_intervals[priority]))
+            self.next_due[name] = 0  # everything is due on the first poll
+
+    def due(self, now=None):
+        """Return all the signals due now, highest priority and most overdue first."""
+        now = self.clock() if now is None else now
+        due = [name for name, next_due in self.next_due.items() if next_due <= now]
+        due.sort(key=lambda name: (self.priority[name], self.next_due[name]))
+        return due
+
+    def next_batch(self, now=None):
+        """Return up to batch_size due signals of the highest priority class that has any, with their siblings."""
+        due = self.due(now)
+        if not due:
+            return []
+        priority = self.priority[due[0]]
+        batch = []
+        for name in due:
+            if len(batch) >= self.batch_size:
+                break
+            if self.priority[name] == priority and name not in batch:
+                batch.extend(sibling for sibling in self.siblings[name] if sibling not in batch)
+        return batch
+
+    def done(self, names, now=None):
+        """Schedule the next refresh of the given signals."""
+        now = self.clock() if now is None else now
+        for name in names:
+            self.next_due[name] = now + self.interval[name]
+
+    def wait_time(self, now=None):
+        """Seconds until the next signal is due."""
+        now = self.clock() if now is None else now
+        if not self.next_due:
+            return None
+        return max(0, min(self.next_due.values()) - now)
+
+    def poll(self, planner, errors=(ValueError,), budget=None):
+        """
+            Query the next batch of due signals. Returns a dict of name -> value.
+
+            With a budget in seconds, the signals the planner defers to
+            stay within it remain due.
+        """
+        names = self.next_batch()
+        if not names:
+            return {}
+        deadline = time.monotonic() + budget if budget else None
+        values = planner.run(names, errors=errors, deadline=deadline)
+        self.done([name for name in names if name not in planner.deferred])
+        return values
+
+    async def poll_async(self, planner, errors=(ValueError,), budget=None):
+        """poll() for an AsyncQueryPlanner."""
+        names = self.next_batch()
+        if not names:
+            return {}
+        deadline = time.monotonic() + budget if budget else None
+        values = await planner.run(names, errors=errors, deadline=deadline)
+        self.done([name for name in names if name not in planner.deferred])
+        return values
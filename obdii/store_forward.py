@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+logger = logging.getLogger('obdii.store_forward')
+
+
+class DiskQueue:
+    """
+        Bounded append-only queue of records on disk.
+
+        Records go into numbered segment files in path, each one prefixed
+        with its length and CRC32. A crash can at worst leave a torn record
+        at the end of the last segment, which is cut off when the queue is
+        opened again. The read position is kept in a separate cursor file
+        and only moves when commit() is called, so records read but not
+        delivered are read again after a restart.
+
+        When the segments grow beyond max_bytes, the oldest segment is
+        dropped, unread or not.
+    """
+
+    HEADER = struct.Struct('<II')  # record length, crc32
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, segment_bytes=1024 * 1024, sync=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.sync = sync
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        self.segments = sorted(int(name[:-4]) for name in os.listdir(path) if name.endswith('.seg'))
+        if not self.segments:
+            self.segments = [1]
+        self.__truncate_torn_tail(self.segments[-1])
+        self.writer = open(self.__segment_path(self.segments[-1]), 'ab')
+
+        self.cursor = (self.segments[0], 0)
+        try:
+            with open(os.path.join(path, 'cursor')) as cursor_file:
+                segment, offset = json.loads(cursor_file.read())
+            if segment in self.segments:
+                self.cursor = (segment, offset)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as err:
+            logger.warning("Ignoring unreadable queue cursor in {}: {}".format(path, err))
+
+    def append(self, records):
+        """Append a list of bytes records."""
+        with self.lock:
+            for record in records:
+                if self.writer.tell() >= self.segment_bytes:
+                    self.__roll()
+                self.writer.write(self.HEADER.pack(len(record), zlib.crc32(record)) + record)
+            self.writer.flush()
+            if self.sync:
+                os.fsync(self.writer.fileno())
+            self.__evict()
+
+    def read(self, max_records):
+        """Return up to max_records unread records and the cursor to commit() once they are delivered."""
+        with self.lock:
+            records = []
+            segment, offset = self.cursor
+            while len(records) < max_records:
+                chunk, offset = self.__read_segment(segment, offset, max_records - len(records))
+                records += chunk
+                if len(records) < max_records and segment != self.segments[-1]:
+                    segment, offset = self.segments[self.segments.index(segment) + 1], 0
+                else:
+                    break
+            return records, (segment, offset)
+
+    def commit(self, cursor):
+        """Mark everything before cursor as delivered and delete the segments that are done."""
+        with self.lock:
+            if cursor[0] not in self.segments:
+                return  # evicted in the meantime
+            self.cursor = cursor
+            while self.segments[0] != cursor[0]:
+                os.remove(self.__segment_path(self.segments.pop(0)))
+            self.__write_cursor()
+
+    def empty(self):
+        with self.lock:
+            return self.cursor == (self.segments[-1], self.writer.tell())
+
+    def size(self):
+        """Total size of the segments in bytes."""
+        return sum(os.path.getsize(self.__segment_path(segment)) for segment in self.segments)
+
+    def close(self):
+        with self.lock:
+            self.writer.close()
+
+    def __segment_path(self, segment):
+        return os.path.join(self.path, "{:08d}.seg".format(segment))
+
+    def __roll(self):
+        self.writer.close()
+        self.segments.append(self.segments[-1] + 1)
+        self.writer = open(self.__segment_path(self.segments[-1]), 'ab')
+
+    def __evict(self):
+        while len(self.segments) > 1 and self.size() > self.max_bytes:
+            oldest = self.segments.pop(0)
+            logger.warning("Queue full, dropping {} bytes of the oldest readings".format(
+                os.path.getsize(self.__segment_path(oldest))))
+            os.remove(self.__segment_path(oldest))
+            if self.cursor[0] == oldest:
+                self.cursor = (self.segments[0], 0)
+                self.__write_cursor()
+
+    def __write_cursor(self):
+        tmp_path = os.path.join(self.path, 'cursor.tmp')
+        with open(tmp_path, 'w') as cursor_file:
+            cursor_file.write(json.dumps(list(self.cursor)))
+        os.replace(tmp_path, os.path.join(self.path, 'cursor'))
+
+    def __read_segment(self, segment, offset, max_records):
+        records = []
+        try:
+            with open(self.__segment_path(segment), 'rb') as segment_file:
+                segment_file.seek(offset)
+                while len(records) < max_records:
+                    header = segment_file.read(self.HEADER.size)
+                    if len(header) < self.HEADER.size:
+                        break
+                    length, crc = self.HEADER.unpack(header)
+                    record = segment_file.read(length)
+                    if len(record) < length or zlib.crc32(record) != crc:
+                        logger.error("Corrupt record in queue segment {}, skipping the rest of it".format(segment))
+                        return records, os.path.getsize(self.__segment_path(segment))
+                    records.append(record)
+                    offset += self.HEADER.size + length
+        except FileNotFoundError:
+            pass
+        return records, offset
+
+    def __truncate_torn_tail(self, segment):
+        """Cut off an incomplete record left by a crash at the end of a segment."""
+        path = self.__segment_path(segment)
+        if not os.path.exists(path):
+            return
+        valid = 0
+        with open(path, 'rb') as segment_file:
+            while True:
+                header = segment_file.read(self.HEADER.size)
+                if len(header) < self.HEADER.size:
+                    break
+                length, crc = self.HEADER.unpack(header)
+                record = segment_file.read(length)
+                if len(record) < length or zlib.crc32(record) != crc:
+                    break
+                valid += self.HEADER.size + length
+        if valid < os.path.getsize(path):
+            logger.warning("Truncating torn record at the end of queue segment {}".format(segment))
+            with open(path, 'r+b') as segment_file:
+                segment_file.truncate(valid)
+
+
+class StoreAndForward:
+    """
+        Keeps readings that could not be published and forwards them later.
+
+        put() stores messages in a DiskQueue. A background thread waits for
+        the MQTT connection, then sends the backlog oldest first as
+        zlib-compressed JSON arrays of {"time", "topic", "payload"} objects
+        on a single topic, at most max_rate batches per second, and only
+        drops them from the queue once the broker acknowledged them.
+    """
+
+    def __init__(self, queue, client, topic, batch_size=100, max_rate=2.0, timeout=30, clock=time.time):
+        self.queue = queue
+        self.client = client  # MQTTPublisher
+        self.topic = topic
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.timeout = timeout
+        self.clock = clock
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def put(self, msgs):
+        """Store messages for later delivery."""
+        now = self.clock()
+        self.queue.append([json.dumps({'time': now, 'topic': msg['topic'], 'payload': msg['payload']}).encode()
+                           for msg in msgs])
+        logger.info("{} message(s) queued for later delivery".format(len(msgs)))
+
+    def forward_batch(self):
+        """Send one batch of the backlog. Returns the number of messages delivered, None if delivery failed."""
+        records, cursor = self.queue.read(self.batch_size)
+        if not records:
+            self.queue.commit(cursor)  # skip past fully read segments
+            return 0
+        payload = zlib.compress(b"[" + b",".join(records) + b"]")
+        infos = self.client.publish([{'topic': self.topic, 'payload': payload, 'qos': 1, 'retain': False}])
+        if not infos or not self.client.wait_published(infos, self.timeout):
+            return None
+        self.queue.commit(cursor)
+        logger.info("Forwarded {} queued message(s) in {} bytes".format(len(records), len(payload)))
+        return len(records)
+
+    def forward(self, timeout):
+        """Forward the backlog until it is empty or timeout seconds have passed, e.g. before a one-shot run exits."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and self.client.connected.is_set():
+            if not self.forward_batch():
+                return
+            time.sleep(1 / self.max_rate)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.__run, name='store-forward', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.queue.close()
+
+    def __run(self):
+        while not self.stopped.is_set():
+            if not self.client.connected.is_set() or self.queue.empty():
+                self.stopped.wait(1)
+                continue
+            try:
+                sent = self.forward_batch()
+            except Exception as err:
+                logger.error("Error forwarding queued messages: {}".format(err), exc_info=True)
+                sent = None
+            self.stopped.wait(1 / self.max_rate if sent else 5)
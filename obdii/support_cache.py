@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger('obdii.support_cache')
+
+
+class SupportCache:
+    """
+        Remembers which signals a vehicle does not answer.
+
+        Entries are kept per key (VIN and adapter port) in a small JSON
+        file. A signal that failed in max_failures consecutive queries is
+        skipped until revalidate_after seconds have passed, then it is
+        tried once more. A single valid answer clears its entry.
+
+        Only changes are written, so a stable car causes no disk writes.
+    """
+
+    def __init__(self, path, key, max_failures=2, revalidate_after=7 * 24 * 3600, clock=time.time):
+        self.path = path
+        self.key = key
+        self.max_failures = max_failures
+        self.revalidate_after = revalidate_after
+        self.clock = clock
+        self.dirty = False
+        self.vehicles = {}
+        try:
+            with open(path) as cache_file:
+                self.vehicles = json.loads(cache_file.read())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as err:
+            logger.warning("Ignoring unreadable support cache {}: {}".format(path, err))
+        self.entries = self.vehicles.setdefault(key, {})
+
+    def unsupported(self, name):
+        """Tell whether the signal is known to be unsupported and not due for revalidation."""
+        entry = self.entries.get(name)
+        return (entry is not None
+                and entry['failures'] >= self.max_failures
+                and self.clock() - entry['checked'] < self.revalidate_after)
+
+    def filter(self, names):
+        """Drop known unsupported signals from names."""
+        skipped = [name for name in names if self.unsupported(name)]
+        if skipped:
+            logger.debug("Skipping unsupported signals: {}".format(", ".join(skipped)))
+            return [name for name in names if name not in skipped]
+        return names
+
+    def record(self, name, supported):
+        entry = self.entries.get(name)
+        if supported:
+            if entry is not None:
+                logger.info("{} answers again".format(name))
+                del self.entries[name]
+                self.dirty = True
+            return
+
+        if entry is None:
+            entry = self.entries[name] = {'failures': 0, 'checked': 0}
+        entry['failures'] += 1
+        entry['checked'] = self.clock()
+        if entry['failures'] == self.max_failures:
+            logger.info("{} marked as unsupported on {}".format(name, self.key))
+        self.dirty = True
+
+    def save(self):
+        """Write the cache to disk if anything changed."""
+        if not self.dirty:
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as cache_file:
+                cache_file.write(json.dumps(self.vehicles, indent=2, sort_keys=True))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as err:
+            logger.warning("Could not save support cache {}: {}".format(self.path, err))
@@ -0,0 +1,94 @@
+from obd import OBDCommand
+from obd.protocols import ECU
+from obd.protocols.protocol import Message
+
+from commands import ext_commands, ext_command_data_bytes
+
+READ_DATA_BY_IDENTIFIER = 0x22
+POSITIVE_RESPONSE_OFFSET = 0x40
+
+# ELM327 only sends single frame requests, which hold the service byte
+# and up to three 2 byte DIDs
+MAX_DIDS_PER_REQUEST = 3
+
+
+def command_did(command):
+    """Return the DID of a service 0x22 command as an int."""
+    return int(command.command[2:], 16)
+
+
+def can_pack(name):
+    """Tell whether a signal can be packed into a multi-DID request."""
+    command = ext_commands[name]
+    return (name in ext_command_data_bytes
+            and len(command.command) == 6
+            and command.mode == READ_DATA_BY_IDENTIFIER)
+
+
+def split_multi_did_response(data, sizes):
+    """
+        Split a multi-DID ReadDataByIdentifier positive response.
+
+        sizes maps every requested DID to its payload length. Returns a
+        dict of DID -> payload bytes. DIDs that the ECU left out of its
+        answer (usually unsupported ones) are missing from the result.
+        Splitting stops at a DID that wasn't asked for or shows up twice,
+        and at a truncated payload: past those the payload boundaries
+        can't be trusted.
+    """
+    if len(data) == 0 or data[0] != READ_DATA_BY_IDENTIFIER + POSITIVE_RESPONSE_OFFSET:
+        return None
+
+    payloads = {}
+    pos = 1
+    while pos + 2 <= len(data):
+        did = (data[pos] << 8) + data[pos + 1]
+        if did not in sizes or did in payloads:
+            break
+        pos += 2
+        payload = data[pos:pos + sizes[did]]
+        if len(payload) != sizes[did]:
+            break
+        payloads[did] = payload
+        pos += sizes[did]
+    return payloads
+
+
+def multi_did_command(names):
+    """Build a single service 0x22 command reading the DIDs of all the given signals."""
+    sizes = {}
+    command = b"22"
+    for name in names:
+        did = command_did(ext_commands[name])
+        sizes[did] = ext_command_data_bytes[name]
+        command += ext_commands[name].command[2:]
+
+    def decoder(messages):
+        d = messages[0].data
+        if len(d) == 0:
+            return None
+        return split_multi_did_response(d, sizes) or None
+
+    return OBDCommand("MULTI_DID", "Read " + ", ".join(names), command, 0, decoder, ECU.ALL, False)
+
+
+def decode_multi_did_response(response, names):
+    """
+        Run the regular ext_commands decoders on a multi-DID response.
+
+        Each payload is wrapped in a message that looks like the single-DID
+        answer (62 + DID + payload), so the existing decoders keep working.
+        Returns a dict of name -> OBDResponse for the DIDs that answered,
+        empty if the response wasn't a positive answer (e.g. 7F).
+    """
+    payloads = response.value or {}
+    responses = {}
+    for name in names:
+        did = command_did(ext_commands[name])
+        if did not in payloads:
+            continue
+        message = Message(response.messages[0].frames)
+        message.ecu = response.messages[0].ecu
+        message.data = bytearray([READ_DATA_BY_IDENTIFIER + POSITIVE_RESPONSE_OFFSET, did >> 8, did & 0xFF]) + payloads[did]
+        responses[name] = ext_commands[name]([message])
+    return responses
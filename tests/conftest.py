@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The obdii modules import each other by bare name, like when run as scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'obdii'))
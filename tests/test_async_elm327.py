@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+import pytest
+
+from async_elm327 import AsyncELM327
+from elm327_emulator import ELM327Emulator
+
+
+class StuckEmulator(ELM327Emulator):
+    """An adapter that stops answering (or answers ?) once the reset is done."""
+
+    def __init__(self, command, answer=None, **kwargs):
+        super().__init__(**kwargs)
+        self.command = command
+        self.answer = answer
+
+    def handle(self, line):
+        if line.replace(' ', '').upper() == self.command:
+            if self.answer is None:
+                time.sleep(1)
+                return ''
+            return line + '\r' + self.answer + '\r\r'
+        return super().handle(line)
+
+
+def open_fails(emulator):
+    """Open the emulator, returns the error and the port the connection kept (None once closed)."""
+    async def attempt():
+        connection = AsyncELM327(emulator.start(), 38400, timeout=0.3)
+        with pytest.raises((ConnectionError, asyncio.TimeoutError)) as err:
+            await connection.open()
+        return err.value, connection._AsyncELM327__port
+    return asyncio.run(attempt())
+
+
+def test_port_is_closed_when_an_init_command_times_out():
+    error, port = open_fails(StuckEmulator('ATE0', seed=1))
+    assert isinstance(error, asyncio.TimeoutError)
+    assert port is None
+
+
+def test_port_is_closed_when_an_init_command_is_refused():
+    error, port = open_fails(StuckEmulator('ATL0', '?', seed=1))
+    assert str(error) == "ATL0 did not return 'OK'"
+    assert port is None
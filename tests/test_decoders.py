@@ -0,0 +1,92 @@
+import pytest
+from obd.protocols.protocol import Message
+
+from commands import ext_commands, signal_catalog
+
+CELL_VOLTAGES = ['BAT_CELL_VOLT_{:02d}'.format(cell) for cell in range(1, 97)]
+
+# name -> (answer after the DID echo, expected value). The field bytes
+# differ from each other, so a decoder reading the wrong byte fails.
+EXPECTED = {
+    'BAT_PACK_CAP_AH_RAW_2018':   ("0578", 140.0),
+    'BAT_PACK_CAP_AH_RAW_2019':   ("36B0", 140.0),
+    'BAT_PACK_CAP_KWH_EST_2018':  ("0578", 44.8),
+    'BAT_PACK_CAP_KWH_EST_2019':  ("36B0", 44.8),
+    'BAT_PACK_SOC_DISP':          ("A0", 62.745098),
+    'BAT_PACK_SOC_RAW_HD':        ("8000", 50.000763),
+    'BAT_PACK_SOC_RAW_LD2':       ("80", 50.196078),
+    'BAT_PACK_SOC_RAW_LD3':       ("80", 50.196078),
+    'BAT_PACK_SOC_VAR':           ("80", 50.196078),
+    'BAT_PACK_CURRENT_HD':        ("FF06", -12.5),
+    'BAT_PACK_NUM_CHARGES':       ("0102", 258),
+    'BAT_MOD_TEMP_1':             ("41", 25),
+    'BAT_MOD_TEMP_2':             ("41", 25),
+    'BAT_MOD_TEMP_3':             ("41", 25),
+    'BAT_MOD_TEMP_4':             ("41", 25),
+    'BAT_MOD_TEMP_5':             ("41", 25),
+    'BAT_MOD_TEMP_6':             ("41", 25),
+    'BAT_MOD_TEMP_MAX':           ("41", 25),
+    'BAT_MOD_TEMP_MIN':           ("14", -20),
+    'BAT_MOD_TEMP_AVG':           ("41", 25),
+    'BAT_CELL_VOLT_MIN':          ("1900", 3.840002),
+    'BAT_CELL_VOLT_MIN_NUM':      ("2A", 42),
+    'BAT_CELL_VOLT_MAX':          ("1900", 3.840002),
+    'BAT_CELL_VOLT_MAX_NUM':      ("2A", 42),
+    'BAT_CELL_VOLT_AVG':          ("C49C", 3.840085),
+    'BAT_PACK_RESISTANCE':        ("00C8", 100.0),
+    'BAT_PACK_VOLT_MIN':          ("02D0", 374.4),
+    'BAT_PACK_VOLT_MAX':          ("02D0", 374.4),
+    'HV_CURRENT_HD':              ("FF06", -12.5),
+    'HV_CURRENT':                 ("FF9C", 14.981273),
+    'AMBIENT_AIR_TEMP':           ("3C", 20),
+}
+EXPECTED.update((name, ("C49C", 3.840085)) for name in CELL_VOLTAGES)
+
+
+def decode(name, data):
+    """Run the signal decoder on a single message holding data."""
+    message = Message([])
+    message.data = bytearray(data)
+    return ext_commands[name].decode([message])
+
+
+def answer(name, field):
+    """Positive answer to the signal's 22 DID request: 62, the DID, then field."""
+    did = signal_catalog[name].command[2:].decode()
+    return bytes.fromhex("62" + did + field)
+
+
+def test_every_catalog_row_is_covered():
+    assert set(EXPECTED) | {'BAT_PACK_SOC_RAW_LD'} == set(signal_catalog)
+
+
+@pytest.mark.parametrize('name', sorted(EXPECTED))
+def test_decoded_value(name):
+    field, expected = EXPECTED[name]
+    assert decode(name, answer(name, field)) == pytest.approx(expected, abs=1e-6)
+
+
+def test_short_answer_decodes_to_none():
+    assert decode('BAT_PACK_CURRENT_HD', bytes.fromhex("6240D4FF")) is None
+
+
+def test_cell_voltage_reads_both_bytes():
+    # Used to read byte A twice: C4 C4 would give 3.843
+    assert decode('BAT_CELL_VOLT_01', bytes.fromhex("624181C49C")) == pytest.approx(3.840085, abs=1e-6)
+
+
+def test_num_charges_shifts_the_high_byte():
+    # Used to compare A < 8 instead of shifting A << 8
+    assert decode('BAT_PACK_NUM_CHARGES', bytes.fromhex("6243A50102")) == 258
+
+
+@pytest.mark.parametrize('name', ['BAT_PACK_CURRENT_HD', 'HV_CURRENT_HD'])
+def test_signed_current_is_two_bytes(name):
+    # Used to pass a single byte to the signed conversion
+    assert decode(name, answer(name, "FF06")) == pytest.approx(-12.5)
+    assert decode(name, answer(name, "00FA")) == pytest.approx(12.5)
+
+
+def test_soc_raw_ld_reads_the_mode_01_value_byte():
+    # 41 5B A: the value is byte 2, not 3
+    assert decode('BAT_PACK_SOC_RAW_LD', bytes.fromhex("415BA0FF")) == pytest.approx(62.745098, abs=1e-6)
@@ -0,0 +1,85 @@
+import pytest
+from obd.protocols.protocol import Frame, Message
+
+from commands import ext_commands
+from elm_errors import (ADAPTER_RESTARTED, BUFFER_FULL, BUS_BUSY, CAN_ERROR, ECU_BUSY, ELM_MESSAGES, INVALID,
+                        NEGATIVE_RESPONSE, NO_DATA, NO_RESPONSE, STOPPED, UNKNOWN_COMMAND, WARM_START,
+                        classify_line, response_error)
+
+SOC = ext_commands['BAT_PACK_SOC_DISP']  # 22 8334, one byte
+VALID = "628334A0"
+
+
+def message(data=None, line=None):
+    """A python-obd message: data for a parsed ECU answer, line for an adapter message (no data, one frame)."""
+    result = Message([Frame(line)] if line is not None else [])
+    if data is not None:
+        result.data = bytearray(bytes.fromhex(data))
+    return result
+
+
+@pytest.mark.parametrize("line, error", ELM_MESSAGES)
+def test_every_adapter_message_is_classified(line, error):
+    assert classify_line(line) == error
+
+
+@pytest.mark.parametrize("line, error", [
+    ("can error", CAN_ERROR),
+    ("  NO DATA  ", NO_DATA),
+    ("ERR94", CAN_ERROR),
+    ("BUS ERROR 7E8", CAN_ERROR),
+    ("LV RESET", ADAPTER_RESTARTED),
+    ("OK", None),
+    ("ELM327 v1.5", None),
+    ("7EC 04 62 83 34 A0", None),
+    ("", None),
+])
+def test_classify_line(line, error):
+    assert classify_line(line) == error
+
+
+@pytest.mark.parametrize("messages, error", [
+    # Nothing back from the adapter
+    ([], NO_RESPONSE),
+    # Adapter messages
+    ([message(line="NO DATA")], NO_DATA),
+    ([message(line="?")], UNKNOWN_COMMAND),
+    ([message(line="CAN ERROR")], CAN_ERROR),
+    ([message(line="BUS BUSY")], BUS_BUSY),
+    ([message(line="BUFFER FULL")], BUFFER_FULL),
+    ([message(line="STOPPED")], STOPPED),
+    ([message(line="ACT ALERT")], ADAPTER_RESTARTED),
+    # ECU negative responses: busyRepeatRequest and responsePending are worth retrying, the rest aren't
+    ([message("7F2221")], ECU_BUSY),
+    ([message("7F2278")], ECU_BUSY),
+    ([message("7F2231")], NEGATIVE_RESPONSE),
+    ([message("7F2212")], NEGATIVE_RESPONSE),
+    ([message("7F22")], INVALID),  # too short to hold an NRC
+    # Answers
+    ([message(VALID)], None),
+    ([message("6283")], INVALID),  # too short for the decoder
+    # One ECU answering is enough, as long as the decoder got a value out of it
+    ([message(VALID), message("7F2278")], None),
+    ([message(VALID), message(line="CAN ERROR")], None),
+    ([message("7F2278"), message(VALID)], ECU_BUSY),
+    ([message("7F2231"), message("7F2278")], NEGATIVE_RESPONSE),  # the first error wins
+])
+def test_response_error(messages, error):
+    assert response_error(SOC(messages)) == error
+
+
+def test_missing_response():
+    assert response_error(None) == NO_RESPONSE
+
+
+@pytest.mark.parametrize("lines, error", [
+    (["OK"], None),
+    (["ELM327 v1.5"], None),
+    (["?"], UNKNOWN_COMMAND),
+    ([""], INVALID),
+    # An AT answer is valid text, but not if the adapter reported a problem on any line
+    (["BUS BUSY"], BUS_BUSY),
+    (["OK", "CAN ERROR"], CAN_ERROR),
+])
+def test_at_command_response_error(lines, error):
+    assert response_error(WARM_START([message(line=line) for line in lines])) == error
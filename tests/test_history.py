@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from history import History, RingBuffer
+
+
+def test_window_across_the_wrap():
+    buffer = RingBuffer(4)
+    for second in range(6):
+        buffer.append(second, second * 10)
+    times, values = buffer.window(3)
+    assert list(times) == [3, 4, 5]
+    assert list(values) == [30, 40, 50]
+    assert buffer.latest() == (5, 50)
+
+
+def test_window_end_is_excluded():
+    buffer = RingBuffer(8)
+    for second in range(5):
+        buffer.append(second, second)
+    assert list(buffer.window(1, 3)[0]) == [1, 2]
+    assert list(buffer.window(10)[0]) == []
+
+
+def test_history_uses_a_monotonic_clock():
+    # The wall clock jumps when NTP or the GPS sets it, which would break window()
+    assert History().clock is time.monotonic
+
+
+def test_record_skips_values_that_are_not_numbers():
+    clock = iter([1.0, 2.0, 2.5]).__next__
+    history = History(capacity=8, clock=clock)
+    history.record({'BAT_PACK_SOC_DISP': 62.5, 'VIN': "1G1FW6S0", 'gps_mode': 3, 'stale': True, 'none': None})
+    history.record({'BAT_PACK_SOC_DISP': 62.0})
+    assert set(history.buffers) == {'BAT_PACK_SOC_DISP', 'gps_mode'}
+    times, values = history.window('BAT_PACK_SOC_DISP', 1)
+    assert list(times) == [2.0]
+    assert list(values) == pytest.approx([62.0])
+    assert list(history.window('VIN', 1)[0]) == []
+
+
+def test_window_signals():
+    history = History(capacity=8, clock=lambda: 100.0)
+    for second, current in ((10, 5.0), (95, -12.5), (97, 20.0), (99, 1.5)):
+        history.record({'BAT_PACK_CURRENT_HD': current}, now=second)
+    assert history.window_signals(['BAT_PACK_CURRENT_HD', 'HV_CURRENT_HD'], 10) == {
+        'BAT_PACK_CURRENT_HD_WINDOW_MIN': -12.5,
+        'BAT_PACK_CURRENT_HD_WINDOW_AVG': 3.0,
+        'BAT_PACK_CURRENT_HD_WINDOW_MAX': 20.0,
+    }
+    assert history.window_signals(['BAT_PACK_CURRENT_HD'], 0.5) == {}
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from async_elm327 import AsyncELM327
+from elm327_emulator import ELM327Emulator
+from monitor import BroadcastDecoder, MonitorUnsupported, monitor_window
+
+FRAMES = [{"id": "3E9", "name": "BAT_PACK_CURRENT_HD", "byte": 0, "length": 2, "signed": True, "scale": 0.05}]
+
+
+class CloneEmulator(ELM327Emulator):
+    """An adapter without the CAN filter commands."""
+
+    def handle(self, line):
+        if line.replace(' ', '').upper().startswith('ATCF'):
+            return line + '\r?\r\r'
+        return super().handle(line)
+
+
+def run_window(emulator, duration=0.3, after=None):
+    """Open the emulator, run one monitor window and after(connection), returns the window's values."""
+    async def window():
+        connection = AsyncELM327(emulator.start(), 38400, timeout=2)
+        await connection.open()
+        try:
+            window = monitor_window(connection, BroadcastDecoder(FRAMES), duration)
+            values = await asyncio.wait_for(window, duration + 2)
+            if after is not None:
+                await after(connection)
+            return values
+        finally:
+            connection.close()
+    return asyncio.run(window())
+
+
+def test_window_decodes_broadcast_frames():
+    emulator = ELM327Emulator(seed=1)
+    # Decoded at byte 0: with auto formatting left on, FF 06 is no PCI byte and the frame is dropped
+    assert run_window(emulator) == {'BAT_PACK_CURRENT_HD': pytest.approx(-12.5)}
+    assert emulator.auto_format
+    assert emulator.can_mask == 0
+
+
+def test_queries_work_right_after_an_early_end():
+    emulator = ELM327Emulator(seed=1, monitor_limit=3)
+    answers = []
+
+    async def query(connection):
+        answers.append(await asyncio.wait_for(connection.send(b"ATI"), 1))
+
+    assert run_window(emulator, duration=5, after=query) == {'BAT_PACK_CURRENT_HD': pytest.approx(-12.5)}
+    assert answers == [['ELM327 v1.5']]
+    assert emulator.auto_format
+
+
+def test_refused_filter_is_reported_and_undone():
+    emulator = CloneEmulator(seed=1)
+    with pytest.raises(MonitorUnsupported):
+        run_window(emulator)
+    assert emulator.auto_format
@@ -0,0 +1,108 @@
+import os
+
+from store_forward import DiskQueue
+
+
+def record(n, size=100):
+    return "{:06d}".format(n).encode().ljust(size, b".")
+
+
+def segment_paths(path):
+    return [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.seg')]
+
+
+def test_records_come_back_in_order(tmp_path):
+    queue = DiskQueue(str(tmp_path))
+    queue.append([record(n) for n in range(5)])
+    records, cursor = queue.read(10)
+    assert records == [record(n) for n in range(5)]
+    queue.commit(cursor)
+    assert queue.empty()
+    queue.close()
+
+
+def test_torn_tail_is_truncated_on_open(tmp_path):
+    queue = DiskQueue(str(tmp_path))
+    queue.append([record(n) for n in range(3)])
+    queue.close()
+    path, = segment_paths(str(tmp_path))
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as segment_file:
+        segment_file.truncate(size - 40)  # the crash hit in the middle of the last record
+
+    queue = DiskQueue(str(tmp_path))
+    assert os.path.getsize(path) == size * 2 // 3
+    queue.append([record(3)])
+    records, _ = queue.read(10)
+    assert records == [record(0), record(1), record(3)]
+    queue.close()
+
+
+def test_corrupt_record_skips_the_rest_of_its_segment(tmp_path):
+    queue = DiskQueue(str(tmp_path), segment_bytes=300)
+    queue.append([record(n) for n in range(6)])  # 108 byte records, 3 per segment
+    paths = segment_paths(str(tmp_path))
+    assert len(paths) == 2
+    with open(paths[0], 'r+b') as segment_file:
+        segment_file.seek(108 + DiskQueue.HEADER.size + 50)  # payload of the second record
+        segment_file.write(b"X")
+
+    records, cursor = queue.read(10)
+    assert records == [record(0), record(3), record(4), record(5)]
+    queue.commit(cursor)
+    assert queue.empty()
+    queue.close()
+
+
+def test_corrupt_record_in_last_segment_is_truncated_on_open(tmp_path):
+    queue = DiskQueue(str(tmp_path))
+    queue.append([record(n) for n in range(3)])
+    queue.close()
+    path, = segment_paths(str(tmp_path))
+    with open(path, 'r+b') as segment_file:
+        segment_file.seek(108 + DiskQueue.HEADER.size + 50)
+        segment_file.write(b"X")
+
+    queue = DiskQueue(str(tmp_path))
+    records, _ = queue.read(10)
+    assert records == [record(0)]
+    queue.close()
+
+
+def test_restart_resumes_from_the_committed_cursor(tmp_path):
+    queue = DiskQueue(str(tmp_path), segment_bytes=300)
+    queue.append([record(n) for n in range(8)])
+    records, cursor = queue.read(4)
+    assert records == [record(n) for n in range(4)]
+    queue.commit(cursor)
+    records, _ = queue.read(2)  # read but never delivered
+    assert records == [record(4), record(5)]
+    queue.close()
+
+    queue = DiskQueue(str(tmp_path), segment_bytes=300)
+    records, _ = queue.read(10)
+    assert records == [record(n) for n in range(4, 8)]
+    assert len(segment_paths(str(tmp_path))) == 2  # the delivered first segment is gone
+    queue.close()
+
+
+def test_eviction_at_max_mb(tmp_path):
+    # store_forward.max_mb = 1, segment_kb = 64
+    max_bytes = 1 * 1024 * 1024
+    queue = DiskQueue(str(tmp_path), max_bytes=max_bytes, segment_bytes=64 * 1024)
+    queue.commit(queue.read(1)[1])  # write the cursor file, eviction has to move it
+    for n in range(0, 30000, 1000):  # about 3 MB
+        queue.append([record(i, 100) for i in range(n, n + 1000)])
+    assert queue.size() <= max_bytes
+    assert sum(os.path.getsize(path) for path in segment_paths(str(tmp_path))) == queue.size()
+
+    # The oldest readings were dropped, the newest are all there and the cursor followed
+    records, _ = queue.read(30000)
+    assert records[-1] == record(29999)
+    assert records == [record(n) for n in range(30000 - len(records), 30000)]
+    assert len(records) * 108 <= max_bytes
+    queue.close()
+
+    queue = DiskQueue(str(tmp_path), max_bytes=max_bytes, segment_bytes=64 * 1024)
+    assert queue.read(30000)[0] == records
+    queue.close()
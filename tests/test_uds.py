@@ -0,0 +1,90 @@
+import pytest
+from obd.protocols.protocol import Message
+
+from commands import ext_command_data_bytes, ext_commands, signal_catalog
+from uds import can_pack, command_did, decode_multi_did_response, multi_did_command, split_multi_did_response
+
+CELLS = ['BAT_CELL_VOLT_01', 'BAT_CELL_VOLT_02', 'BAT_CELL_VOLT_03']
+# Different field bytes for each cell, so a payload read from the wrong offset gives the wrong voltage
+FIELDS = {'BAT_CELL_VOLT_01': "C49C", 'BAT_CELL_VOLT_02': "C4A6", 'BAT_CELL_VOLT_03': "C0F1"}
+# 22 4181 (2 bytes), 22 8334 (1 byte), 22 4182 (2 bytes)
+SIZES = {0x4181: 2, 0x8334: 1, 0x4182: 2}
+
+
+def expected(name):
+    """What the single-DID decoder makes of the cell's field."""
+    message = Message([])
+    message.data = bytearray(bytes.fromhex("62" + ext_commands[name].command[2:].decode() + FIELDS[name]))
+    return ext_commands[name].decode([message])
+
+
+def multi_did(names, data):
+    """Run a multi-DID command for names on a single message holding data, and decode it."""
+    message = Message([])
+    message.data = bytearray(bytes.fromhex(data))
+    response = multi_did_command(names)([message])
+    return response, {name: resp.value for name, resp in decode_multi_did_response(response, names).items()}
+
+
+def test_packed_sizes_match_the_catalog():
+    # A wrong length shifts every DID after it in the answer
+    for name, size in ext_command_data_bytes.items():
+        assert can_pack(name)
+        spec = signal_catalog[name]
+        assert spec.byte - 3 + spec.length == size
+
+
+@pytest.mark.parametrize('data, payloads', [
+    ("624181C49C8334A04182C4A6", {0x4181: b"\xC4\x9C", 0x8334: b"\xA0", 0x4182: b"\xC4\xA6"}),
+    # A missing DID, the others still line up
+    ("624181C49C4182C4A6", {0x4181: b"\xC4\x9C", 0x4182: b"\xC4\xA6"}),
+    ("628334A0", {0x8334: b"\xA0"}),
+    # Truncated last payload
+    ("624181C49C8334A04182C4", {0x4181: b"\xC4\x9C", 0x8334: b"\xA0"}),
+    ("624181C49C8334", {0x4181: b"\xC4\x9C"}),
+    # A DID answered twice, or one that wasn't asked for: nothing after it can be trusted
+    ("624181C49C4181C4A64182C4A6", {0x4181: b"\xC4\x9C"}),
+    ("624181C49C4183C0F14182C4A6", {0x4181: b"\xC4\x9C"}),
+    ("62", {}),
+    # Not a positive answer
+    ("7F2231", None),
+    ("7F2278", None),
+    ("", None),
+])
+def test_split_multi_did_response(data, payloads):
+    assert split_multi_did_response(bytearray(bytes.fromhex(data)), SIZES) == payloads
+
+
+def test_decodes_every_cell():
+    data = "62" + "".join(ext_commands[name].command[2:].decode() + FIELDS[name] for name in CELLS)
+    _, values = multi_did(CELLS, data)
+    assert values == {name: pytest.approx(expected(name), abs=1e-6) for name in CELLS}
+    assert len(set(values.values())) == len(CELLS)
+
+
+def test_missing_cell_is_left_out():
+    _, values = multi_did(CELLS, "624181C49C4183C0F1")
+    assert set(values) == {'BAT_CELL_VOLT_01', 'BAT_CELL_VOLT_03'}
+    assert values['BAT_CELL_VOLT_03'] == pytest.approx(expected('BAT_CELL_VOLT_03'), abs=1e-6)
+
+
+def test_truncated_cell_is_left_out():
+    _, values = multi_did(CELLS, "624181C49C4182C4A64183C0")
+    assert set(values) == {'BAT_CELL_VOLT_01', 'BAT_CELL_VOLT_02'}
+
+
+def test_repeated_cell_stops_decoding():
+    _, values = multi_did(CELLS, "624181C49C4181C4A64182C4A6")
+    assert values == {'BAT_CELL_VOLT_01': pytest.approx(expected('BAT_CELL_VOLT_01'), abs=1e-6)}
+
+
+def test_negative_response_decodes_nothing():
+    response, values = multi_did(CELLS, "7F2231")
+    assert response.value is None
+    assert values == {}
+
+
+def test_request_packs_the_dids():
+    command = multi_did_command(CELLS)
+    assert command.command == b"22418141824183"
+    assert [command_did(ext_commands[name]) for name in CELLS] == [0x4181, 0x4182, 0x4183]